@@ -0,0 +1,12 @@
+"""
+Generated EFetch XML for the benchmarks, so they can run without network access. See `pub.tools.synthetic`.
+"""
+
+from pub.tools.synthetic import CorpusProfile
+from pub.tools.synthetic import write_corpus as write_synthetic_corpus
+
+
+def write_corpus(path: str, records: int, investigators: int, seed: int = 0) -> None:
+    """Write `records` articles, each with `investigators` investigators on top of its authors"""
+    profile = CorpusProfile(investigators=(investigators, investigators), consortium_rate=0.0)
+    write_synthetic_corpus(path, records, profile, seed)
@@ -0,0 +1,67 @@
+"""
+Compare peak memory of get_publications with and without streaming.
+
+The EFetch request is replaced with a local file of generated records, each carrying a long InvestigatorList,
+so no network access is needed. Each mode runs in its own process so the peak RSS of one does not hide the
+other.
+
+    python benchmarks/memory_streaming.py --records 500 --investigators 200
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from corpus import write_corpus
+
+
+def measure(path: str, stream: bool) -> dict:
+    from pub.tools import entrez
+
+    entrez._eutil = lambda utility, *args, **kwargs: open(path, "rb")  # noqa: SIM115
+    tracemalloc.start()
+    timer = time.perf_counter()
+    count = 0
+    for _ in entrez.get_publications(["0"], stream=stream):
+        count += 1
+    seconds = time.perf_counter() - timer
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": "stream" if stream else "read",
+        "records": count,
+        "seconds": round(seconds, 3),
+        "peak_traced_mb": round(peak / 2**20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--investigators", type=int, default=200)
+    parser.add_argument("--measure", choices=["read", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.path, args.measure == "stream")))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "efetch.xml")
+        write_corpus(path, args.records, args.investigators)
+        print(f"{args.records} records, {os.path.getsize(path) / 2**20:.1f} MB of XML")
+        for mode in ("read", "stream"):
+            output = subprocess.check_output([sys.executable, __file__, "--measure", mode, "--path", path])  # noqa: S603
+            print(output.decode("utf-8").strip())
+
+
+if __name__ == "__main__":
+    main()
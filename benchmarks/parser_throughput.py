@@ -0,0 +1,63 @@
+"""
+Compare records per second of the Biopython and lxml parsers on the same generated EFetch XML.
+
+The Biopython path is Entrez.read followed by _parse_entrez_record, which is what get_publications does.
+The lxml path is pubmedxml.iterparse. Both results are compared to make sure the records are identical.
+
+    python benchmarks/parser_throughput.py --records 2000 --investigators 20
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from Bio import Entrez
+from corpus import write_corpus
+
+from pub.tools import entrez
+from pub.tools import pubmedxml
+
+
+def biopython(data: bytes, escape: bool) -> list:
+    parsed = Entrez.read(io.BytesIO(data), escape=escape)
+    records = list(parsed["PubmedArticle"]) + list(parsed["PubmedBookArticle"])
+    return sorted((entrez._parse_entrez_record(record, escape) for record in records), key=lambda r: int(r.pmid))
+
+
+def lxml(data: bytes, escape: bool) -> list:
+    return sorted(pubmedxml.iterparse(io.BytesIO(data), escape), key=lambda r: int(r.pmid))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--investigators", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "efetch.xml")
+        write_corpus(path, args.records, args.investigators)
+        with open(path, "rb") as f:
+            data = f.read()
+
+    print(f"{args.records} records, {len(data) / 2**20:.1f} MB of XML")
+    for escape in (True, False):
+        results = {}
+        for name, func in (("biopython", biopython), ("lxml", lxml)):
+            best = None
+            for _ in range(args.repeat):
+                timer = time.perf_counter()
+                records = func(data, escape)
+                seconds = time.perf_counter() - timer
+                best = seconds if best is None else min(best, seconds)
+            results[name] = records
+            print(f"escape={escape!s:5} {name:9} {len(records) / best:10.0f} records/sec")
+        if results["biopython"] != results["lxml"]:
+            raise SystemExit("parsers returned different records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Time the parse, process, citation and date hot paths on fixed offline inputs, and compare with a baseline.
+
+The inputs are a synthetic EFetch response with a fixed seed and a fixed list of dates, so results only change
+when the code does. Each benchmark reports the best time per operation over several repeats. Save the results
+of a known good version as the baseline, then compare later versions with it:
+
+    python benchmarks/run.py --output benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.25
+
+The exit status is 1 if any benchmark is slower than the baseline by more than the threshold. A baseline is
+only meaningful on the machine it was recorded on.
+"""
+
+import argparse
+import dataclasses
+import gc
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from Bio import Entrez
+
+from pub.tools import citations
+from pub.tools import config
+from pub.tools import entrez
+from pub.tools import formatting
+from pub.tools import synthetic
+
+PROFILE = synthetic.CorpusProfile(
+    book_rate=0.25, medline_date_rate=0.1, season_rate=0.05, markup_rate=0.2, consortium_rate=0.0
+)
+SEED = 20240101
+DATES = (
+    "2012 May-Jun",
+    "2011-2012",
+    "2008 Spring",
+    "Spring 2008",
+    "2006 Dec-2007 Jan",
+    "2012 Jul 3-10",
+    "8-11-2009",
+    "2009/08/11",
+    "2009 Aug 11",
+    "August 11th, 2009",
+    "2010 1st Quart",
+    "2019 Winter",
+    "2001",
+)
+
+
+@dataclasses.dataclass
+class Benchmark:
+    """`run` times one repeat and returns the number of operations done. `setup` is called before each repeat
+    and not timed, its result is passed to `run`"""
+
+    name: str
+    run: Callable[[Any], int]
+    setup: Callable[[], Any] = lambda: None
+
+
+class Inputs:
+    """Fixed inputs shared by the benchmarks"""
+
+    def __init__(self, records: int) -> None:
+        articles = "".join(synthetic.generate_articles(records, PROFILE, SEED))
+        self.data = f"{synthetic.HEADER}{articles}{synthetic.FOOTER}".encode()
+        parsed = self.entrez_records()
+        self.pubdates = [
+            record["MedlineCitation"]["Article"]["Journal"]["JournalIssue"]["PubDate"]
+            for record in parsed["PubmedArticle"]
+        ]
+        self.records = {"journal": [], "book": [], "chapter": []}
+        for record in [*parsed["PubmedArticle"], *parsed["PubmedBookArticle"]]:
+            record = entrez._parse_entrez_record(record, escape=True)
+            self.records[record.pub_type].append(record)
+        self.searches = [
+            {
+                "authors": [f"{author.last_name} {author.initial}" for author in record.authors[:3]],
+                "title": record.title,
+                "journal": record.journal,
+                "pmid": record.pmid,
+                "doi": record.article_ids.get("doi"),
+                "mesh": record.mesh[:2],
+            }
+            for record in self.records["journal"]
+        ]
+
+    def entrez_records(self) -> dict:
+        """Freshly read Biopython records. The parse functions take them apart, so they can only be used once"""
+        return Entrez.read(io.BytesIO(self.data), escape=True)
+
+
+def parse_benchmarks(inputs: Inputs) -> list[Benchmark]:
+    def journal_records():
+        return inputs.entrez_records()["PubmedArticle"]
+
+    def book_records():
+        return inputs.entrez_records()["PubmedBookArticle"]
+
+    def parse_journals(records):
+        for record in records:
+            entrez._parse_entrez_journal_record(record)
+        return len(records)
+
+    def parse_books(records):
+        for record in records:
+            entrez._parse_entrez_book_record(record)
+        return len(records)
+
+    def unprocessed():
+        parsed = inputs.entrez_records()
+        return [entrez._parse_entrez_journal_record(record) for record in parsed["PubmedArticle"]] + [
+            entrez._parse_entrez_book_record(record) for record in parsed["PubmedBookArticle"]
+        ]
+
+    def process(escape):
+        def run(records):
+            for record in records:
+                record.process(escape)
+            return len(records)
+
+        return run
+
+    return [
+        Benchmark("parse_entrez_journal_record", parse_journals, journal_records),
+        Benchmark("parse_entrez_book_record", parse_books, book_records),
+        Benchmark("process[escape=True]", process(True), unprocessed),
+        Benchmark("process[escape=False]", process(False), unprocessed),
+    ]
+
+
+def citation_benchmarks(inputs: Inputs) -> list[Benchmark]:
+    every = inputs.records["journal"] + inputs.records["book"] + inputs.records["chapter"]
+
+    def asdict(records):
+        for record in records:
+            record.asdict()
+        return len(records)
+
+    def cite(func, records, **options):
+        def run(_):
+            for record in records:
+                func(publication=record, **options)
+            return len(records)
+
+        return run
+
+    def label(name, options):
+        return f"{name}[{','.join(option for option in options)}]" if options else name
+
+    benchmarks = [Benchmark("asdict", asdict, lambda: every)]
+    variants = ({}, {"html": True}, {"html": True, "link": True}, {"html": True, "use_abstract": True})
+    for options in variants:
+        name = label("journal_citation", options)
+        benchmarks.append(Benchmark(name, cite(citations.journal_citation, inputs.records["journal"], **options)))
+    for options in variants[:2]:
+        for kind, func in (("book", citations.book_citation), ("chapter", citations.chapter_citation)):
+            name = label(f"{kind}_citation", options)
+            benchmarks.append(Benchmark(name, cite(func, inputs.records[kind], **options)))
+    for options in variants:
+        name = label("publication_citation", options)
+        benchmarks.append(Benchmark(name, cite(citations.publication_citation, every, **options)))
+    return benchmarks
+
+
+def formatting_benchmarks(inputs: Inputs) -> list[Benchmark]:
+    strings = list(DATES) + [
+        " ".join(pubdate.get(key, "") for key in ("MedlineDate", "Year", "Season", "Month", "Day") if pubdate.get(key))
+        for pubdate in inputs.pubdates
+    ]
+
+    def format_date_str(_):
+        for value in strings:
+            formatting.format_date_str(value)
+        return len(strings)
+
+    def format_date(_):
+        for pubdate in inputs.pubdates:
+            formatting.format_date(
+                pubdate.get("Year", ""),
+                pubdate.get("Month", ""),
+                pubdate.get("Day", ""),
+                pubdate.get("MedlineDate", ""),
+            )
+        return len(inputs.pubdates)
+
+    def generate_search_string(_):
+        for search in inputs.searches:
+            entrez.generate_search_string(**search)
+        return len(inputs.searches)
+
+    return [
+        Benchmark("format_date_str", format_date_str),
+        Benchmark("format_date", format_date),
+        Benchmark("generate_search_string", generate_search_string),
+    ]
+
+
+def measure(benchmark: Benchmark, repeat: int) -> dict:
+    times = []
+    operations = 0
+    for _ in range(repeat):
+        payload = benchmark.setup()
+        gc.collect()
+        gc.disable()
+        try:
+            timer = time.perf_counter()
+            operations = benchmark.run(payload)
+            times.append(time.perf_counter() - timer)
+        finally:
+            gc.enable()
+    return {
+        "operations": operations,
+        "best_us": round(min(times) / operations * 1e6, 3),
+        "median_us": round(statistics.median(times) / operations * 1e6, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, out=sys.stdout) -> list[str]:
+    """Names of the benchmarks slower than the baseline by more than `threshold`, printing every comparison"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:55} {result['best_us']:12.1f} us  (not in baseline)", file=out)
+            continue
+        ratio = result["best_us"] / before["best_us"]
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:55} {result['best_us']:12.1f} us  {ratio:6.2f}x baseline{flag}", file=out)
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=300, help="records in the synthetic EFetch response")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file, - for standard output")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown allowed before failing")
+    args = parser.parse_args()
+
+    # keep standard output for the JSON results when they are written there
+    out = sys.stderr if args.output == "-" else sys.stdout
+    inputs = Inputs(args.records)
+    benchmarks = parse_benchmarks(inputs) + citation_benchmarks(inputs) + formatting_benchmarks(inputs)
+    results = {}
+    for benchmark in benchmarks:
+        if args.filter in benchmark.name:
+            results[benchmark.name] = measure(benchmark, args.repeat)
+            if not args.baseline:
+                print(f"{benchmark.name:55} {results[benchmark.name]['best_us']:12.1f} us", file=out)
+
+    report = {
+        "version": config.VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "records": args.records,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    elif args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("records") != args.records:
+            print(f"Baseline was run with {baseline.get('records')} records, not {args.records}", file=out)
+        if regressions := compare(results, baseline["results"], args.threshold, out):
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}", file=out)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Load records from a local copy of the PubMed annual baseline and daily update files, as downloaded from
+https://ftp.ncbi.nlm.nih.gov/pubmed/, without going through the E-utilities.
+
+Files are parsed with `pub.tools.pubmedxml`, so records are the same as the ones `entrez.get_publications`
+returns. Each file is read as a stream and articles are discarded once parsed, so memory use does not depend on
+the size of the files. Update files end with DeleteCitation entries for records that were removed from PubMed,
+which are returned as `DeletedCitation` after the file's records.
+
+A PMID can be in several files when its record was revised, and the last one is current. Files are always
+returned in the order given, which for the NCBI file names is the order they must be applied in.
+"""
+
+import dataclasses
+import glob
+import gzip
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import time
+import traceback
+
+from . import config
+from . import metrics
+from . import pubmedxml
+from .schema import projection
+
+logger = logging.getLogger("pub.tools")
+
+BASELINE_TAGS = (*pubmedxml.ARTICLE_TAGS, "DeleteCitation")
+
+
+class BaselineError(Exception):
+    """Raised when a file could not be loaded by a worker process"""
+
+
+@dataclasses.dataclass
+class DeletedCitation:
+    """A record removed from PubMed by an update file"""
+
+    pmid: str
+    path: str
+
+
+def find_files(directory: str, pattern: str = "pubmed*.xml.gz") -> list[str]:
+    """
+    Baseline and update files in a directory, in the order they must be applied
+
+    :param directory: local mirror of the baseline and/or updatefiles directories
+    :param pattern: glob pattern of the file names
+    :return: sorted paths
+    """
+    return sorted(glob.glob(os.path.join(directory, pattern)), key=os.path.basename)
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def iter_file(path: str, escape: bool = True, fields: frozenset[str] | None = None):
+    """
+    Parse one baseline or update file, returning each record as soon as it has been read
+
+    :param path: PubmedArticleSet file, gzip compressed if its name ends in .gz
+    :param escape: if true, title and abstract are returned as html
+    :param fields: only fill in these fields, see `schema.projection`
+    :return: generator of records, and of DeletedCitation for the deletions in update files
+    """
+    with _open(path) as f:
+        for element in pubmedxml.iterelements(f, BASELINE_TAGS):
+            if element.tag == "DeleteCitation":
+                yield from [DeletedCitation(pmid.text.strip(), path) for pmid in element.iterfind("PMID")]
+            else:
+                record = pubmedxml.parse_article(element, escape, fields)
+                if record:
+                    yield record
+
+
+def _batches(path: str, escape: bool, fields: frozenset[str] | None, batch_size: int):
+    batch = []
+    for item in iter_file(path, escape, fields):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _worker(
+    tasks: multiprocessing.Queue, results: multiprocessing.Queue, spool: str, escape: bool, fields, batch_size: int
+) -> None:
+    """
+    Parse the files taken from `tasks` until it gives None. Each file is pickled in batches to a spool file,
+    and (index, spool file, error, entries, seconds) is put on `results` once it has been parsed
+    """
+    for index, path in iter(tasks.get, None):
+        timer = time.perf_counter()
+        target = os.path.join(spool, f"{index:06d}.pickle")
+        count = 0
+        try:
+            with open(f"{target}.partial", "wb") as f:
+                for batch in _batches(path, escape, fields, batch_size):
+                    pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+                    count += len(batch)
+            os.replace(f"{target}.partial", target)
+        except Exception:
+            results.put((index, None, f"Loading {path} failed\n{traceback.format_exc()}", count, 0.0))
+        else:
+            results.put((index, target, None, count, time.perf_counter() - timer))
+
+
+def _read_spool(path: str):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)  # noqa: S301 - written by our own worker processes
+            except EOFError:
+                return
+            yield from batch
+
+
+def load(
+    paths: list[str],
+    escape: bool = True,
+    processes: int = 1,
+    fields: list[str] | None = None,
+    batch_size: int | None = None,
+    spool: str | None = None,
+):
+    """
+    Parse baseline and update files, with several processes if asked to. Records are returned in the order
+    of the files and of the articles in each file, whatever the number of processes.
+
+    With several processes, each process takes the next file to parse as soon as it is done with one, and
+    writes its records to a spool file on disk. Files are returned from the spool files in order, so memory
+    use stays bounded. At most `processes` + config.BASELINE_READ_AHEAD files are parsed ahead of the one
+    being returned, and the processes wait when the caller uses records more slowly than that.
+
+    If a recorder has been set with `metrics.set_recorder`, a chunk event is reported for each file, with the
+    time spent parsing it.
+
+    >>> for item in load(find_files("/data/pubmed/baseline") + find_files("/data/pubmed/updatefiles"), processes=8):
+    ...     if isinstance(item, DeletedCitation):
+    ...         delete(item.pmid)
+    ...     else:
+    ...         save(item)
+
+    :param paths: files to load, see `find_files`
+    :param escape: if true, title and abstract are returned as html
+    :param processes: number of worker processes, or 1 to parse in this process
+    :param fields: only fill in these record fields, see `entrez.get_publication`
+    :param batch_size: records pickled at a time to the spool files, defaults to config.BASELINE_BATCH_SIZE
+    :param spool: directory where a temporary directory is made for the spool files, defaults to the system's
+        temporary directory. Each spool file takes about 2.5 KB per record
+    :return: generator of records and DeletedCitation
+    """
+    fields = projection(fields)
+    total_time = time.time()
+    if processes <= 1:
+        recorder = metrics.get_recorder()
+        for path in paths:
+            timer = time.time()
+            count = 0
+            items = iter_file(path, escape, fields)
+            if recorder is not None:
+                items = metrics.ChunkTimer(None, "lxml").measure(items, recorder)
+            for item in items:
+                count += 1
+                yield item
+            logger.info(f"Loaded {count} entries from {path} in {time.time() - timer:.02f}s")
+    else:
+        batch_size = batch_size or config.BASELINE_BATCH_SIZE
+        yield from _load_parallel(paths, escape, processes, fields, batch_size, spool)
+    logger.info(f"Loaded {len(paths)} files in {time.time() - total_time:.02f}s")
+
+
+def _load_parallel(paths: list[str], escape: bool, processes: int, fields, batch_size: int, spool: str | None):
+    processes = min(processes, len(paths))
+    spool = tempfile.mkdtemp(prefix="pub.tools-baseline-", dir=spool)
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(tasks, results, spool, escape, fields, batch_size),
+            name=f"pub.tools baseline {index}",
+            daemon=True,
+        )
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    # files handed to the workers but not returned yet, including the one being returned
+    ahead = min(len(paths), processes + config.BASELINE_READ_AHEAD)
+    for index in range(ahead):
+        tasks.put((index, paths[index]))
+    parsed = {}
+    try:
+        for index, path in enumerate(paths):
+            while index not in parsed:
+                try:
+                    message = results.get(timeout=1.0)
+                except queue.Empty:
+                    if all(worker.is_alive() for worker in workers):
+                        continue
+                    # a worker may have put its last message just before exiting
+                    try:
+                        message = results.get(timeout=1.0)
+                    except queue.Empty:
+                        exitcodes = ", ".join(str(worker.exitcode) for worker in workers if not worker.is_alive())
+                        raise BaselineError(f"Worker exited with code {exitcodes} while loading {path}") from None
+                parsed[message[0]] = message
+            _, target, error, count, seconds = parsed.pop(index)
+            if error is not None:
+                raise BaselineError(error)
+            if ahead < len(paths):
+                tasks.put((ahead, paths[ahead]))
+                ahead += 1
+            timer = time.time()
+            yield from _read_spool(target)
+            os.remove(target)
+            if recorder := metrics.get_recorder():
+                recorder.chunk(metrics.ChunkEvent("lxml", count, seconds, 0.0))
+            logger.info(f"Loaded {count} entries from {path} in {time.time() - timer:.02f}s, parsed in {seconds:.02f}s")
+        # every file was returned, so the workers are waiting for a task
+        for _ in workers:
+            tasks.put(None)
+        for worker in workers:
+            worker.join()
+    finally:
+        # workers are still parsing if loading failed or the caller stopped early
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        for channel in (tasks, results):
+            channel.close()
+            channel.cancel_join_thread()
+        shutil.rmtree(spool, ignore_errors=True)
@@ -0,0 +1,216 @@
+import dataclasses
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+from .schema import Abstract
+from .schema import BookRecord
+from .schema import ChapterRecord
+from .schema import Grant
+from .schema import JournalRecord
+from .schema import Person
+from .schema import Section
+
+logger = logging.getLogger("pub.tools")
+
+RECORD_TYPES = {klass.__name__: klass for klass in (JournalRecord, BookRecord, ChapterRecord)}
+NESTED_TYPES = {
+    "authors": Person,
+    "editors": Person,
+    "abstract": Abstract,
+    "grants": Grant,
+    "sections": Section,
+}
+
+
+def dumps(record: JournalRecord | BookRecord | ChapterRecord) -> bytes:
+    """Serialize a record to compressed JSON"""
+    data = {"type": type(record).__name__, "fields": dataclasses.asdict(record)}
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def loads(blob: bytes) -> JournalRecord | BookRecord | ChapterRecord:
+    """Rebuild a record serialized with `dumps`"""
+    data = json.loads(zlib.decompress(blob))
+    fields = data["fields"]
+    for name, klass in NESTED_TYPES.items():
+        if name in fields:
+            fields[name] = [klass(**value) for value in fields[name]]
+    return RECORD_TYPES[data["type"]](**fields)
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters for a record cache"""
+
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class RecordCache:
+    """
+    Persistent cache of parsed publications keyed by PMID, stored in SQLite. Records parsed with and without
+    html escaping are cached separately.
+
+    :param path: SQLite database file, created if it does not exist. ":memory:" keeps the cache in memory
+    :param ttl: seconds a record stays valid, or None to keep records until they are evicted
+    :param max_entries: maximum number of records kept. The least recently used records are evicted first
+    """
+
+    def __init__(self, path: str, ttl: float | None = None, max_entries: int | None = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "pmid TEXT NOT NULL, escaped INTEGER NOT NULL, data BLOB NOT NULL, stored REAL NOT NULL, "
+            "accessed REAL NOT NULL, PRIMARY KEY (pmid, escaped))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS records_accessed ON records (accessed)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def get(self, pmid: str | int, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord | None:
+        """
+        Get a cached record
+
+        :param pmid: PubMed ID
+        :param escape: whether the record was parsed with html escaping
+        :return: publication record, or None if it is not cached or has expired
+        """
+        return self.get_many([pmid], escape).get(str(pmid))
+
+    def get_many(self, pmids: list, escape: bool = True) -> dict[str, JournalRecord | BookRecord | ChapterRecord]:
+        """
+        Get all cached records for a list of PMIDs
+
+        :param pmids: a list of PMIDs
+        :param escape: whether the records were parsed with html escaping
+        :return: dict of PMID to record, only for PMIDs that were found
+        """
+        pmids = list(dict.fromkeys(str(pmid) for pmid in pmids))
+        now = time.time()
+        rows = []
+        with self._lock:
+            # stay well below the SQLite limit on query parameters
+            for start in range(0, len(pmids), 500):
+                chunk = pmids[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(
+                    self._connection.execute(
+                        f"SELECT pmid, data, stored FROM records WHERE escaped = ? AND pmid IN ({placeholders})",  # noqa: S608
+                        [int(escape), *chunk],
+                    ).fetchall()
+                )
+            found = {}
+            expired = []
+            for pmid, data, stored in rows:
+                if self.ttl is not None and stored < now - self.ttl:
+                    expired.append((pmid, int(escape)))
+                else:
+                    found[pmid] = data
+            if expired:
+                self._connection.executemany("DELETE FROM records WHERE pmid = ? AND escaped = ?", expired)
+            if found:
+                self._connection.executemany(
+                    "UPDATE records SET accessed = ? WHERE pmid = ? AND escaped = ?",
+                    [(now, pmid, int(escape)) for pmid in found],
+                )
+            self.stats.hits += len(found)
+            self.stats.misses += len(pmids) - len(found)
+            self.stats.expired += len(expired)
+        return {pmid: loads(data) for pmid, data in found.items()}
+
+    def set(self, record: JournalRecord | BookRecord | ChapterRecord, escape: bool = True) -> None:
+        """
+        Store a record
+
+        :param record: publication record
+        :param escape: whether the record was parsed with html escaping
+        """
+        self.set_many([record], escape)
+
+    def set_many(self, records: list[JournalRecord | BookRecord | ChapterRecord], escape: bool = True) -> None:
+        """
+        Store several records at once, then evict the least recently used records if the cache is full
+
+        :param records: publication records
+        :param escape: whether the records were parsed with html escaping
+        """
+        now = time.time()
+        rows = [(str(record.pmid), int(escape), dumps(record), now, now) for record in records if record]
+        if not rows:
+            return
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", rows)
+                evicted = self._evict()
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            self.stats.stores += len(rows)
+            self.stats.evictions += evicted
+
+    def _evict(self) -> int:
+        if self.max_entries is None:
+            return 0
+        count = self._connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        self._connection.execute(
+            "DELETE FROM records WHERE rowid IN (SELECT rowid FROM records ORDER BY accessed LIMIT ?)",
+            (count - self.max_entries,),
+        )
+        return count - self.max_entries
+
+    def delete(self, pmids: list) -> None:
+        """Remove records from the cache, for example after they have changed in PubMed"""
+        with self._lock:
+            self._connection.executemany("DELETE FROM records WHERE pmid = ?", [(str(pmid),) for pmid in pmids])
+
+    def clear(self) -> None:
+        """Remove all records from the cache"""
+        with self._lock:
+            self._connection.execute("DELETE FROM records")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+_cache = None
+
+
+def get_cache() -> RecordCache | None:
+    """Record cache used by pub.tools.entrez, if any"""
+    return _cache
+
+
+def set_cache(cache: RecordCache | None) -> None:
+    """
+    Put a record cache in front of `entrez.get_publication` and `entrez.get_publications`. Pass None to stop
+    using the cache
+
+    >>> set_cache(RecordCache("/var/cache/pub.tools/records.sqlite", ttl=7 * 24 * 3600, max_entries=500_000))
+    """
+    global _cache
+    _cache = cache
@@ -0,0 +1,157 @@
+"""
+Pick the number of PMIDs per EFetch request from how recent requests went, instead of always asking for
+config.MAX_PUBS at a time.
+"""
+
+import collections
+import dataclasses
+import logging
+import threading
+import time
+
+from . import config
+from . import transport
+
+logger = logging.getLogger("pub.tools")
+
+
+class CountingReader:
+    """File-like wrapper that counts the bytes read from a response"""
+
+    def __init__(self, handle) -> None:
+        self.handle = handle
+        self.bytes_read = 0
+
+    def read(self, size: int = -1):
+        data = self.handle.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+@dataclasses.dataclass
+class ChunkStats:
+    """Requests made by an adaptive chunker, with the most recent chunk sizes it chose"""
+
+    chunks: int = 0
+    errors: int = 0
+    records: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    sizes: collections.deque = dataclasses.field(default_factory=lambda: collections.deque(maxlen=100))
+
+
+class AdaptiveChunker:
+    """
+    Grow or shrink the number of PMIDs per request so that a request takes about `target_seconds` and its
+    response stays under `max_bytes`. Sizes are based on a moving average of the time and bytes per record
+    of completed requests, change by at most a factor of two at a time, and are halved after a failed request.
+    The PMIDs of a failed request are fetched again at the smaller size, see `retry`.
+
+    The sizes chosen are kept in `stats.sizes`.
+
+    :param initial: first chunk size, defaults to config.CHUNK_MIN_SIZE
+    :param min_size: smallest chunk size, defaults to config.CHUNK_MIN_SIZE
+    :param max_size: largest chunk size, defaults to config.MAX_PUBS
+    :param target_seconds: time a request should take, defaults to config.CHUNK_TARGET_SECONDS
+    :param max_bytes: largest response wanted, defaults to config.CHUNK_MAX_BYTES
+    :param max_retries: failed requests in a row fetched again, defaults to config.CHUNK_MAX_RETRIES
+    """
+
+    # weight of the latest request in the moving averages
+    smoothing = 0.5
+
+    def __init__(
+        self,
+        initial: int | None = None,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        target_seconds: float | None = None,
+        max_bytes: int | None = None,
+        max_retries: int | None = None,
+    ) -> None:
+        self.min_size = min_size or config.CHUNK_MIN_SIZE
+        self.max_size = max_size or config.MAX_PUBS
+        self.target_seconds = target_seconds or config.CHUNK_TARGET_SECONDS
+        self.max_bytes = max_bytes or config.CHUNK_MAX_BYTES
+        self.max_retries = config.CHUNK_MAX_RETRIES if max_retries is None else max_retries
+        self.stats = ChunkStats()
+        self._lock = threading.Lock()
+        self._size = self._bound(initial or self.min_size)
+        self._seconds_per_record = None
+        self._bytes_per_record = None
+
+    @property
+    def size(self) -> int:
+        """Number of PMIDs to ask for in the next request"""
+        return self._size
+
+    def _bound(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def _average(self, average: float | None, value: float) -> float:
+        return value if average is None else self.smoothing * value + (1 - self.smoothing) * average
+
+    def record(self, size: int, seconds: float, nbytes: int) -> None:
+        """
+        Adjust the chunk size after a request completed
+
+        :param size: number of PMIDs requested
+        :param seconds: time taken to fetch and parse the response
+        :param nbytes: size of the response
+        """
+        size = max(size, 1)
+        with self._lock:
+            self._seconds_per_record = self._average(self._seconds_per_record, seconds / size)
+            self._bytes_per_record = self._average(self._bytes_per_record, nbytes / size)
+            wanted = self.target_seconds / max(self._seconds_per_record, 1e-6)
+            wanted = min(wanted, self.max_bytes / max(self._bytes_per_record, 1.0))
+            self._size = self._bound(max(self._size / 2, min(self._size * 2, wanted)))
+            self.stats.chunks += 1
+            self.stats.records += size
+            self.stats.bytes += nbytes
+            self.stats.seconds += seconds
+            self.stats.sizes.append(self._size)
+        logger.debug(f"Chunk of {size} took {seconds:.02f}s for {nbytes} bytes, next chunk size {self._size}")
+
+    def record_error(self, size: int) -> None:
+        """Halve the chunk size after a request failed"""
+        with self._lock:
+            self._size = self._bound(min(self._size, size) / 2)
+            self.stats.errors += 1
+            self.stats.sizes.append(self._size)
+        logger.debug(f"Chunk of {size} failed, next chunk size {self._size}")
+
+    def retry(self, size: int, failures: int, error: Exception) -> bool:
+        """
+        Record a failed request with `record_error`, and tell whether to fetch its PMIDs again at the smaller
+        size. Not if the error is not worth retrying, see `transport.retryable`, after `max_retries` failures
+        in a row, or if the request was already as small as allowed.
+
+        :param size: number of PMIDs requested
+        :param failures: failed requests in a row, including this one
+        :param error: exception raised by the request
+        :return: whether to fetch the PMIDs again
+        """
+        self.record_error(size)
+        return transport.retryable(error) and failures <= self.max_retries and size > self.min_size
+
+    def measure(self, records, size: int, reader: CountingReader, started: float):
+        """
+        Pass through the records parsed from one response, then record how long the request took. Time spent by
+        the caller between records is not counted. A failure is left to the caller, see `retry`.
+
+        :param records: generator of records parsed from `reader`
+        :param size: number of PMIDs requested
+        :param reader: response, wrapped to count its bytes
+        :param started: time the request was made
+        :return: generator of the same records
+        """
+        paused = 0.0
+        for record in records:
+            pause = time.time()
+            yield record
+            paused += time.time() - pause
+        self.record(size, time.time() - started - paused, reader.bytes_read)
@@ -0,0 +1,122 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+from . import config
+from . import entrez
+from .schema import BookRecord
+from .schema import ChapterRecord
+from .schema import JournalRecord
+
+logger = logging.getLogger("pub.tools")
+
+
+class Coalescer:
+    """
+    Collect single publication lookups made by many threads within a short window and fetch them with one
+    EFetch request. Each caller still gets back only its own record. Lookups for a PMID that is already
+    waiting or being fetched share that request.
+
+    Batches go through `entrez.get_publications`, so the record cache and rate limiter apply as usual.
+
+    >>> coalescer = Coalescer(window=0.02)
+    >>> record = coalescer.get_publication("12727674")
+
+    :param window: seconds to wait for more lookups after the first one of a batch.
+                   Defaults to config.COALESCE_WINDOW
+    :param max_batch: number of PMIDs that triggers a fetch before the window ends. Defaults to config.MAX_PUBS
+    :param escape: used by Entrez.read. If true, will return as html
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    """
+
+    def __init__(
+        self,
+        window: float | None = None,
+        max_batch: int | None = None,
+        escape: bool = True,
+        parser: str | None = None,
+    ) -> None:
+        self.window = config.COALESCE_WINDOW if window is None else window
+        self.max_batch = max_batch or config.MAX_PUBS
+        self.escape = escape
+        self.parser = parser
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._inflight: dict[str, Future] = {}
+        self._timer = None
+
+    def submit(self, pmid: str | int) -> Future:
+        """
+        Queue a lookup without waiting for it
+
+        :param pmid: PubMed ID
+        :return: future resolving to the publication record, or None if PubMed has no such record
+        """
+        pmid = str(pmid)
+        with self._lock:
+            future = self._pending.get(pmid) or self._inflight.get(pmid)
+            if future is not None:
+                return future
+            future = Future()
+            self._pending[pmid] = future
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            threading.Thread(target=self._fetch, args=(batch,), daemon=True).start()
+        return future
+
+    def get_publication(
+        self, pmid: str | int, timeout: float | None = None
+    ) -> JournalRecord | BookRecord | ChapterRecord | None:
+        """
+        Get a single publication, fetched together with any other lookups made at about the same time
+
+        :param pmid: PubMed ID
+        :param timeout: seconds to wait for the record before raising TimeoutError
+        :return: publication record
+        """
+        return self.submit(pmid).result(timeout)
+
+    def _take(self) -> dict[str, Future]:
+        """Move the pending lookups in flight. Must be called with the lock held"""
+        batch = self._pending
+        self._pending = {}
+        self._inflight.update(batch)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._fetch(batch)
+
+    def _fetch(self, batch: dict[str, Future]) -> None:
+        with self._lock:
+            self.batches += 1
+        logger.debug(f"Fetching a batch of {len(batch)} coalesced publications")
+        try:
+            records = {
+                str(record.pmid): record
+                for record in entrez.get_publications(list(batch), escape=self.escape, parser=self.parser)
+                if record
+            }
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+        else:
+            for pmid, future in batch.items():
+                future.set_result(records.get(pmid))
+        finally:
+            with self._lock:
+                for pmid in batch:
+                    self._inflight.pop(pmid, None)
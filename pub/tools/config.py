@@ -1,10 +1,51 @@
 import importlib.metadata
+import os
 
 NO_VALUE = "<<blank>>"  # special marker
 MAX_PUBS = 9000
 # Biopython will put a count greater than 200 ids into a post, so we don't need to worry about request size
 # But there does seem to be a 9999 limit either from Biopython or from NCBI
 
+# DOIs OR'ed together in a single ESearch by entrez.get_publications_by_doi
+MAX_DOIS = 100
+
+# bounds and goals of chunking.AdaptiveChunker, which sizes EFetch requests from how long recent ones took and
+# how large their responses were. The largest chunk is MAX_PUBS. A failed chunk is fetched again at half the
+# size, up to CHUNK_MAX_RETRIES times in a row
+CHUNK_MIN_SIZE = 200
+CHUNK_TARGET_SECONDS = 20.0
+CHUNK_MAX_BYTES = 100 * 1024 * 1024
+CHUNK_MAX_RETRIES = 3
+
+# most IDs ESearch returns for a query, entrez.iter_pmids splits searches into date windows below this
+ESEARCH_MAX_RESULTS = 9999
+
+# base URL of the NCBI E-utilities. Set PUB_TOOLS_EUTILS_URL to use another server, such as pub.tools.emulator
+EUTILS_URL = os.environ.get("PUB_TOOLS_EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/")
+
+# number of EFetch requests the async client keeps in flight at once. Requests are still spaced out to stay
+# within the NCBI requests-per-second limit, so this mostly hides network latency
+MAX_CONCURRENT_REQUESTS = 4
+
+# requests per second allowed by the shared rate limiter. If not set, this is the NCBI limit of 10 when
+# Entrez.api_key is set and 3 otherwise
+RATE_LIMIT = None
+
+# how EFetch XML is turned into records. "biopython" uses Entrez.read, "lxml" builds the records directly from
+# the XML with pub.tools.pubmedxml, which is faster and gives the same records
+PARSER = "biopython"
+
+# downloaded EFetch responses that may wait to be parsed when get_publications is given an executor
+PARSE_AHEAD = 4
+
+# records pickled at a time by the worker processes of baseline.load, and files they may parse ahead of the one
+# being returned, on top of one per process
+BASELINE_BATCH_SIZE = 1000
+BASELINE_READ_AHEAD = 4
+
+# seconds coalesce.Coalescer waits for more lookups before fetching them all in one request
+COALESCE_WINDOW = 0.01
+
 # set this to True to be emailed if we can't connect to NCBI to get journal info
 # this will email to Entrez.email
 JOURNAL_FAILURE_WARNING = False
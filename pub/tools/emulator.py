@@ -0,0 +1,830 @@
+"""
+A local stand-in for the NCBI E-utilities, serving the articles in a directory of PubMed XML. It answers the
+esearch, efetch, epost, esummary and elink requests pub.tools makes, keeps WebEnv/QueryKey history, pages with
+retstart and retmax, and can answer 429 Too Many Requests as NCBI does when it is called too often. Point
+config.EUTILS_URL at it to load test code that uses pub.tools.entrez without a network. It also answers the PMC
+ID Converter API used by pub.tools.idconv, see `Emulator.idconv_url`.
+"""
+
+import argparse
+import collections
+import dataclasses
+import datetime
+import gzip
+import http.server
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+from lxml import etree
+
+from . import config
+from . import entrez
+from . import ratelimit
+from .pubmedxml import iterelements
+
+logger = logging.getLogger("pub.tools")
+
+DOCTYPES = {
+    "PubmedArticleSet": (
+        "-//NLM//DTD PubMedArticle, 1st January 2025//EN",
+        "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd",
+    ),
+    "eSearchResult": (
+        "-//NLM//DTD esearch 20060628//EN",
+        "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20060628/esearch.dtd",
+    ),
+    "ePostResult": (
+        "-//NLM//DTD epost 20090526//EN",
+        "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20090526/epost.dtd",
+    ),
+    "eSummaryResult": (
+        "-//NLM//DTD esummary v1 20041029//EN",
+        "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20041029/esummary-v1.dtd",
+    ),
+    "eLinkResult": (
+        "-//NLM//DTD elink 20101123//EN",
+        "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20101123/elink.dtd",
+    ),
+}
+# links elink can follow between the loaded articles
+LINKNAMES = ("pubmed_pubmed_refs", "pubmed_pubmed_citedin")
+# idtype parameters of the ID Converter API and the search fields they look in
+IDCONV_FIELDS = {"pmid": "pmid", "pmcid": "pmc", "doi": "doi"}
+# requests per second allowed by the client rate limiter installed for an emulator without a rate limit, and
+# share of the rate limit allowed otherwise, so that timing jitter does not make requests go over it
+CLIENT_RATE = 10000
+CLIENT_SHARE = 0.9
+# most records returned by efetch and esummary for a WebEnv/QueryKey without retmax
+MAX_RETMAX = 10000
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1
+    )
+}
+
+# search fields and their aliases. Terms in other fields are searched for in the whole article
+FIELDS = {
+    "pmid": "pmid",
+    "uid": "pmid",
+    "doi": "doi",
+    "pmc": "pmc",
+    "pmcid": "pmc",
+    "au": "au",
+    "auth": "au",
+    "author": "au",
+    "auid": "auid",
+    "ir": "ir",
+    "ti": "ti",
+    "title": "ti",
+    "ta": "ta",
+    "jour": "ta",
+    "journal": "ta",
+    "gr": "gr",
+    "ad": "ad",
+    "affl": "ad",
+    "mh": "mh",
+    "mesh": "mh",
+    "sb": "sb",
+}
+# fields matched in full, by prefix and by substring
+EXACT_FIELDS = ("pmid", "doi", "pmc", "auid", "ta", "mh")
+PREFIX_FIELDS = ("au", "ir")
+TOKEN = re.compile(r'\s*(?:(\()|(\))|("[^"]*"|[^\s()"\[]+)(?:\[([^\]]*)\])?)')
+
+
+class EmulatorError(ValueError):
+    """A request the emulator cannot answer, returned as 400 Bad Request"""
+
+
+@dataclasses.dataclass
+class Article:
+    """One loaded article, with what is needed to search, fetch, summarize and link it"""
+
+    pmid: str
+    xml: bytes
+    fields: dict[str, list[str]]
+    dates: dict[str, datetime.date]
+    text: str
+    summary: str
+    document_summary: dict
+    references: list[str]
+
+
+def _text(element) -> str:
+    return " ".join("".join(element.itertext()).split()) if element is not None else ""
+
+
+def _texts(element, path: str) -> list[str]:
+    return [text for text in (_text(found) for found in element.iterfind(path)) if text]
+
+
+def _date(element) -> datetime.date | None:
+    """Date of a PubDate, PubMedPubDate or DateRevised element, missing month and day as 1"""
+    if element is None:
+        return None
+    year = element.findtext("Year") or re.match(r"\d{4}|", element.findtext("MedlineDate") or "").group()
+    if not year:
+        return None
+    month = (element.findtext("Month") or "1").strip()
+    month = int(month) if month.isdigit() else MONTHS.get(month[:3].lower(), 1)
+    day = (element.findtext("Day") or "1").strip()
+    try:
+        return datetime.date(int(year), month, int(day) if day.isdigit() else 1)
+    except ValueError:
+        return datetime.date(int(year), 1, 1)
+
+
+def _person(element) -> list[str]:
+    """Names an author or investigator is searched by, as in "smith j" and "smith john" """
+    collective = _text(element.find("CollectiveName"))
+    if collective:
+        return [collective]
+    last = _text(element.find("LastName"))
+    names = [f"{last} {_text(element.find('Initials'))}".strip(), f"{last} {_text(element.find('ForeName'))}".strip()]
+    return [name for name in names if name]
+
+
+def _item(name: str, value: str, item_type: str = "String") -> str:
+    return f"<Item Name={quoteattr(name)} Type={quoteattr(item_type)}>{escape(value)}</Item>"
+
+
+def _list_item(name: str, items: list[str]) -> str:
+    return f'<Item Name={quoteattr(name)} Type="List">{"".join(items)}</Item>'
+
+
+def _pubdate(element) -> str:
+    pubdate = element.find(".//PubDate")
+    if pubdate is None:
+        return ""
+    return pubdate.findtext("MedlineDate") or " ".join(
+        text for text in (pubdate.findtext(tag) for tag in ("Year", "Season", "Month", "Day")) if text
+    )
+
+
+def _summary(element, pmid: str, article_ids: list[tuple[str, str]], fields: dict[str, list[str]]) -> str:
+    """ESummary version 1.0 DocSum of an article"""
+    pubdate = _pubdate(element)
+    authors = [" ".join(_person(author)[:1]) for author in element.iterfind(".//AuthorList/Author")]
+    volume = _text(element.find(".//JournalIssue/Volume"))
+    issue = _text(element.find(".//JournalIssue/Issue"))
+    pages = _text(element.find(".//Pagination/MedlinePgn"))
+    doi = dict(article_ids).get("doi", "")
+    status = element.find("MedlineCitation")
+    history = [
+        _item(date.get("PubStatus", ""), f"{_date(date):%Y/%m/%d} 00:00", "Date")
+        for date in element.iterfind(".//History/PubMedPubDate")
+        if _date(date)
+    ]
+    source = _text(element.find(".//MedlineTA")) or _text(element.find(".//BookTitle"))
+    items = [
+        _item("PubDate", pubdate, "Date"),
+        _item("EPubDate", " ".join(_texts(element, ".//ArticleDate/*")), "Date"),
+        _item("Source", source),
+        _list_item("AuthorList", [_item("Author", author) for author in authors]),
+        _item("LastAuthor", authors[-1] if authors else ""),
+        _item("Title", fields["ti"][0] if fields["ti"] else ""),
+        _item("Volume", volume),
+        _item("Issue", issue),
+        _item("Pages", pages),
+        _list_item("LangList", [_item("Lang", lang) for lang in _texts(element, ".//Language")]),
+        _item("NlmUniqueID", _text(element.find(".//NlmUniqueID"))),
+        _item("ISSN", _text(element.find(".//ISSN[@IssnType='Print']"))),
+        _item("ESSN", _text(element.find(".//ISSN[@IssnType='Electronic']"))),
+        _list_item("PubTypeList", [_item("PubType", kind) for kind in _texts(element, ".//PublicationType")]),
+        _item(
+            "RecordStatus",
+            "PubMed - indexed for MEDLINE" if status is not None and status.get("Status") == "MEDLINE" else "PubMed",
+        ),
+        _item("PubStatus", _text(element.find(".//PublicationStatus"))),
+        _list_item("ArticleIds", [_item(kind, value) for kind, value in article_ids]),
+        _item("DOI", doi),
+        _list_item("History", history),
+        _list_item("References", []),
+        _item("HasAbstract", "1" if element.find(".//Abstract") is not None else "0", "Integer"),
+        _item("PmcRefCount", "0", "Integer"),
+        _item("FullJournalName", _text(element.find(".//Journal/Title"))),
+        _item("ELocationID", f"doi: {doi}" if doi else ""),
+        _item("SO", f"{pubdate};{volume}({issue}):{pages}" if volume else pubdate),
+    ]
+    return f"<DocSum><Id>{pmid}</Id>{''.join(items)}</DocSum>"
+
+
+def _contributors(element, path: str, authtype: str) -> list[dict]:
+    return [
+        {
+            "name": " ".join(part for part in ((_person(person) or [""])[0], _text(person.find("Suffix"))) if part),
+            "authtype": "CollectiveName" if person.find("CollectiveName") is not None else authtype,
+            "clusterid": "",
+        }
+        for person in element.iterfind(path)
+    ]
+
+
+def _document_summary(element, pmid: str, article_ids: list[tuple[str, str]]) -> dict:
+    """ESummary version 2.0 JSON DocumentSummary of an article"""
+    book = element.find("BookDocument")
+    if book is None:
+        doctype = "citation"
+        authors = _contributors(element, "MedlineCitation/Article/AuthorList/Author", "Author")
+        editors = []
+    else:
+        doctype = "chapter" if book.find("LocationLabel[@Type='chapter']") is not None else "book"
+        authors = _contributors(book, "AuthorList[@Type='authors']/Author", "Author")
+        editors = _contributors(book, "Book/AuthorList[@Type='editors']/Author", "Editor")
+    doi = dict(article_ids).get("doi", "")
+    booktitle = _text(element.find(".//Book/BookTitle"))
+    return {
+        "uid": pmid,
+        "pubdate": _pubdate(element),
+        "epubdate": " ".join(_texts(element, ".//ArticleDate/*")),
+        "source": _text(element.find(".//MedlineTA")) or booktitle,
+        "authors": authors,
+        "lastauthor": authors[-1]["name"] if authors else "",
+        "title": _text(element.find(".//ArticleTitle")) or booktitle,
+        "volume": _text(element.find(".//JournalIssue/Volume")) or _text(element.find(".//Book/Volume")),
+        "issue": _text(element.find(".//JournalIssue/Issue")),
+        "pages": _text(element.find(".//Pagination/MedlinePgn")),
+        "lang": _texts(element, ".//Language"),
+        "nlmuniqueid": _text(element.find(".//NlmUniqueID")),
+        "issn": _text(element.find(".//ISSN[@IssnType='Print']")),
+        "essn": _text(element.find(".//ISSN[@IssnType='Electronic']")),
+        "pubtype": _texts(element, ".//PublicationType"),
+        "articleids": [{"idtype": kind, "idtypen": 0, "value": value} for kind, value in article_ids],
+        "history": [
+            {"pubstatus": date.get("PubStatus", ""), "date": f"{_date(date):%Y/%m/%d} 00:00"}
+            for date in element.iterfind(".//History/PubMedPubDate")
+            if _date(date)
+        ],
+        "fulljournalname": _text(element.find(".//Journal/Title")),
+        "elocationid": f"doi: {doi}" if doi else "",
+        "doctype": doctype,
+        "srccontriblist": editors,
+        "booktitle": booktitle,
+        "medium": _text(element.find(".//Book/Medium")),
+        "edition": _text(element.find(".//Book/Edition")),
+        "publisherlocation": _text(element.find(".//Book/Publisher/PublisherLocation")),
+        "publishername": _text(element.find(".//Book/Publisher/PublisherName")),
+        "reportnumber": _text(element.find(".//Book/ReportNumber")),
+        "bookname": booktitle,
+    }
+
+
+def parse_article(element) -> Article:
+    """
+    Index a PubmedArticle or PubmedBookArticle element
+
+    :param element: lxml element
+    :return: Article
+    """
+    pmid = element.findtext(".//PMID").strip()
+    data = element.find("PubmedData")
+    if data is None:
+        data = element.find("PubmedBookData")
+    article_ids = []
+    if data is not None:
+        article_ids = [(found.get("IdType", ""), _text(found)) for found in data.iterfind("ArticleIdList/ArticleId")]
+    dois = [value for kind, value in article_ids if kind == "doi"]
+    dois += _texts(element, ".//ELocationID[@EIdType='doi']")
+    fields = {
+        "pmid": [pmid],
+        "doi": list(dict.fromkeys(dois)),
+        "pmc": [value for kind, value in article_ids if kind == "pmc"],
+        "au": [name for author in element.iterfind(".//AuthorList/Author") for name in _person(author)],
+        "auid": _texts(element, ".//AuthorList/Author/Identifier"),
+        "ir": [name for person in element.iterfind(".//InvestigatorList/Investigator") for name in _person(person)],
+        "ti": _texts(element, ".//ArticleTitle")
+        + _texts(element, ".//BookTitle")
+        + _texts(element, ".//VernacularTitle"),
+        "ta": _texts(element, ".//MedlineTA")
+        + _texts(element, ".//Journal/Title")
+        + _texts(element, ".//ISOAbbreviation")
+        + _texts(element, ".//ISSN")
+        + _texts(element, ".//NlmUniqueID"),
+        "gr": _texts(element, ".//Grant/GrantID") + _texts(element, ".//Grant/Agency"),
+        "ad": _texts(element, ".//Affiliation"),
+        "mh": _texts(element, ".//MeshHeading/DescriptorName"),
+    }
+    history = {date.get("PubStatus"): _date(date) for date in element.iterfind(".//History/PubMedPubDate")}
+    pdat = _date(element.find(".//PubDate"))
+    edat = history.get("entrez") or history.get("pubmed") or pdat
+    dates = {
+        "pdat": pdat,
+        "edat": edat,
+        "crdt": edat,
+        "mdat": _date(element.find(".//DateRevised")) or _date(element.find(".//DateCompleted")) or edat,
+    }
+    return Article(
+        pmid=pmid,
+        xml=etree.tostring(element, encoding="utf-8", with_tail=False),
+        fields={field: [value.lower() for value in values] for field, values in fields.items()},
+        dates={datetype: date for datetype, date in dates.items() if date},
+        text=_text(element).lower(),
+        summary=_summary(element, pmid, article_ids, fields),
+        document_summary=_document_summary(element, pmid, article_ids),
+        references=list(dict.fromkeys(_texts(element, ".//ReferenceList//ArticleId[@IdType='pubmed']"))),
+    )
+
+
+def _pmid_order(pmid: str) -> tuple[int, str]:
+    """Sort key putting PMIDs in numeric order"""
+    return len(pmid), pmid
+
+
+def _tokens(term: str) -> list:
+    """Split an ESearch term into parentheses, operators and (value, field) tuples"""
+    tokens = []
+    for match in TOKEN.finditer(term.replace("+", " ")):
+        opening, closing, value, field = match.groups()
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif field is None and value.upper() in ("AND", "OR", "NOT"):
+            tokens.append(value.upper())
+        elif value:
+            value = value.strip('"')
+            if field is not None:
+                # a field tag applies to every word before it, as in Smith J[au]
+                words = [value]
+                while tokens and isinstance(tokens[-1], tuple) and tokens[-1][1] is None:
+                    words.insert(0, tokens.pop()[0])
+                value = " ".join(words)
+            tokens.append((value, field))
+    return tokens
+
+
+def _json(params: dict[str, list[str]]) -> bool:
+    return params.get("retmode", ["xml"])[0] == "json"
+
+
+def _document(root: str, body: str) -> bytes:
+    public, system = DOCTYPES[root]
+    return f'<?xml version="1.0" encoding="UTF-8" ?>\n<!DOCTYPE {root} PUBLIC "{public}" "{system}">\n{body}\n'.encode()
+
+
+class Emulator:
+    """
+    Local E-utilities server. Requests are answered from the articles loaded from PubMed XML files, such as
+    saved EFetch responses or the PubMed baseline, and each request can be made to wait `latency` seconds to
+    look like a remote server.
+
+    >>> with Emulator("/data/pubmed", rate_limit=10) as emulator:
+    ...     config.EUTILS_URL = emulator.url
+    ...     run_load_test()
+
+    Used as a context manager, the emulator also replaces the rate limiter of this process with one that stays
+    just under `rate_limit`, or that does not hold requests back if there is none, and puts the previous one back
+    on exit.
+    Set another limiter inside the block to send requests faster than the emulator allows.
+
+    ESearch terms support AND, OR, NOT, parentheses and the field tags pub.tools uses, such as [pmid], [doi],
+    [au], [ti] and all[sb]. Untagged terms are looked for anywhere in the article. Results are sorted by
+    descending PMID, and like NCBI at most `max_results` of them can be paged through.
+
+    :param path: PubMed XML file, or directory of .xml and .xml.gz files, to load
+    :param host: address to listen on
+    :param port: port to listen on, a free one is picked if 0
+    :param rate_limit: requests per second allowed before answering 429 Too Many Requests, unlimited if None
+    :param latency: seconds to wait before each response
+    :param max_results: most ESearch results that can be returned for a query
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit: float | None = None,
+        latency: float = 0.0,
+        max_results: int | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.max_results = max_results or config.ESEARCH_MAX_RESULTS
+        self.stats = collections.Counter()
+        self.articles: dict[str, Article] = {}
+        self._history: dict[str, list[list[str]]] = {}
+        self._index = None
+        self._cited_by = None
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._limiter = None
+        if path:
+            self.load(path)
+
+    def load(self, path: str) -> int:
+        """
+        Add the articles of a PubMed XML file, or of every .xml and .xml.gz file in a directory. An article
+        loaded again replaces the earlier version.
+
+        :param path: file or directory
+        :return: number of articles read
+        """
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith((".xml", ".xml.gz")))
+            return sum(self.load(os.path.join(path, name)) for name in names)
+        count = 0
+        with (gzip.open if path.endswith(".gz") else open)(path, "rb") as f:
+            for element in iterelements(f):
+                self.add(parse_article(element))
+                count += 1
+        logger.info(f"Loaded {count} articles from {path}")
+        return count
+
+    def add(self, article: Article) -> None:
+        with self._lock:
+            self.articles[article.pmid] = article
+            self._index = None
+            self._cited_by = None
+
+    def _build_index(self) -> tuple[dict, dict]:
+        with self._lock:
+            if self._index is None:
+                index = collections.defaultdict(lambda: collections.defaultdict(set))
+                cited_by = collections.defaultdict(set)
+                for pmid, article in self.articles.items():
+                    for field, values in article.fields.items():
+                        for value in values:
+                            index[field][value].add(pmid)
+                    for reference in article.references:
+                        cited_by[reference].add(pmid)
+                self._index, self._cited_by = index, cited_by
+            return self._index, self._cited_by
+
+    def _match(self, value: str, field: str | None) -> set[str]:
+        value = value.strip().lower()
+        if field is None:
+            if value.isdigit():
+                return self._match(value, "pmid") | self._match(value, "all")
+            if re.fullmatch(r"pmc\d+", value):
+                return self._match(value, "pmc")
+            if value.startswith("10."):
+                return self._match(value, "doi")
+        field = FIELDS.get((field or "").strip().lower(), "all")
+        if field == "sb":
+            return set(self.articles) if value == "all" else set()
+        prefix = value.endswith("*")
+        value = value.rstrip("*")
+        if field == "all":
+            return {pmid for pmid, article in self.articles.items() if value in article.text}
+        index = self._build_index()[0][field]
+        if field in EXACT_FIELDS and not prefix:
+            return set(index.get(value, ()))
+        if field in EXACT_FIELDS or field in PREFIX_FIELDS:
+            return {pmid for key, pmids in index.items() if key.startswith(value) for pmid in pmids}
+        return {pmid for key, pmids in index.items() if value in key for pmid in pmids}
+
+    def search(
+        self,
+        term: str,
+        datetype: str = "pdat",
+        mindate: str | None = None,
+        maxdate: str | None = None,
+        web_env: str | None = None,
+    ) -> list[str]:
+        """
+        PMIDs of the articles matching an ESearch term, most recent first. As with NCBI, the dates are only
+        used when both are given, and #1 stands for the results stored under query key 1 of `web_env`
+
+        :param term: ESearch term
+        :param datetype: "pdat", "edat", "crdt" or "mdat"
+        :param mindate: YYYY, YYYY/MM or YYYY/MM/DD
+        :param maxdate: YYYY, YYYY/MM or YYYY/MM/DD
+        :param web_env: WebEnv of the query keys used in the term
+        :return: list of PMIDs
+        """
+        tokens = _tokens(term)
+        position = 0
+
+        def peek():
+            return tokens[position] if position < len(tokens) else None
+
+        def advance():
+            nonlocal position
+            position += 1
+            return tokens[position - 1]
+
+        def unit() -> set[str]:
+            token = advance()
+            if token == "(":  # noqa: S105 - not a password
+                result = expression()
+                if peek() == ")":
+                    advance()
+                return result
+            if not isinstance(token, tuple):
+                return set()
+            if re.fullmatch(r"#\d+", token[0]) and token[1] is None:
+                return set(self._recall(web_env, token[0][1:]))
+            return self._match(*token)
+
+        def negation() -> set[str]:
+            result = unit()
+            while peek() == "NOT":
+                advance()
+                result = result - unit()
+            return result
+
+        def conjunction() -> set[str]:
+            result = negation()
+            while peek() not in (None, "OR", ")"):
+                if peek() == "AND":
+                    advance()
+                result = result & negation()
+            return result
+
+        def expression() -> set[str]:
+            result = conjunction()
+            while peek() == "OR":
+                advance()
+                result = result | conjunction()
+            return result
+
+        found = expression() if tokens else set()
+        if mindate and maxdate:
+            try:
+                start = entrez._parse_search_date(mindate.replace("-", "/"), end=False)
+                end = entrez._parse_search_date(maxdate.replace("-", "/"), end=True)
+            except ValueError as e:
+                raise EmulatorError(f"Invalid date: {e}") from e
+            found = {
+                pmid
+                for pmid in found
+                if pmid in self.articles and start <= self.articles[pmid].dates.get(datetype, datetime.date.min) <= end
+            }
+        return sorted(found, key=_pmid_order, reverse=True)
+
+    def _store(self, pmids: list[str], web_env: str | None) -> tuple[str, str]:
+        with self._lock:
+            if web_env is None:
+                web_env = f"MCID_{uuid.uuid4().hex}"
+                self._history[web_env] = []
+            elif web_env not in self._history:
+                raise EmulatorError(f"Unknown WebEnv {web_env}")
+            self._history[web_env].append(pmids)
+            return web_env, str(len(self._history[web_env]))
+
+    def _recall(self, web_env: str | None, query_key: str) -> list[str]:
+        try:
+            return self._history[web_env][int(query_key) - 1]
+        except (KeyError, IndexError, ValueError) as e:
+            raise EmulatorError(f"Unknown WebEnv or query key {query_key}") from e
+
+    def _ids(self, params: dict[str, list[str]]) -> list[str]:
+        """PMIDs given by id, or by WebEnv and query_key paged with retstart and retmax"""
+        if "id" in params:
+            return [pmid.strip() for value in params["id"] for pmid in value.split(",") if pmid.strip()]
+        if "webenv" not in params or "query_key" not in params:
+            raise EmulatorError("Empty id list - nothing todo")
+        pmids = self._recall(params["webenv"][0], params["query_key"][0])
+        retstart = int(params.get("retstart", ["0"])[0])
+        return pmids[retstart : retstart + int(params.get("retmax", [str(MAX_RETMAX)])[0])]
+
+    def esearch(self, params: dict[str, list[str]]) -> bytes:
+        term = params.get("term", [""])[0]
+        found = self.search(
+            term,
+            params.get("datetype", ["pdat"])[0],
+            params.get("mindate", [None])[0],
+            params.get("maxdate", [None])[0],
+            params.get("webenv", [None])[0],
+        )
+        retstart = int(params.get("retstart", ["0"])[0])
+        retmax = int(params.get("retmax", ["20"])[0])
+        ids = found[retstart : min(retstart + retmax, self.max_results)]
+        history = ""
+        if params.get("usehistory", ["n"])[0] == "y":
+            web_env, query_key = self._store(found, params.get("webenv", [None])[0])
+            history = f"<QueryKey>{query_key}</QueryKey><WebEnv>{web_env}</WebEnv>"
+        body = (
+            f"<eSearchResult><Count>{len(found)}</Count><RetMax>{len(ids)}</RetMax><RetStart>{retstart}</RetStart>"
+            f"{history}<IdList>{''.join(f'<Id>{pmid}</Id>' for pmid in ids)}</IdList><TranslationSet/>"
+            f"<QueryTranslation>{escape(term)}</QueryTranslation></eSearchResult>"
+        )
+        return _document("eSearchResult", body)
+
+    def efetch(self, params: dict[str, list[str]]) -> bytes:
+        if params.get("retmode", ["xml"])[0] != "xml":
+            raise EmulatorError("Only retmode=xml is supported")
+        articles = [self.articles[pmid].xml.decode("utf-8") for pmid in self._ids(params) if pmid in self.articles]
+        return _document("PubmedArticleSet", f"<PubmedArticleSet>\n{chr(10).join(articles)}\n</PubmedArticleSet>")
+
+    def epost(self, params: dict[str, list[str]]) -> bytes:
+        if "id" not in params:
+            raise EmulatorError("Empty id list - nothing todo")
+        web_env, query_key = self._store(list(dict.fromkeys(self._ids(params))), params.get("webenv", [None])[0])
+        return _document(
+            "ePostResult", f"<ePostResult><QueryKey>{query_key}</QueryKey><WebEnv>{web_env}</WebEnv></ePostResult>"
+        )
+
+    def esummary(self, params: dict[str, list[str]]) -> bytes:
+        """Version 1.0 XML, or version 2.0 JSON with retmode=json"""
+        ids = self._ids(params)
+        if _json(params):
+            result = {"uids": ids}
+            for pmid in ids:
+                article = self.articles.get(pmid)
+                result[pmid] = (
+                    article.document_summary if article else {"uid": pmid, "error": "cannot get document summary"}
+                )
+            return json.dumps({"header": {"type": "esummary", "version": "0.3"}, "result": result}).encode("utf-8")
+        summaries = [self.articles[pmid].summary for pmid in ids if pmid in self.articles]
+        return _document("eSummaryResult", f"<eSummaryResult>{''.join(summaries)}</eSummaryResult>")
+
+    def elink(self, params: dict[str, list[str]]) -> bytes:
+        """Links between the loaded articles. Each id parameter gets its own LinkSet, as with NCBI"""
+        names = params.get("linkname") or LINKNAMES
+        cited_by = self._build_index()[1]
+        link_sets = []
+        for value in params.get("id", []):
+            ids = [pmid.strip() for pmid in value.split(",") if pmid.strip()]
+            link_dbs = []
+            for name in names:
+                if name == "pubmed_pubmed_refs":
+                    links = {ref for pmid in ids if pmid in self.articles for ref in self.articles[pmid].references}
+                elif name == "pubmed_pubmed_citedin":
+                    links = {citing for pmid in ids for citing in cited_by.get(pmid, ())}
+                else:
+                    raise EmulatorError(f"Unsupported linkname {name}")
+                if links:
+                    links = "".join(
+                        f"<Link><Id>{pmid}</Id></Link>" for pmid in sorted(links, key=_pmid_order, reverse=True)
+                    )
+                    link_dbs.append(f"<LinkSetDb><DbTo>pubmed</DbTo><LinkName>{name}</LinkName>{links}</LinkSetDb>")
+            link_sets.append(
+                f"<LinkSet><DbFrom>pubmed</DbFrom><IdList>{''.join(f'<Id>{pmid}</Id>' for pmid in ids)}</IdList>"
+                f"{''.join(link_dbs)}</LinkSet>"
+            )
+        return _document("eLinkResult", f"<eLinkResult>{''.join(link_sets)}</eLinkResult>")
+
+    def idconv(self, params: dict[str, list[str]]) -> bytes:
+        """PMC ID Converter API, as JSON, for the PMIDs, PMCIDs and DOIs of the loaded articles"""
+        field = IDCONV_FIELDS.get(params.get("idtype", ["pmid"])[0])
+        if field is None:
+            raise EmulatorError(f"Unsupported idtype {params['idtype'][0]}")
+        index = self._build_index()[0][field]
+        records = []
+        for value in params.get("ids", [""])[0].split(","):
+            pmids = index.get(value.strip().lower())
+            if not pmids:
+                records.append({"requested-id": value, "status": "error", "errmsg": "invalid article id"})
+                continue
+            article = self.articles[min(pmids, key=_pmid_order)]
+            record = {"requested-id": value, "pmid": article.pmid}
+            if article.fields["pmc"]:
+                record["pmcid"] = article.fields["pmc"][0].upper()
+            if article.fields["doi"]:
+                record["doi"] = article.fields["doi"][0]
+            records.append(record)
+        return json.dumps({"status": "ok", "records": records}).encode("utf-8")
+
+    def _throttled(self) -> int:
+        """Requests made in the last second if this one goes over the rate limit, otherwise 0"""
+        if not self.rate_limit:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_limit:
+                self.stats["429"] += 1
+                return len(self._recent)
+            self._recent.append(now)
+            return 0
+
+    def respond(self, utility: str, params: dict[str, list[str]]) -> tuple[int, str, bytes]:
+        """
+        Answer an E-utilities request. Counts of requests by utility, and of 429 and 400 responses, are kept
+        in `stats`
+
+        :param utility: esearch, efetch, epost, esummary, elink or idconv
+        :param params: request parameters, each with a list of values as from urllib.parse.parse_qs
+        :return: HTTP status, content type and body
+        """
+        params = {key.lower(): values for key, values in params.items()}
+        with self._lock:
+            self.stats[utility] += 1
+        recent = self._throttled()
+        if recent:
+            body = {"error": "API rate limit exceeded", "count": str(recent + 1), "limit": str(self.rate_limit)}
+            return 429, "application/json", json.dumps(body).encode("utf-8")
+        if self.latency:
+            time.sleep(self.latency)
+        handler = (
+            getattr(self, utility, None)
+            if utility in ("esearch", "efetch", "epost", "esummary", "elink", "idconv")
+            else None
+        )
+        if handler is None:
+            return 404, "text/plain", f"Unknown E-utility {utility}".encode()
+        if params.get("db", ["pubmed"])[0] != "pubmed" or params.get("dbfrom", ["pubmed"])[0] != "pubmed":
+            return 400, "text/plain", b"Only the pubmed database is available"
+        try:
+            body = handler(params)
+            json_body = utility == "idconv" or (utility == "esummary" and _json(params))
+            return 200, "application/json; charset=UTF-8" if json_body else "text/xml; charset=UTF-8", body
+        except EmulatorError as e:
+            with self._lock:
+                self.stats["400"] += 1
+            return 400, "text/plain", str(e).encode("utf-8")
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as config.EUTILS_URL"""
+        return f"http://{self.host}:{self.port}/entrez/eutils/"
+
+    @property
+    def idconv_url(self) -> str:
+        """URL to use as pub.tools.idconv.API"""
+        return f"http://{self.host}:{self.port}/tools/idconv/api/v1/articles/"
+
+    def start(self) -> "Emulator":
+        """Serve requests from a background thread"""
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.emulator = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="pub.tools emulator", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving {len(self.articles)} articles at {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "Emulator":
+        self._limiter = ratelimit.get_limiter()
+        rate = self.rate_limit * CLIENT_SHARE if self.rate_limit else CLIENT_RATE
+        ratelimit.set_limiter(ratelimit.RateLimiter(rate=rate))
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+        ratelimit.set_limiter(self._limiter)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self._respond(b"")
+
+    def do_POST(self) -> None:
+        self._respond(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def _respond(self, body: bytes) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        for key, values in urllib.parse.parse_qs(body.decode("utf-8")).items():
+            params.setdefault(key, []).extend(values)
+        utility = "idconv" if "/idconv/" in url.path else url.path.rsplit("/", 1)[-1].removesuffix(".fcgi")
+        status, content_type, content = self.server.emulator.respond(utility, params)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            content = gzip.compress(content, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - name used by BaseHTTPRequestHandler
+        logger.debug(f"Emulator: {format % args}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the emulator until interrupted: python -m pub.tools.emulator /data/pubmed --port 8080"""
+    parser = argparse.ArgumentParser(description="Serve PubMed XML files as a local NCBI E-utilities")
+    parser.add_argument("path", help="PubMed XML file, or directory of .xml and .xml.gz files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate-limit", type=float, help="requests per second before answering 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    emulator = Emulator(args.path, args.host, args.port, args.rate_limit, args.latency).start()
+    print(f"Set PUB_TOOLS_EUTILS_URL={emulator.url} to use the emulator")
+    try:
+        emulator._thread.join()
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
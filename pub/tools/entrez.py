@@ -1,14 +1,35 @@
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import datetime
+import functools
+import html
+import io
+import json
 import logging
+import math
 import re
 import time
-import xml.etree.ElementTree as et
+import weakref
 from http.client import HTTPResponse
 from http.client import IncompleteRead
+from xml.parsers import expat
 
 from Bio import Entrez
+from Bio.Entrez.Parser import CorruptedXMLError
+from Bio.Entrez.Parser import DataHandler
 from unidecode import unidecode
 
+from . import cache
+from . import chunking
 from . import config
+from . import idconv
+from . import metrics
+from . import pmidindex
+from . import pubmedxml
+from . import ratelimit
+from . import transport
 from .formatting import format_date_str
 from .schema import Abstract
 from .schema import BookRecord
@@ -18,6 +39,8 @@ from .schema import Grant
 from .schema import JournalRecord
 from .schema import Person
 from .schema import Section
+from .schema import projection
+from .schema import wanted
 
 logger = logging.getLogger("pub.tools")
 
@@ -168,6 +191,45 @@ class PubToolsError(Exception):
 
 IMSEntrezError = PubToolsError
 
+PARSERS = ("biopython", "lxml")
+
+
+def _use_lxml(parser: str | None) -> bool:
+    """Whether to parse EFetch XML with `pub.tools.pubmedxml` instead of Biopython"""
+    parser = parser or config.PARSER
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser {parser}, expected one of {', '.join(PARSERS)}")
+    return parser == "lxml"
+
+
+def _eutil(utility: str, **params):
+    """
+    Call an E-utility such as efetch or esearch once the shared rate limiter allows it. Every request to NCBI
+    in this module goes through here. The request is built by Biopython as Bio.Entrez would, and sent with the
+    current transport, and reported to the current recorder if there is one. Transports that do not reach NCBI,
+    such as replay, skip the rate limiter. See `pub.tools.ratelimit`, `pub.tools.transport` and
+    `pub.tools.metrics`
+    """
+    request = Entrez._build_request(
+        f"{config.EUTILS_URL}{utility}.fcgi", params, post=True if utility == "epost" else None
+    )
+    opener = transport.get_transport()
+    wait = ratelimit.get_limiter().acquire() if opener.rate_limited else 0.0
+    recorder = metrics.get_recorder()
+    if recorder is None:
+        return opener.open(request)
+    event = metrics.RequestEvent(utility, request.full_url, time.time(), wait)
+    timer = time.perf_counter()
+    try:
+        handle = opener.open(request)
+    except Exception as e:
+        event.latency = time.perf_counter() - timer
+        event.error = repr(e)
+        recorder.request(event)
+        raise
+    event.latency = time.perf_counter() - timer
+    return metrics.MeteredResponse(handle, event, recorder)
+
 
 def _parse_author_name(author: dict, investigator: bool = False) -> Person:
     fname = author.get("ForeName", "")
@@ -187,29 +249,37 @@ def _parse_author_name(author: dict, investigator: bool = False) -> Person:
     )
 
 
-def _parse_entrez_record(record: dict, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord | None:
+def _parse_entrez_record(
+    record: dict, escape: bool = True, fields: frozenset[str] | None = None
+) -> JournalRecord | BookRecord | ChapterRecord | None:
     """convert this into our own data structure format
     Journal keys - MedlineCitation, PubmedData
     Book keys - BookDocument, PubmedBookData
+    With `fields`, see `schema.projection`, only those fields are filled in
     """
     if "PubmedData" in record:
-        rec = _parse_entrez_journal_record(record)
+        rec = _parse_entrez_journal_record(record, fields)
     elif "PubmedBookData" in record:
-        rec = _parse_entrez_book_record(record)
+        rec = _parse_entrez_book_record(record, fields)
     else:
         return
 
+    if fields is not None:
+        rec.project(fields)
     rec.process(escape)
     return rec
 
 
-def _parse_entrez_book_record(record: dict) -> BookRecord:
+def _parse_entrez_book_record(record: dict, fields: frozenset[str] | None = None) -> BookRecord:
     _type = "book"
     document = record.pop("BookDocument")
     book = document.pop("Book")
 
+    # with a projection, only build what is wanted
+    with_authors = wanted(fields, "authors")
+
     authors = []
-    if document.get("AuthorList", []) and document["AuthorList"][0].attributes["Type"] == "authors":
+    if with_authors and document.get("AuthorList", []) and document["AuthorList"][0].attributes["Type"] == "authors":
         for author in document["AuthorList"][0]:
             author["affiliations"] = []
             for aff in author.get("AffiliationInfo", []):
@@ -217,7 +287,7 @@ def _parse_entrez_book_record(record: dict) -> BookRecord:
             authors.append(_parse_author_name(author))
 
     editors = []
-    if book.get("AuthorList", []) and book["AuthorList"][0].attributes["Type"] == "editors":
+    if with_authors and book.get("AuthorList", []) and book["AuthorList"][0].attributes["Type"] == "editors":
         for author in book["AuthorList"][0]:
             author["affiliations"] = []
             for aff in author.get("AffiliationInfo", []):
@@ -231,8 +301,10 @@ def _parse_entrez_book_record(record: dict) -> BookRecord:
     for aid in articleids:
         article_ids[aid.attributes["IdType"]] = aid
 
-    abstract = document.get("Abstract", {}).get("AbstractText", "")
-    abstract = [Abstract(text=abstract[0] if isinstance(abstract, list) else abstract, nlmcategory="", label="")]
+    abstract = []
+    if wanted(fields, "abstract"):
+        abstract = document.get("Abstract", {}).get("AbstractText", "")
+        abstract = [Abstract(text=abstract[0] if isinstance(abstract, list) else abstract, nlmcategory="", label="")]
 
     articletitle = document.get("ArticleTitle", "")
 
@@ -278,7 +350,7 @@ def _parse_entrez_book_record(record: dict) -> BookRecord:
     pmid = document["PMID"]
 
     sections = []
-    for section in document.get("Sections", []):
+    for section in document.get("Sections", []) if wanted(fields, "sections") else []:
         section_title = section["SectionTitle"]
         if section.get("LocationLabel", ""):
             section_type = section["LocationLabel"].attributes["Type"]
@@ -317,7 +389,7 @@ def _parse_entrez_book_record(record: dict) -> BookRecord:
     return klass(**kwargs)
 
 
-def _parse_entrez_journal_record(record: dict) -> JournalRecord:
+def _parse_entrez_journal_record(record: dict, fields: frozenset[str] | None = None) -> JournalRecord:
     medline = record.pop("MedlineCitation")
     medlineinfo = medline.pop("MedlineJournalInfo")
     article = medline.pop("Article")
@@ -356,14 +428,17 @@ def _parse_entrez_journal_record(record: dict) -> JournalRecord:
         )
         pmpubdates["pmpubdate_" + pmdate.attributes["PubStatus"].replace("-", "")] = pmdate_str
 
+    # with a projection, only build what is wanted
+    with_authors = wanted(fields, "authors")
+
     authors = []
-    for author in article.get("AuthorList", []):
+    for author in article.get("AuthorList", []) if with_authors else []:
         if author.attributes["ValidYN"] == "Y":
             author["affiliations"] = []
             for aff in author.get("AffiliationInfo", []):
                 author["affiliations"].append(aff["Affiliation"])
             authors.append(_parse_author_name(author))
-    investigators = medline.get("InvestigatorList", [])
+    investigators = medline.get("InvestigatorList", []) if with_authors else []
     if investigators:
         investigators = investigators[0]  # list wrapped
     for investigator in investigators:
@@ -377,12 +452,12 @@ def _parse_entrez_journal_record(record: dict) -> JournalRecord:
         article_ids[aid.attributes["IdType"]] = aid
 
     grants = []
-    for grant in article.get("GrantList", []):
+    for grant in article.get("GrantList", []) if wanted(fields, "grants") else []:
         grants.append(
             Grant(grantid=grant.get("GrantID", ""), acronym=grant.get("Acronym", ""), agency=grant.get("Agency", ""))
         )
     mesh = []
-    for meshHeader in medline.get("MeshHeadingList", []):
+    for meshHeader in medline.get("MeshHeadingList", []) if wanted(fields, "mesh") else []:
         mesh.append(meshHeader["DescriptorName"])
     pubtypelist = list(article.get("PublicationTypeList", []))
     edate = ""
@@ -407,7 +482,7 @@ def _parse_entrez_journal_record(record: dict) -> JournalRecord:
     medlinestatus = medline.attributes["Status"]
 
     abstracts = []
-    if article.get("Abstract"):
+    if wanted(fields, "abstract") and article.get("Abstract"):
         for abst in article["Abstract"]["AbstractText"]:
             text = abst
             if hasattr(abst, "attributes"):
@@ -452,7 +527,85 @@ def _parse_entrez_journal_record(record: dict) -> JournalRecord:
     )
 
 
-def get_publication(pmid: str | int, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord:
+# ESummary article IDs that EFetch does not list in ArticleIdList
+SUMMARY_SKIPPED_IDS = ("rid", "eid", "pmcid")
+NAME_SUFFIXES = ("Jr", "Sr", "2nd", "3rd", "4th", "II", "III", "IV")
+
+
+def _parse_summary_name(contributor: dict) -> Person:
+    """Split an ESummary name such as "Smith JA" or "Smith JA Jr" into its parts"""
+    name = " ".join(contributor.get("name", "").split())
+    if contributor.get("authtype") == "CollectiveName":
+        return Person(last_name="", first_name="", initial="", collective_name=name)
+    parts = name.split(" ")
+    suffix = parts.pop() if len(parts) > 2 and parts[-1] in NAME_SUFFIXES else ""
+    if len(parts) < 2 or not parts[-1].isupper():
+        return Person(last_name=" ".join(parts), first_name="", initial="", suffix=suffix)
+    return Person(last_name=" ".join(parts[:-1]), first_name="", initial=parts[-1], suffix=suffix)
+
+
+def _parse_entrez_summary(summary: dict, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord:
+    """
+    Convert an ESummary version 2.0 JSON document summary into a partial record, with what citations need
+    """
+    title = summary.get("title", "")
+    if escape:
+        title = html.escape(title, quote=False)
+    # the EFetch parsers add editors to the authors and leave editors empty, keep the records alike
+    authors = [_parse_summary_name(author) for author in summary.get("authors", []) + summary.get("srccontriblist", [])]
+    article_ids = {
+        aid["idtype"]: aid["value"]
+        for aid in summary.get("articleids", [])
+        if aid.get("value") and aid.get("idtype") not in SUMMARY_SKIPPED_IDS
+    }
+    pubdate = format_date_str(summary["pubdate"]) if summary.get("pubdate") else ""
+    common = {
+        "authors": authors,
+        "pubdate": pubdate,
+        "pagination": summary.get("pages", ""),
+        "volume": summary.get("volume", ""),
+        "pmid": summary["uid"],
+        "medium": summary.get("medium", ""),
+        "article_ids": article_ids,
+        "partial": True,
+    }
+    doctype = summary.get("doctype", "citation")
+    if doctype in ("book", "chapter"):
+        book = {
+            "publisher": summary.get("publishername", ""),
+            "pubplace": summary.get("publisherlocation", ""),
+            "edition": summary.get("edition", ""),
+            "reportnum": summary.get("reportnumber", ""),
+            "elocation": summary.get("elocationid", ""),
+            "language": summary["lang"][0] if summary.get("lang") else "",
+        }
+        booktitle = summary.get("booktitle") or summary.get("bookname", "")
+        if doctype == "chapter":
+            record = ChapterRecord(title=title, booktitle=booktitle, **common, **book)
+        else:
+            record = BookRecord(title=title or booktitle, **common, **book)
+    else:
+        edate = format_date_str(summary["epubdate"]) if summary.get("epubdate") else ""
+        # ESummary has no PubModel, guess the most common one for the dates given
+        pubmodel = "Print-Electronic" if edate and pubdate else "Electronic" if edate else "Print"
+        record = JournalRecord(
+            title=title,
+            issue=summary.get("issue", ""),
+            pubmodel=pubmodel,
+            edate=edate,
+            journal=summary.get("fulljournalname", ""),
+            journal_abbreviation=summary.get("source", ""),
+            nlmuniqueid=summary.get("nlmuniqueid", ""),
+            pubtypelist=summary.get("pubtype", []),
+            **common,
+        )
+    record.process(escape)
+    return record
+
+
+def get_publication(
+    pmid: str | int, escape: bool = True, parser: str | None = None, fields: list[str] | None = None
+) -> JournalRecord | BookRecord | ChapterRecord:
     """
     Get a single publication by ID. We don't use PubMed's convoluted data structure but instead return
     a dict with simple values. Most values are a string or list, but some like authors and grants are further
@@ -460,24 +613,106 @@ def get_publication(pmid: str | int, escape: bool = True) -> JournalRecord | Boo
 
     PubMed contains both books and journals, and we parse both, with some difference in available keys.
 
+    If a local index of the PubMed baseline has been set with `pub.tools.pmidindex.set_index`, records it has
+    are read from it. Then, if a record cache has been set with `pub.tools.cache.set_cache`, it is checked.
+
+    With `fields`, such as ["title", "mesh"], only those record fields and the PMID are filled in, and the
+    parts of the XML they do not need, such as authors and their affiliations, are not turned into objects.
+    The other fields are left empty and the record is flagged as `partial`. The record cache is not used.
+
     :param pmid: PubMed ID
     :param escape: used by `Entrez.parse` and `.read`. If true, will return as html for title and abstract fields
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :param fields: record fields to fill in, all of them if None
     :return: publication record
     """
-    handle = Entrez.efetch(db="pubmed", id=pmid, retmode="xml")
+    local = pmidindex.get_index()
+    if local is not None:
+        record = local.get(pmid, escape, projection(fields))
+        if record is not None:
+            return record
+    if fields is not None:
+        return _fetch_publication(pmid, escape, parser, projection(fields))
+    record_cache = cache.get_cache()
+    if record_cache is None:
+        return _fetch_publication(pmid, escape, parser)
+    record = record_cache.get(pmid, escape)
+    if record is None:
+        record = _fetch_publication(pmid, escape, parser)
+        if record:
+            record_cache.set(record, escape)
+    return record
+
+
+def _fetch_publication(
+    pmid: str | int, escape: bool, parser: str | None, fields: frozenset[str] | None = None
+) -> JournalRecord | BookRecord | ChapterRecord | None:
+    handle = _eutil("efetch", db="pubmed", id=pmid, retmode="xml")
+    if _use_lxml(parser):
+        try:
+            for rec in pubmedxml.iterparse(handle, escape, fields):
+                return rec
+        finally:
+            handle.close()
+        return None
     try:
         for rec in Entrez.parse(handle, escape=escape):
-            return _parse_entrez_record(rec, escape)
+            return _parse_entrez_record(rec, escape, fields)
     except ValueError:
-        handle = Entrez.efetch(db="pubmed", id=pmid, retmode="xml")
+        handle = _eutil("efetch", db="pubmed", id=pmid, retmode="xml")
         data = Entrez.read(handle, escape=escape)
         record = data["PubmedArticle"] + data["PubmedBookArticle"]
         if record:
-            return _parse_entrez_record(record[0], escape)
+            return _parse_entrez_record(record[0], escape, fields)
     finally:
         handle.close()
 
 
+def get_publication_summaries(pmids: list, escape: bool = True):
+    """
+    Get publications from ESummary instead of EFetch, for when only citations are needed. The response is
+    several times smaller than EFetch XML, as it has no abstracts, MeSH headings, grants or affiliations.
+    Records only have authors, title, journal, dates, volume, issue, pages, article IDs and book details, and
+    their `partial` attribute is true. Names are as in "Smith JA", so first names are left empty, and book
+    series are missing. ESummary has no publication model, so it is guessed from the dates, and citations of
+    articles published electronically before print may use the print date rather than the electronic one.
+
+    Summaries are fetched config.MAX_PUBS at a time. The record cache is neither read nor updated, as it
+    holds full records.
+
+    >>> [citations.publication_citation(publication=record) for record in get_publication_summaries(pmids)]
+
+    :param pmids: a list of PMIDs
+    :param escape: if true, the title is returned as html
+    :return: generator of partial records, in the order ESummary returns them. Unknown PMIDs are skipped
+    """
+    pmids = list(pmids)
+    for start in range(0, len(pmids), config.MAX_PUBS):
+        handle = _eutil("esummary", db="pubmed", id=pmids[start : start + config.MAX_PUBS], retmode="json")
+        try:
+            result = json.load(handle)["result"]
+        finally:
+            handle.close()
+        for uid in result.get("uids", []):
+            summary = result[uid]
+            if "error" in summary:
+                logger.info(f"No summary for {uid}: {summary['error']}")
+                continue
+            yield _parse_entrez_summary(summary, escape)
+
+
+def get_publication_summary(pmid: str | int, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord:
+    """
+    Get a single partial publication from ESummary, see `get_publication_summaries`
+
+    :param pmid: PubMed ID
+    :param escape: if true, the title is returned as html
+    :return: partial record, or None if PubMed has no such PMID
+    """
+    for record in get_publication_summaries([pmid], escape):
+        return record
+
+
 def get_publication_by_doi(doi: str, escape: bool = True) -> JournalRecord | BookRecord | ChapterRecord:
     """
     Shortcut for finding publication with DOI
@@ -486,89 +721,663 @@ def get_publication_by_doi(doi: str, escape: bool = True) -> JournalRecord | Boo
     :param escape: used by `Entrez.parse` and `.read`. If true, will return as html
     :return publicatin record
     """
-    ids = find_publications(doi=doi)
+    ids = find_publications(doi=doi, usehistory=True)
     if int(ids["Count"]) == 1:
         return get_publication(ids["IdList"][0], escape)
 
 
-def get_pmid_by_pmc(pmcid: str) -> str:
+@dataclasses.dataclass
+class DOIResults:
+    """Outcome of `get_publications_by_doi`, keyed by the DOIs as they were given"""
+
+    records: dict[str, JournalRecord | BookRecord | ChapterRecord] = dataclasses.field(default_factory=dict)
+    unresolved: list[str] = dataclasses.field(default_factory=list)
+    # DOIs shared by more than one publication, with the PMIDs of each
+    ambiguous: dict[str, list[str]] = dataclasses.field(default_factory=dict)
+
+
+def _normalize_doi(doi: str) -> str:
+    doi = doi.strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            return doi[len(prefix) :].strip()
+    return doi
+
+
+def get_publications_by_doi(dois: list[str], escape: bool = True, parser: str | None = None) -> DOIResults:
     """
-    We can't search by PMC in PubMed, but we can get the PMID from the PMC database
+    Find publications for many DOIs at once. DOIs are searched config.MAX_DOIS at a time with OR'ed ESearch
+    terms, every hit is fetched with `get_publications`, and records are matched back to the DOIs by their
+    "doi" article ID. DOIs are compared case insensitively, and doi.org URLs are accepted.
 
-    Unfortunately, BioPython does not appear able to parse this XML file so we have to do so manually.
-    A full DOM parser is probably fine for a file of this size.
+    A DOI that PubMed finds but no record lists as its "doi" article ID (it may only be in the ELocationID)
+    is matched by searching the remaining DOIs again, see `_match_remaining_dois`.
+
+    :param dois: list of DOI values
+    :param escape: used by Entrez.read. If true, will return as html
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :return: found records, DOIs with no match and DOIs with several matches
     """
-    if pmcid.startswith("PMC"):
-        pmcid = pmcid[3:]
-    handle = Entrez.efetch(db="pmc", id=pmcid)
-    if handle:
-        data = handle.read()
-        if isinstance(data, bytes):
-            data = data.decode("utf-8")
-        root = et.fromstring(data)
-        for el in root.findall(".//article-id"):
-            if el.attrib.get("pub-id-type") == "pmid":
-                return el.text.strip()
-        # we found an article, but it has no PMID given
-        # try to search PubMed with PMC as a general term
-        search = find_publications(all=f"PMC{pmcid}")
-        if search["Count"] == "1":
-            return search["IdList"][0]
+    by_doi = {}
+    for doi in dois:
+        by_doi.setdefault(_normalize_doi(doi), []).append(doi)
+    normalized = [doi for doi in by_doi if doi]
+    pmids = []
+    for start in range(0, len(normalized), config.MAX_DOIS):
+        chunk = normalized[start : start + config.MAX_DOIS]
+        term = " OR ".join(f"({generate_search_string(doi=doi)})" for doi in chunk)
+        pmids.extend(_esearch_ids(term, "pdat", None, None)[1])
+
+    matches = {}
+    unmatched = {}
+    for record in get_publications(list(dict.fromkeys(pmids)), escape=escape, parser=parser):
+        doi = record.article_ids.get("doi")
+        if doi and _normalize_doi(doi) in by_doi:
+            matches.setdefault(_normalize_doi(doi), []).append(record)
+        else:
+            unmatched[str(record.pmid)] = record
+
+    if unmatched:
+        _match_remaining_dois([doi for doi in normalized if doi not in matches], unmatched, matches)
+
+    results = DOIResults()
+    for doi, originals in by_doi.items():
+        records = matches.get(doi, [])
+        for original in originals:
+            if len(records) == 1:
+                results.records[original] = records[0]
+            elif records:
+                results.ambiguous[original] = [str(record.pmid) for record in records]
+            else:
+                results.unresolved.append(original)
+    logger.info(
+        f"Resolved {len(results.records)} DOIs, {len(results.unresolved)} unresolved "
+        f"and {len(results.ambiguous)} ambiguous"
+    )
+    return results
 
 
-def get_publications(pmids: list, escape: bool = True):
+def _match_remaining_dois(dois: list[str], unmatched: dict, matches: dict) -> None:
+    """
+    Match records found by a DOI search but not by their "doi" article ID. The DOIs are searched again
+    config.MAX_DOIS at a time with OR'ed terms, and a batch that finds one of the unmatched records is split in
+    half until a single DOI finds it, as `get_publication_by_doi` would. Batches that find none of them are
+    not searched further, so this takes a few requests per matched record rather than one per DOI.
+
+    :param dois: normalized DOIs with no matched record
+    :param unmatched: records found but not matched, by PMID. Matched ones are removed
+    :param matches: matched records by normalized DOI, added to
+    """
+    batches = collections.deque(dois[start : start + config.MAX_DOIS] for start in range(0, len(dois), config.MAX_DOIS))
+    while batches and unmatched:
+        batch = batches.popleft()
+        if len(batch) == 1:
+            term = generate_search_string(doi=batch[0])
+        else:
+            term = " OR ".join(f"({generate_search_string(doi=doi)})" for doi in batch)
+        count, ids = _esearch_ids(term, "pdat", None, None)
+        if not any(pmid in unmatched for pmid in ids):
+            continue
+        if len(batch) > 1:
+            half = len(batch) // 2
+            batches.extendleft([batch[half:], batch[:half]])
+        elif count == 1:
+            matches[batch[0]] = [unmatched.pop(ids[0])]
+
+
+def get_pmid_by_pmc(pmcid: str) -> str:
+    """
+    We can't search by PMC in PubMed, but the PMC ID Converter maps PMCIDs to PMIDs without fetching the
+    article. Conversions are cached, see `pub.tools.idconv`
+    """
+    ids = idconv.convert_ids([pmcid], "pmcid")[pmcid]
+    if ids is None:
+        return None
+    if ids.pmid:
+        return ids.pmid
+    # we found an article, but it has no PMID given
+    # try to search PubMed with PMC as a general term
+    search = find_publications(all=idconv.normalize(pmcid, "pmcid"), usehistory=True)
+    if search["Count"] == "1":
+        return search["IdList"][0]
+
+
+def _iter_entrez_records(handle, escape: bool = True, block_size: int = 64 * 1024):
+    """
+    Incrementally parse an EFetch PubmedArticleSet, yielding each PubmedArticle or PubmedBookArticle as soon as
+    it has been read. Entrez.parse refuses PubmedArticleSet because it is not a plain list, so we drive
+    Biopython's parser ourselves and take finished articles off the partially built result.
+
+    :param handle: binary stream of EFetch XML
+    :param escape: used by the Biopython parser. If true, will return as html
+    :param block_size: number of bytes read from the stream at a time
+    :return: generator of Biopython records
+    """
+    handler = DataHandler(validate=True, escape=escape, ignore_errors=False)
+    while True:
+        data = handle.read(block_size)
+        try:
+            handler.parser.Parse(data, not data)
+        except expat.ExpatError as e:
+            raise CorruptedXMLError(e) from None
+        record = getattr(handler, "record", None)
+        if record is not None:
+            # the article still being built is the one whose parent is the PubmedArticleSet
+            pending = handler.element
+            while pending is not None and getattr(pending, "parent", None) is not record:
+                pending = getattr(pending, "parent", None)
+            for key in ("PubmedArticle", "PubmedBookArticle"):
+                articles = record.get(key, [])
+                while articles and articles[0] is not pending:
+                    yield articles.pop(0)
+        if not data:
+            break
+
+
+def get_publications(
+    pmids: list,
+    escape: bool = True,
+    stream: bool = False,
+    parser: str | None = None,
+    chunker: chunking.AdaptiveChunker | None = None,
+    executor: concurrent.futures.Executor | None = None,
+    fields: list[str] | None = None,
+):
     """
     We let Biopython do most of the heavy lifting, including building the request POST. Publications are
     fetched in chunks of config.MAX_PUBS as there does seem to be a limit imposed by NCBI. There is also
-    a 3-request per second limit imposed by NCBI until we get an API key, but that should also be handled by
-    Biopython. Retries are done automatically by Biopython.
+    a 3-request per second limit imposed by NCBI until we get an API key, which is enforced by the shared
+    rate limiter in `pub.tools.ratelimit`.
+
+    Failed requests are retried by the transport according to Entrez.max_tries and Entrez.sleep_between_tries,
+    by Biopython with the default `transport.UrllibTransport` or by `transport.SessionTransport` itself, see
+    `pub.tools.transport`. With a chunker, a chunk that still fails on a network or XML error is fetched again
+    at a smaller size, see below, and only the PMIDs not returned yet are fetched again. To retry whole chunks
+    with a randomized backoff instead, fetch them with `pub.tools.harvest.fetch_chunk`.
+
+    By default each chunk is read completely before any publication is returned. With `stream` each
+    publication is parsed and returned as soon as its XML has arrived, so memory use does not grow with
+    the chunk size. Journal and book records may then be interleaved differently.
+
+    The "lxml" parser builds records straight from the XML, skipping Biopython's intermediate structure. It
+    always streams, and returns publications in the order of the response.
+
+    If a record cache has been set with `pub.tools.cache.set_cache`, cached publications are returned first
+    and only the rest are fetched from NCBI.
+
+    With a `chunking.AdaptiveChunker`, the chunk size follows how long requests take and how large their
+    responses are, instead of always being config.MAX_PUBS. A failed chunk is halved and fetched again, up to
+    config.CHUNK_MAX_RETRIES times in a row and not below the chunker's smallest size. Reuse the chunker between
+    calls to keep what it has learned.
+
+    With an `executor`, such as a ProcessPoolExecutor, each chunk is downloaded whole and parsed by the
+    executor while the next chunk downloads. Publications are returned in the same order as without one, and
+    `stream` is ignored.
+
+    With `fields`, only those record fields are filled in, see `get_publication`. The record cache is not used.
 
     :param pmids: a list of PMIDs
     :param escape: used by Entrez.parse and .read. If true, will return as html
+    :param stream: parse and return one publication at a time as the response arrives
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :param chunker: adaptive chunk sizing
+    :param executor: parse chunks with this executor
+    :param fields: record fields to fill in, all of them if None
     :return: generator of parsed pubs as python dicts
     """
+    lxml = _use_lxml(parser)
     # Make sure pmids is a list, since that's what Entrez expects (and sets, for example, are not sliceable).
-    total_time = time.time()
     if isinstance(pmids, set):
         pmids = list(pmids)
+    if fields is not None:
+        yield from _fetch_publications(pmids, escape, stream, lxml, chunker, executor, projection(fields))
+        return
+    record_cache = cache.get_cache()
+    if record_cache is None:
+        yield from _fetch_publications(pmids, escape, stream, lxml, chunker, executor)
+        return
+
+    # only ask NCBI for what is not cached, and cache what we get back
+    hits = record_cache.get_many(pmids, escape)
+    logger.info(f"Found {len(hits)} of {len(pmids)} publications in cache")
+    yield from hits.values()
+    fetched = []
+    try:
+        missing = [pmid for pmid in pmids if str(pmid) not in hits]
+        for record in _fetch_publications(missing, escape, stream, lxml, chunker, executor):
+            if record:
+                fetched.append(record)
+                if len(fetched) >= 1000:
+                    record_cache.set_many(fetched, escape)
+                    fetched = []
+            yield record
+    finally:
+        record_cache.set_many(fetched, escape)
+
+
+def _fetch_publications(
+    pmids: list,
+    escape: bool,
+    stream: bool,
+    lxml: bool,
+    chunker: chunking.AdaptiveChunker | None = None,
+    executor: concurrent.futures.Executor | None = None,
+    fields: frozenset[str] | None = None,
+):
+    if executor is not None:
+        yield from _fetch_publications_parallel(pmids, escape, lxml, chunker, executor, fields)
+        return
+    total_time = time.time()
     start = 0
+    failures = 0
     while start < len(pmids):
-        pmid_slice = pmids[start : start + config.MAX_PUBS]
+        size = chunker.size if chunker is not None else config.MAX_PUBS
+        pmid_slice = pmids[start : start + size]
         timer = time.time()
-        logger.info(f"Fetching publications {start} through {min(len(pmids), start + config.MAX_PUBS)}...")
-        handle = Entrez.efetch(db="pubmed", id=pmid_slice, retmode="xml")
-        data = Entrez.read(handle, escape=escape)
-        logger.info(f"Fetched and read after {time.time() - timer:02}s")
-        for record in data["PubmedArticle"] + data["PubmedBookArticle"]:
-            yield _parse_entrez_record(record, escape)
-        start += config.MAX_PUBS
+        logger.info(f"Fetching publications {start} through {min(len(pmids), start + size)}...")
+        if chunker is None:
+            handle = _eutil("efetch", db="pubmed", id=pmid_slice, retmode="xml")
+            yield from _fetch_chunk(handle, escape, stream, lxml, fields)
+        else:
+            returned = set()
+            try:
+                reader = chunking.CountingReader(_eutil("efetch", db="pubmed", id=pmid_slice, retmode="xml"))
+                records = _fetch_chunk(reader, escape, stream, lxml, fields)
+                for record in chunker.measure(records, len(pmid_slice), reader, timer):
+                    returned.add(record.pmid)
+                    yield record
+            except Exception as e:
+                failures += 1
+                if not chunker.retry(len(pmid_slice), failures, e):
+                    raise
+                logger.warning(f"Fetching {len(pmid_slice)} publications failed ({e!r}), retrying {chunker.size}")
+                # fetch the rest of the slice again at the smaller size, without what was already returned
+                remaining = [pmid for pmid in pmid_slice if str(pmid) not in returned]
+                pmids = pmids[:start] + remaining + pmids[start + size :]
+                continue
+            failures = 0
+        logger.info(f"Fetched and parsed after {time.time() - timer:02}s")
+        start += size
     logger.info(f"Total publications retrieved in {time.time() - total_time:.02} seconds")
 
 
-def find_pmids(query):
+def _fetch_publications_parallel(
+    pmids: list,
+    escape: bool,
+    lxml: bool,
+    chunker: chunking.AdaptiveChunker | None,
+    executor: concurrent.futures.Executor,
+    fields: frozenset[str] | None = None,
+):
     """
-    Perform an ESearch and extract the pmids
+    Download each chunk in this thread and hand the payload to the executor to parse, so the next chunk
+    downloads while earlier ones are parsed. At most config.PARSE_AHEAD payloads wait for the executor.
+    """
+    total_time = time.time()
+    pending = collections.deque()
+    start = 0
+    failures = 0
+    recorder = metrics.get_recorder()
 
-    :param query: a generated search term compliant with pubmed
-    :return: a list of pmid strings
+    def parsed(future):
+        records, event = future.result()
+        if event is not None:
+            recorder.chunk(event)
+        return records
+
+    try:
+        while start < len(pmids):
+            size = chunker.size if chunker is not None else config.MAX_PUBS
+            pmid_slice = pmids[start : start + size]
+            timer = time.time()
+            logger.info(f"Fetching publications {start} through {min(len(pmids), start + size)}...")
+            try:
+                handle = _eutil("efetch", db="pubmed", id=pmid_slice, retmode="xml")
+                try:
+                    payload = handle.read()
+                finally:
+                    handle.close()
+            except Exception as e:
+                failures += 1
+                if chunker is None or not chunker.retry(len(pmid_slice), failures, e):
+                    raise
+                logger.warning(f"Fetching {len(pmid_slice)} publications failed ({e!r}), retrying {chunker.size}")
+                continue
+            failures = 0
+            if chunker is not None:
+                chunker.record(len(pmid_slice), time.time() - timer, len(payload))
+            logger.info(f"Fetched {len(payload)} bytes after {time.time() - timer:02}s")
+            pending.append(executor.submit(_parse_payload, payload, escape, lxml, fields, recorder is not None))
+            start += size
+            # return whatever is parsed already, and wait if too many payloads are queued
+            while pending and (pending[0].done() or len(pending) > config.PARSE_AHEAD):
+                yield from parsed(pending.popleft())
+        while pending:
+            yield from parsed(pending.popleft())
+    finally:
+        for future in pending:
+            future.cancel()
+    logger.info(f"Total publications retrieved in {time.time() - total_time:.02} seconds")
+
+
+def _parse_payload(
+    payload: bytes, escape: bool, lxml: bool, fields: frozenset[str] | None = None, measure: bool = False
+) -> tuple[list[JournalRecord | BookRecord | ChapterRecord], metrics.ChunkEvent | None]:
+    """
+    Parse a whole EFetch response. Runs in an executor, possibly in another process where the recorder of the
+    caller is not set, so with `measure` the parse is timed here and its chunk event returned with the records
+    for the caller to report
+    """
+    handle = io.BytesIO(payload)
+    if not measure:
+        return list(_parse_chunk(handle, escape, False, lxml, fields, _parse_entrez_record)), None
+    events = []
+    timer = metrics.ChunkTimer(handle, "lxml" if lxml else "biopython")
+    convert = functools.partial(timer.process, _parse_entrez_record)
+    records = _parse_chunk(handle, escape, False, lxml, fields, convert)
+    return list(timer.measure(records, metrics.CallbackRecorder(on_chunk=events.append))), events[0]
+
+
+def _fetch_chunk(handle, escape: bool, stream: bool, lxml: bool, fields: frozenset[str] | None = None):
+    recorder = metrics.get_recorder()
+    if recorder is None:
+        yield from _parse_chunk(handle, escape, stream, lxml, fields, _parse_entrez_record)
+        return
+    timer = metrics.ChunkTimer(handle, "lxml" if lxml else "biopython")
+    convert = functools.partial(timer.process, _parse_entrez_record)
+    yield from timer.measure(_parse_chunk(handle, escape, stream, lxml, fields, convert), recorder)
+
+
+def _parse_chunk(handle, escape: bool, stream: bool, lxml: bool, fields: frozenset[str] | None, convert):
+    """Parse an EFetch response, with `convert` turning each Biopython record into one of ours"""
+    if lxml:
+        try:
+            yield from pubmedxml.iterparse(handle, escape, fields)
+        finally:
+            handle.close()
+    elif stream:
+        try:
+            for record in _iter_entrez_records(handle, escape):
+                yield convert(record, escape, fields)
+        finally:
+            handle.close()
+    else:
+        try:
+            data = Entrez.read(handle, escape=escape)
+        finally:
+            handle.close()
+        for record in data["PubmedArticle"] + data["PubmedBookArticle"]:
+            yield convert(record, escape, fields)
+
+
+def _read_publications(
+    handle, escape: bool, parser: str | None, fields: frozenset[str] | None = None
+) -> list[JournalRecord | BookRecord | ChapterRecord]:
+    """Read and parse a whole EFetch response, then close it"""
+    return [record for record in _fetch_chunk(handle, escape, False, _use_lxml(parser), fields) if record]
+
+
+class AsyncEntrezClient:
+    """
+    Fetch publications with several EFetch requests in flight at once. Biopython only offers blocking calls, so
+    each chunk is fetched and parsed in a worker thread while the event loop keeps the other chunks going.
+    Requests go through the shared rate limiter to stay within the NCBI requests-per-second limit.
+
+    :param concurrency: maximum number of EFetch requests in flight
+    :param escape: used by Entrez.read. If true, will return as html
+    :param chunk_size: number of PMIDs per EFetch request
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
     """
-    handle = Entrez.esearch(db="pubmed", term=query, datetype="pdat", retmode="xml", retmax="100000")
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        escape: bool = True,
+        chunk_size: int | None = None,
+        parser: str | None = None,
+    ) -> None:
+        self.concurrency = concurrency or config.MAX_CONCURRENT_REQUESTS
+        self.escape = escape
+        self.chunk_size = chunk_size or config.MAX_PUBS
+        self.parser = parser
+        # a semaphore belongs to the event loop that first waits on it, so each loop gets its own
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    def _fetch(self, pmids: list) -> list[JournalRecord | BookRecord | ChapterRecord]:
+        return _read_publications(_eutil("efetch", db="pubmed", id=pmids, retmode="xml"), self.escape, self.parser)
+
+    async def fetch_chunk(self, pmids: list) -> list[JournalRecord | BookRecord | ChapterRecord]:
+        """
+        Fetch and parse a single chunk of PMIDs
+
+        :param pmids: a list of PMIDs, no longer than what NCBI accepts in one request
+        :return: list of parsed publications
+        """
+        async with self._semaphore():
+            return await asyncio.to_thread(self._fetch, pmids)
+
+    async def get_publications(self, pmids: list):
+        """
+        Fetch all PMIDs in chunks of `chunk_size`, yielding publications as each chunk completes. Chunks may
+        complete out of order, so publications are not returned in the order of `pmids`. At most `concurrency`
+        chunks are in flight or waiting to be consumed, and the next one starts as one is consumed.
+
+        :param pmids: a list of PMIDs
+        :return: async generator of parsed pubs
+        """
+        pmids = list(pmids)
+        starts = iter(range(0, len(pmids), self.chunk_size))
+        pending = set()
+
+        def submit():
+            start = next(starts, None)
+            if start is not None:
+                pending.add(asyncio.create_task(self.fetch_chunk(pmids[start : start + self.chunk_size])))
+
+        for _ in range(self.concurrency):
+            submit()
+        total_time = time.time()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    records = task.result()
+                    # keep the next chunk in flight while this one is consumed
+                    submit()
+                    for record in records:
+                        yield record
+        finally:
+            for task in pending:
+                task.cancel()
+        logger.info(f"Total publications retrieved in {time.time() - total_time:.02} seconds")
+
+
+async def aget_publications(
+    pmids: list, escape: bool = True, concurrency: int | None = None, parser: str | None = None
+):
+    """
+    Asynchronous version of get_publications that keeps several chunks in flight at once.
+    See `AsyncEntrezClient`
+
+    :param pmids: a list of PMIDs
+    :param escape: used by Entrez.read. If true, will return as html
+    :param concurrency: maximum number of EFetch requests in flight, defaults to config.MAX_CONCURRENT_REQUESTS
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :return: async generator of parsed pubs
+    """
+    client = AsyncEntrezClient(concurrency=concurrency, escape=escape, parser=parser)
+    async for record in client.get_publications(pmids):
+        yield record
+
+
+def _esearch_ids(
+    query: str,
+    datetype: str,
+    mindate: str | None,
+    maxdate: str | None,
+    retmax: int = 100000,
+    web_env: str | None = None,
+) -> tuple[int, list[str]]:
+    """
+    ESearch returning the total count and the IDs, of which there are at most retmax. With `web_env`, the
+    query can use its query keys, such as #1
+    """
+    history = {"WebEnv": web_env} if web_env else {}
+    handle = _eutil(
+        "esearch",
+        db="pubmed",
+        term=query,
+        datetype=datetype,
+        mindate=mindate,
+        maxdate=maxdate,
+        retmode="xml",
+        retmax=str(retmax),
+        **history,
+    )
     try:
-        return Entrez.read(handle).get("IdList", [])
+        record = Entrez.read(handle)
     finally:
         handle.close()
+    return int(record.get("Count", 0)), list(record.get("IdList", []))
+
+
+def find_pmids(query, datetype: str = "pdat", mindate: str | None = None, maxdate: str | None = None):
+    """
+    Perform an ESearch and extract the pmids. NCBI returns at most config.ESEARCH_MAX_RESULTS of them, use
+    `iter_pmids` to get all results of a broad query
+
+    :param query: a generated search term compliant with pubmed
+    :param datetype: date the mindate and maxdate refer to: "pdat" (publication), "mdat" (modification)
+                     or "edat" (entrez)
+    :param mindate: YYYY/MM/DD start date. Both mindate and maxdate must be given to limit the search by date
+    :param maxdate: YYYY/MM/DD end date
+    :return: a list of pmid strings
+    """
+    count, ids = _esearch_ids(query, datetype, mindate, maxdate)
+    if count > len(ids):
+        logger.warning(f"Only {len(ids)} of {count} PMIDs returned for {query}, use iter_pmids to get all of them")
+    return ids
+
+
+def _parse_search_date(value: str, end: bool) -> datetime.date:
+    """Parse a YYYY, YYYY/MM or YYYY/MM/DD ESearch date to the first or last day it covers"""
+    parts = [int(part) for part in value.split("/")]
+    if len(parts) == 3:
+        return datetime.date(*parts)
+    if len(parts) == 2:
+        first = datetime.date(parts[0], parts[1], 1)
+        if not end:
+            return first
+        return (first + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+    return datetime.date(parts[0], 12, 31) if end else datetime.date(parts[0], 1, 1)
+
+
+def _split_window(
+    mindate: datetime.date, maxdate: datetime.date, count: int
+) -> list[tuple[datetime.date, datetime.date]]:
+    """Split a date range into equal windows, enough of them for each to fit the ESearch cap on average"""
+    days = (maxdate - mindate).days + 1
+    parts = min(days, max(2, math.ceil(count * 1.25 / config.ESEARCH_MAX_RESULTS)))
+    step = math.ceil(days / parts)
+    return [
+        (mindate + datetime.timedelta(days=offset), min(maxdate, mindate + datetime.timedelta(days=offset + step - 1)))
+        for offset in range(0, days, step)
+    ]
+
+
+def _iter_windows(query: str, mindate: str | None, maxdate: str | None, datetype: str, concurrency: int | None = None):
+    """
+    Search a date range in windows small enough for ESearch to return every ID, see `iter_pmids`. Returns
+    (window, count, ids) as each window completes, where a count above len(ids) means a single day has more
+    results than ESearch returns
+    """
+    window = (_parse_search_date(mindate or "1500/01/01", False), _parse_search_date(maxdate or "2099/12/31", True))
+
+    def search(window):
+        return _esearch_ids(
+            query, datetype, window[0].strftime("%Y/%m/%d"), window[1].strftime("%Y/%m/%d"), config.ESEARCH_MAX_RESULTS
+        )
 
+    with concurrent.futures.ThreadPoolExecutor(concurrency or config.MAX_CONCURRENT_REQUESTS) as executor:
+        pending = {executor.submit(search, window): window}
+        try:
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    window = pending.pop(future)
+                    count, ids = future.result()
+                    if count > len(ids) and window[0] < window[1]:
+                        for part in _split_window(*window, count):
+                            pending[executor.submit(search, part)] = part
+                        continue
+                    yield window, count, ids
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_pmids(
+    query: str,
+    mindate: str | None = None,
+    maxdate: str | None = None,
+    datetype: str = "pdat",
+    concurrency: int | None = None,
+):
+    """
+    Get every PMID for a query, however many there are. ESearch returns at most config.ESEARCH_MAX_RESULTS
+    IDs, so a date range that has more results is split into smaller windows until each one fits. Windows are
+    searched concurrently, within the shared rate limit, and PMIDs are returned as each window completes.
+
+    A single day with more results than the cap cannot be split further, so only part of it is returned and
+    a warning is logged.
 
-def esearch_publications(query: str) -> JournalRecord | BookRecord | ChapterRecord:
+    :param query: a generated search term compliant with pubmed
+    :param mindate: YYYY, YYYY/MM or YYYY/MM/DD start date, defaults to 1500/01/01
+    :param maxdate: YYYY, YYYY/MM or YYYY/MM/DD end date, defaults to 2099/12/31
+    :param datetype: date the range refers to: "pdat" (publication), "mdat" (modification) or "edat" (entrez)
+    :param concurrency: maximum number of ESearch requests in flight, defaults to config.MAX_CONCURRENT_REQUESTS
+    :return: generator of unique pmid strings, in no particular order
+    """
+    seen = set()
+    for window, count, ids in _iter_windows(query, mindate, maxdate, datetype, concurrency):
+        if count > len(ids):
+            logger.warning(f"Only {len(ids)} of {count} PMIDs returned for {query} on {window[0]}")
+        for pmid in ids:
+            if pmid not in seen:
+                seen.add(pmid)
+                yield pmid
+    logger.info(f"Found {len(seen)} PMIDs for {query}")
+
+
+def esearch_publications(
+    query: str,
+    datetype: str = "pdat",
+    mindate: str | None = None,
+    maxdate: str | None = None,
+    usehistory: bool = False,
+    id_list: bool = True,
+) -> JournalRecord | BookRecord | ChapterRecord:
     """
     Perform an ESearch based on a term
 
     :param query: a generated search term compliant with pubmed
+    :param datetype: date the mindate and maxdate refer to: "pdat" (publication), "mdat" (modification)
+                     or "edat" (entrez)
+    :param mindate: YYYY/MM/DD start date. Both mindate and maxdate must be given to limit the search by date
+    :param maxdate: YYYY/MM/DD end date
+    :param usehistory: have ESearch store the results on the history server, see `process_search`
+    :param id_list: if false, IdList is left empty, for when only the Count or WebEnv are needed
     :return: ESearch record. The useful values here are going to be the WebEnv and QueryKey which you can pass
              to get_searched_publications
     """
-    handle = Entrez.esearch(db="pubmed", term=query, datetype="pdat", retmode="xml", retmax="100000")
-    return process_handle(handle)
+    return process_search(usehistory, id_list, term=query, datetype=datetype, mindate=mindate, maxdate=maxdate)
 
 
 def find_publications(
@@ -586,6 +1395,9 @@ def find_publications(
     affl=None,
     doi="",
     inclusive=False,
+    datetype: str = "pdat",
+    usehistory: bool = False,
+    id_list: bool = True,
 ) -> list[EntrezRecord]:
     """
     You can use the resulting WebEnv and QueryKey values to call get_searched_publications
@@ -605,6 +1417,10 @@ def find_publications(
     :param affl: author affiliation
     :param doi: doi id
     :param inclusive: if "OR", Authors are or'd. Default is and'd
+    :param datetype: date the start and end refer to: "pdat" (publication), "mdat" (modification)
+                     or "edat" (entrez)
+    :param usehistory: have ESearch store the results on the history server, see `process_search`
+    :param id_list: if false, IdList is left empty, for when only the Count or WebEnv are needed
     :return: ESearch record. The useful values here are going to be the WebEnv and QueryKey which you can pass
              to get_searched_publications
     """
@@ -613,10 +1429,7 @@ def find_publications(
         start = "1500/01/01"
     if not end:
         end = "2099/01/01"
-    handle = Entrez.esearch(
-        db="pubmed", term=term, datetype="pdat", mindate=start, maxdate=end, retmode="xml", retmax="100000"
-    )
-    return process_handle(handle)
+    return process_search(usehistory, id_list, term=term, datetype=datetype, mindate=start, maxdate=end)
 
 
 def generate_search_string(
@@ -677,35 +1490,162 @@ def generate_search_string(
 
 
 def get_searched_publications(
-    web_env: str, query_key: str, ids: list[str] | None = None, escape: bool = True
+    web_env: str,
+    query_key: str,
+    ids: list[str] | None = None,
+    escape: bool = True,
+    parser: str | None = None,
+    fields: list[str] | None = None,
 ) -> list[JournalRecord | BookRecord | ChapterRecord]:
     """
     Get a bunch of publications from Entrez using WebEnv and query_key from EPost. Option to narrow
-    down subset of ids
+    down subset of ids. `parser` is "biopython" or "lxml", defaults to config.PARSER. With `fields`, only
+    those record fields are filled in, see `get_publication`
     """
     if isinstance(ids, str):
         ids = [ids]
+    fields = projection(fields)
     records = []
     query = {"db": "pubmed", "webenv": web_env, "query_key": query_key, "retmode": "xml"}
     if ids:
         query["ids"] = ids
-    handle = Entrez.efetch(**query)
+    handle = _eutil("efetch", **query)
+    if _use_lxml(parser):
+        try:
+            for record in pubmedxml.iterparse(handle, escape, fields):
+                if (ids and record.pmid in ids) or not ids:
+                    records.append(record)
+        finally:
+            handle.close()
+        return records
     try:
         for record in Entrez.parse(handle, escape=escape):
-            record = _parse_entrez_record(record, escape)
+            record = _parse_entrez_record(record, escape, fields)
             if record:
                 records.append(record)
     except ValueError:  # newer Biopython requires this to be Entrez.read
-        handle = Entrez.efetch(**query)
+        handle = _eutil("efetch", **query)
         data = Entrez.read(handle, escape=escape)
         for record in data["PubmedArticle"] + data["PubmedBookArticle"]:
-            record = _parse_entrez_record(record, escape)
+            record = _parse_entrez_record(record, escape, fields)
             # Entrez.read does not use the ids query key so we have to do this ourselves
             if record and ((ids and record["pmid"] in ids) or not ids):
                 records.append(record)
     return records
 
 
+def iter_searched_publications(
+    web_env: str,
+    query_key: str,
+    count: int | None = None,
+    window: int | None = None,
+    concurrency: int | None = None,
+    escape: bool = True,
+    parser: str | None = None,
+    chunker: chunking.AdaptiveChunker | None = None,
+):
+    """
+    Page through publications stored on the history server, fetching `window` of them per EFetch request
+    with retstart and retmax. Several windows are fetched at once, but publications are returned in the
+    order of the search results, and only the windows in flight are kept in memory.
+
+    >>> search = find_publications(journal="Cancer", usehistory=True, id_list=False)
+    >>> for record in iter_searched_publications(search["WebEnv"], search["QueryKey"], int(search["Count"])):
+    ...     print(record.title)
+
+    :param web_env: WebEnv from ESearch or EPost
+    :param query_key: QueryKey from ESearch or EPost
+    :param count: number of results stored under the query key. Looked up with ESearch if not given
+    :param window: publications per EFetch request, defaults to config.MAX_PUBS
+    :param concurrency: maximum number of EFetch requests in flight, defaults to config.MAX_CONCURRENT_REQUESTS
+    :param escape: used by Entrez.read. If true, will return as html
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :param chunker: adaptive window sizing, used instead of `window`. See `chunking.AdaptiveChunker`
+    :return: generator of parsed pubs
+    """
+    window = window or config.MAX_PUBS
+    concurrency = concurrency or config.MAX_CONCURRENT_REQUESTS
+    if count is None:
+        count = int(process_search(True, False, term=f"#{query_key}", WebEnv=web_env)["Count"])
+
+    def fetch(retstart, retmax):
+        logger.info(f"Fetching searched publications {retstart} through {min(count, retstart + retmax)}...")
+        query = {"webenv": web_env, "query_key": query_key, "retstart": retstart, "retmax": retmax}
+        if chunker is None:
+            return _read_publications(_eutil("efetch", db="pubmed", retmode="xml", **query), escape, parser)
+        # a failed window is fetched again in parts of the smaller size, until all of it has been fetched
+        records = []
+        end = min(count, retstart + retmax)
+        failures = 0
+        while retstart < end:
+            retmax = min(retmax, end - retstart)
+            query.update(retstart=retstart, retmax=retmax)
+            timer = time.time()
+            try:
+                handle = chunking.CountingReader(_eutil("efetch", db="pubmed", retmode="xml", **query))
+                window_records = _read_publications(handle, escape, parser)
+            except Exception as e:
+                failures += 1
+                if not chunker.retry(retmax, failures, e):
+                    raise
+                logger.warning(f"Fetching {retmax} searched publications failed ({e!r}), retrying {chunker.size}")
+                retmax = chunker.size
+                continue
+            failures = 0
+            chunker.record(retmax, time.time() - timer, handle.bytes_read)
+            records.extend(window_records)
+            retstart += retmax
+        return records
+
+    retstart = 0
+
+    def submit():
+        nonlocal retstart
+        retmax = chunker.size if chunker is not None else window
+        future = executor.submit(fetch, retstart, retmax)
+        retstart += retmax
+        return future
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        pending = collections.deque()
+        while retstart < count and len(pending) < concurrency:
+            pending.append(submit())
+        try:
+            while pending:
+                records = pending.popleft().result()
+                # keep the next window in flight while this one is consumed
+                if retstart < count:
+                    pending.append(submit())
+                yield from records
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def process_search(usehistory: bool = False, id_list: bool = True, **query) -> dict:
+    """
+    Run an ESearch in PubMed and get back the WebEnv and QueryKey values. By default the IDs found are sent
+    to the history server afterwards with EPost, see `process_handle`. With `usehistory`, ESearch stores all
+    the results itself, which saves the EPost request and the upload of every ID.
+
+    :param usehistory: have ESearch store the results on the history server
+    :param id_list: if false, no IDs are downloaded, for when only the Count or WebEnv are needed
+    :param query: ESearch parameters such as term, datetype, mindate and maxdate
+    :return: Entrez read handle value with Count, IdList, WebEnv and QueryKey
+    """
+    query = {"db": "pubmed", "retmode": "xml", "retmax": "100000" if id_list else "0", **query}
+    if not usehistory:
+        return process_handle(_eutil("esearch", **query))
+    handle = _eutil("esearch", usehistory="y", **query)
+    try:
+        return Entrez.read(handle)
+    except Exception as e:
+        logger.info(f'Entrez.read failed: "{e}"')
+        raise PubToolsError("Unable to connect to Entrez") from e
+    finally:
+        handle.close()
+
+
 def process_handle(handle: HTTPResponse, escape=True):
     """
     Use EPost to store our PMID results to the Entrez History server and get back the WebEnv and QueryKey values
@@ -719,7 +1659,7 @@ def process_handle(handle: HTTPResponse, escape=True):
         search_results = None
         if record["IdList"]:
             # If we have search results, send the ids to EPost and use WebEnv/QueryKey from now on
-            search_results = Entrez.read(Entrez.epost("pubmed", id=",".join(record["IdList"])))
+            search_results = Entrez.read(_eutil("epost", db="pubmed", id=",".join(record["IdList"])))
     except Exception as e:
         logger.info(f'Entrez.read failed: "{e}"')
         raise PubToolsError("Unable to connect to Entrez") from e
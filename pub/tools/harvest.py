@@ -0,0 +1,134 @@
+"""
+Resumable bulk fetching. Publications are fetched in chunks, like `entrez.get_publications`, but a chunk that
+fails is retried with exponential backoff, and completed chunks are recorded in a checkpoint file so an
+interrupted harvest continues where it stopped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+from . import config
+from . import entrez
+from . import metrics
+from . import transport
+
+logger = logging.getLogger("pub.tools")
+
+
+def _fingerprint(pmids: list[str], chunk_size: int) -> str:
+    digest = hashlib.sha256(str(chunk_size).encode("utf-8"))
+    for pmid in pmids:
+        digest.update(b"," + pmid.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_checkpoint(path: str, fingerprint: str) -> set[int]:
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return set()
+    if checkpoint.get("fingerprint") != fingerprint:
+        raise ValueError(f"Checkpoint {path} belongs to a harvest of other PMIDs, remove it to start over")
+    return set(checkpoint["done"])
+
+
+def _write_checkpoint(path: str, fingerprint: str, done: set[int]) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"fingerprint": fingerprint, "done": sorted(done)}, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def fetch_chunk(
+    pmids: list,
+    escape: bool = True,
+    parser: str | None = None,
+    max_retries: int = 5,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+) -> list:
+    """
+    Fetch and parse one chunk of publications, retrying network and XML errors. The wait before each retry
+    doubles, up to `max_backoff`, and is randomized so that several harvesters do not retry in step.
+
+    :param pmids: a list of PMIDs, no longer than what NCBI accepts in one request
+    :param escape: used by Entrez.read. If true, will return as html
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :param max_retries: retries before the error is raised
+    :param backoff: seconds to wait before the first retry
+    :param max_backoff: longest wait between retries
+    :return: list of parsed publications
+    """
+    attempt = 0
+    while True:
+        try:
+            handle = entrez._eutil("efetch", db="pubmed", id=pmids, retmode="xml")
+            return entrez._read_publications(handle, escape, parser)
+        except Exception as e:
+            if attempt >= max_retries or not transport.retryable(e):
+                raise
+            wait = random.uniform(0, min(max_backoff, backoff * 2**attempt))  # noqa: S311
+            attempt += 1
+            if recorder := metrics.get_recorder():
+                recorder.retry(metrics.RetryEvent(f"efetch of {len(pmids)} PMIDs", attempt, repr(e), wait))
+            logger.warning(f"Fetching {len(pmids)} publications failed ({e!r}), retry {attempt} in {wait:.01f}s")
+            time.sleep(wait)
+
+
+def harvest_publications(
+    pmids: list,
+    checkpoint: str,
+    escape: bool = True,
+    parser: str | None = None,
+    chunk_size: int | None = None,
+    max_retries: int = 5,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+):
+    """
+    Fetch a large list of publications so that it can be resumed. A chunk is marked done in the checkpoint file
+    once all its publications have been returned, and chunks already done are skipped, so after a crash the
+    same call picks up from the first incomplete chunk. The checkpoint file is removed when the harvest
+    completes.
+
+    The PMIDs and chunk size must be the same when resuming, otherwise a ValueError is raised.
+
+    >>> for record in harvest_publications(pmids, "/var/tmp/backfill.checkpoint"):
+    ...     save(record)
+
+    :param pmids: a list of PMIDs
+    :param checkpoint: JSON file recording completed chunks
+    :param escape: used by Entrez.read. If true, will return as html
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :param chunk_size: number of PMIDs per EFetch request, defaults to config.MAX_PUBS
+    :param max_retries: retries of a failed chunk before the error is raised, see `fetch_chunk`
+    :param backoff: seconds to wait before the first retry
+    :param max_backoff: longest wait between retries
+    :return: generator of parsed pubs
+    """
+    pmids = [str(pmid) for pmid in pmids]
+    chunk_size = chunk_size or config.MAX_PUBS
+    fingerprint = _fingerprint(pmids, chunk_size)
+    done = _read_checkpoint(checkpoint, fingerprint)
+    chunks = range(0, len(pmids), chunk_size)
+    if done:
+        logger.info(f"Resuming harvest from {checkpoint}, {len(done)} of {len(chunks)} chunks already done")
+    for index, start in enumerate(chunks):
+        if index in done:
+            continue
+        logger.info(f"Harvesting publications {start} through {min(len(pmids), start + chunk_size)}...")
+        yield from fetch_chunk(pmids[start : start + chunk_size], escape, parser, max_retries, backoff, max_backoff)
+        done.add(index)
+        _write_checkpoint(checkpoint, fingerprint, done)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
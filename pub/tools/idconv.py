@@ -0,0 +1,225 @@
+"""
+Convert between PMIDs, PMCIDs and DOIs with the PMC ID Converter API, which maps up to 200 IDs per request
+without downloading any article. Conversions are kept in a local SQLite cache, in ~/.pubmed by default, that
+is checked before NCBI.
+"""
+
+import dataclasses
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from Bio import Entrez
+
+from . import ratelimit
+from . import transport
+from .journals import JOURNAL_DATA_DIR
+
+logger = logging.getLogger("pub.tools")
+
+API = "https://pmc.ncbi.nlm.nih.gov/tools/idconv/api/v1/articles/"
+# most IDs the converter accepts in one request
+MAX_IDS = 200
+IDTYPES = ("pmid", "pmcid", "doi")
+# default cache, next to the journal list. Identifiers can be added to PMC later, so conversions expire
+CACHE_FILE = os.path.join(JOURNAL_DATA_DIR, "ids.sqlite")
+CACHE_TTL = 30 * 24 * 3600
+
+
+@dataclasses.dataclass
+class ArticleIds:
+    """The identifiers of one article. Any of them may be missing"""
+
+    pmid: str | None = None
+    pmcid: str | None = None
+    doi: str | None = None
+
+
+def id_type(value: str) -> str:
+    """
+    Guess the type of an identifier
+
+    :param value: PMID, PMCID or DOI
+    :return: "pmid", "pmcid" or "doi"
+    """
+    value = str(value).strip()
+    if value.isdigit():
+        return "pmid"
+    if re.fullmatch(r"(?i)pmc\d+", value):
+        return "pmcid"
+    if value.startswith("10."):
+        return "doi"
+    raise ValueError(f"Unrecognized identifier {value}")
+
+
+def normalize(value: str, idtype: str) -> str:
+    """Canonical form of an identifier, used as the cache key"""
+    value = str(value).strip()
+    if idtype == "pmcid":
+        return value.upper() if value.upper().startswith("PMC") else f"PMC{value}"
+    if idtype == "doi":
+        return value.lower()
+    return value
+
+
+class IdCache:
+    """
+    Cache of identifier conversions stored in SQLite, keyed by the identifier that was looked up. Identifiers
+    the converter does not know are cached too, so they are not requested again until they expire.
+
+    :param path: SQLite database file, created if it does not exist. ":memory:" keeps the cache in memory
+    :param ttl: seconds a conversion stays valid, or None to keep conversions forever
+    """
+
+    def __init__(self, path: str, ttl: float | None = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS ids ("
+            "idtype TEXT NOT NULL, value TEXT NOT NULL, pmid TEXT, pmcid TEXT, doi TEXT, stored REAL NOT NULL, "
+            "PRIMARY KEY (idtype, value))"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+    def get_many(self, idtype: str, values: list[str]) -> dict[str, ArticleIds | None]:
+        """
+        Get cached conversions
+
+        :param idtype: "pmid", "pmcid" or "doi"
+        :param values: normalized identifiers
+        :return: dict of identifier to its conversion, or None if it is known not to convert. Identifiers that
+                 are not cached are left out
+        """
+        oldest = time.time() - self.ttl if self.ttl is not None else 0
+        found = {}
+        with self._lock:
+            for start in range(0, len(values), 500):
+                chunk = values[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT value, pmid, pmcid, doi FROM ids WHERE idtype = ? AND stored >= ? "  # noqa: S608
+                    f"AND value IN ({placeholders})",
+                    [idtype, oldest, *chunk],
+                ).fetchall()
+                for value, pmid, pmcid, doi in rows:
+                    found[value] = ArticleIds(pmid, pmcid, doi) if pmid or pmcid or doi else None
+        return found
+
+    def set_many(self, idtype: str, conversions: dict[str, ArticleIds | None]) -> None:
+        """
+        Store conversions. Each found conversion is also stored under its other identifiers
+
+        :param idtype: "pmid", "pmcid" or "doi"
+        :param conversions: dict of normalized identifier to its conversion, or None if it did not convert
+        """
+        now = time.time()
+        rows = []
+        for value, ids in conversions.items():
+            if ids is None:
+                rows.append((idtype, value, None, None, None, now))
+                continue
+            for other in IDTYPES:
+                if getattr(ids, other):
+                    rows.append((other, normalize(getattr(ids, other), other), ids.pmid, ids.pmcid, ids.doi, now))
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM ids")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _request(idtype: str, values: list[str]) -> dict[str, ArticleIds | None]:
+    if transport.get_transport().rate_limited:
+        ratelimit.get_limiter().acquire()
+    params = {"ids": ",".join(values), "idtype": idtype, "format": "json", "tool": Entrez.tool}
+    if Entrez.email:
+        params["email"] = Entrez.email
+    response = transport.http_get(API, params=params, timeout=10.0)
+    if response.status_code != 200:
+        raise requests.exceptions.HTTPError(f"REST API returned: {response.status_code}")
+    conversions = dict.fromkeys(values)
+    for record in response.json().get("records", []):
+        requested = normalize(record.get("requested-id") or record.get(idtype) or "", idtype)
+        if requested in conversions and record.get("status") != "error":
+            conversions[requested] = ArticleIds(**{
+                other: str(record[other]) if record.get(other) else None for other in IDTYPES
+            })
+    return conversions
+
+
+def convert_ids(ids: list[str], idtype: str | None = None) -> dict[str, ArticleIds | None]:
+    """
+    Map PMIDs, PMCIDs and DOIs to each other. The local cache is checked first, and the rest are converted
+    MAX_IDS at a time, with one request per identifier type.
+
+    >>> convert_ids(["PMC3531190", "12727674"])["PMC3531190"].pmid
+    '23193287'
+
+    :param ids: identifiers, which may be of different types
+    :param idtype: "pmid", "pmcid" or "doi". Guessed for each identifier if not given
+    :return: dict of each identifier as given to its conversion, or None if it could not be converted
+    """
+    groups = {}
+    for value in ids:
+        kind = idtype or id_type(value)
+        groups.setdefault(kind, {})[value] = normalize(value, kind)
+
+    id_cache = get_cache()
+    results = {}
+    for kind, values in groups.items():
+        wanted = list(dict.fromkeys(values.values()))
+        found = id_cache.get_many(kind, wanted) if id_cache is not None else {}
+        missing = [value for value in wanted if value not in found]
+        logger.info(f"Found {len(found)} of {len(wanted)} {kind} conversions in cache")
+        for start in range(0, len(missing), MAX_IDS):
+            converted = _request(kind, missing[start : start + MAX_IDS])
+            if id_cache is not None:
+                id_cache.set_many(kind, converted)
+            found.update(converted)
+        for value, key in values.items():
+            results[value] = found.get(key)
+    return results
+
+
+_cache = None
+# whether the default cache is opened by `get_cache`, until `set_cache` is called
+_default_cache = True
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> IdCache | None:
+    """Identifier cache used by `convert_ids`. The default one, CACHE_FILE, is opened on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None and _default_cache:
+            os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+            _cache = IdCache(CACHE_FILE, ttl=CACHE_TTL)
+        return _cache
+
+
+def set_cache(cache: IdCache | None) -> None:
+    """
+    Replace the identifier cache used by `convert_ids`. By default conversions are kept in CACHE_FILE for
+    CACHE_TTL seconds. Pass None to stop caching
+
+    >>> set_cache(IdCache("/var/cache/pub.tools/ids.sqlite", ttl=7 * 24 * 3600))
+    """
+    global _cache, _default_cache
+    with _cache_lock:
+        _cache = cache
+        _default_cache = False
@@ -2,9 +2,9 @@ import json
 import re
 from io import BytesIO
 
-import requests
 import xml.etree.ElementTree as et
 
+from . import transport
 from .formatting import alphanum, format_date_str
 import dataclasses
 
@@ -58,7 +58,7 @@ class IsbnDbOpener(IsbnOpener):
     def get_url(self, endpoint, term):
         url = self.root_url.format(endpoint=endpoint, term=term)
         headers = {"X-API-KEY": self.api_key}
-        response = requests.get(url, headers=headers, timeout=2.0)
+        response = transport.http_get(url, headers=headers, timeout=2.0)
         if response.status_code == 200:
             return json.loads(response.text)
 
@@ -84,7 +84,7 @@ class GoogleBooksAPIOpener(IsbnOpener):
         return self.root_url.format(api_key=self.api_key, isbn=isbn)
 
     def get_url(self, isbn):
-        response = requests.get(self.url(isbn), timeout=2.0)  # requests module fails to validate SSL cert?
+        response = transport.http_get(self.url(isbn), timeout=2.0)  # requests module fails to validate SSL cert?
         return response.json()
 
     def get_publication(self, isbn):
@@ -112,7 +112,7 @@ class WorldCatOpener(IsbnOpener):
         return self.root_url.format(isbn=term)
 
     def get_url(self, isbn):
-        response = requests.get(self.root_url.format(isbn=isbn), timeout=2.0)
+        response = transport.http_get(self.root_url.format(isbn=isbn), timeout=2.0)
         if response.status_code == 200:
             return response.text
 
@@ -8,6 +8,7 @@ from email.mime.text import MIMEText
 import requests
 from Bio import Entrez
 
+from . import transport
 from .config import JOURNAL_FAILURE_WARNING
 
 logger = logging.getLogger("pub.tools")
@@ -87,7 +88,8 @@ def fetch_journals() -> AllJournalData:
                 full[abbr.lower()] = JournalData(*row)
         return AllJournalData(atoj=_atoj, jtoa=_jtoa, dates=dates, full=full)
 
-    response = requests.get(url, timeout=5.0)
+    os.makedirs(JOURNAL_DATA_DIR, exist_ok=True)
+    response = transport.http_get(url, timeout=5.0)
     if response.status_code == 200:
         _text = response.text
         with open(JOURNAL_DATA_FILE, "wb") as f:
@@ -108,17 +110,14 @@ def fetch_journals() -> AllJournalData:
         return _parse_journals(_text.decode("utf-8"))
 
 
-try:
-    os.makedirs(JOURNAL_DATA_DIR)
-except FileExistsError:
-    pass
-journals = fetch_journals()
+# downloaded the first time it is needed, see `get_source`
+journals = None
 
 
 def get_source(cache: bool = False) -> AllJournalData:
-    """get source dictionary of journals and abbreviations"""
+    """get source dictionary of journals and abbreviations, downloading it if there is none yet"""
     global journals
-    if not cache:
+    if not cache or journals is None:
         try:
             journals = fetch_journals()
         except requests.exceptions.HTTPError:
@@ -0,0 +1,276 @@
+"""
+Report what E-utilities requests and record parsing cost, one event at a time, to a pluggable recorder. No
+recorder is set by default, and then nothing is measured.
+
+A request event is reported once its response has been read to the end or closed, with the time spent waiting
+on the rate limiter, the time until the response started and the bytes received. A chunk event is reported once
+an EFetch response has been parsed, with the time spent parsing the XML and the time spent turning the parsed
+XML into records. Retries made by `transport.SessionTransport` and by `harvest.fetch_chunk` are reported as
+retry events. Retries made by Biopython's own urllib code are not visible here.
+"""
+
+import dataclasses
+import threading
+import time
+from collections.abc import Callable
+
+
+@dataclasses.dataclass
+class RequestEvent:
+    """
+    One E-utilities request
+
+    :param utility: E-utility called, such as efetch
+    :param url: request URL, without the POST body
+    :param started: time the request was sent, from time.time()
+    :param wait: seconds spent waiting on the rate limiter before it was sent
+    :param latency: seconds until the response started, including the retries made by the transport
+    :param seconds: seconds until the response was read to the end or closed, after `latency`
+    :param bytes: bytes received, after decompression
+    :param error: repr of the exception if the request failed
+    """
+
+    utility: str
+    url: str
+    started: float
+    wait: float = 0.0
+    latency: float = 0.0
+    seconds: float = 0.0
+    bytes: int = 0
+    error: str | None = None
+
+
+@dataclasses.dataclass
+class ChunkEvent:
+    """
+    One EFetch response parsed into records
+
+    :param parser: "biopython" or "lxml"
+    :param records: records parsed
+    :param parse_seconds: seconds spent parsing the XML, without the time spent waiting on the network
+    :param process_seconds: seconds spent turning the parsed XML into records. The lxml parser builds records
+        while it parses, so this is always 0 for it
+    """
+
+    parser: str
+    records: int
+    parse_seconds: float
+    process_seconds: float
+
+
+@dataclasses.dataclass
+class RetryEvent:
+    """
+    One failed attempt that is about to be retried
+
+    :param url: request URL, or a description of what is retried
+    :param attempt: number of the attempt that failed, starting at 1
+    :param error: repr of the exception or the HTTP status
+    :param wait: seconds waited before the next attempt
+    """
+
+    url: str
+    attempt: int
+    error: str
+    wait: float
+
+
+class Recorder:
+    """Receives events as they happen. Methods may be called from several threads at once"""
+
+    def request(self, event: RequestEvent) -> None:
+        pass
+
+    def chunk(self, event: ChunkEvent) -> None:
+        pass
+
+    def retry(self, event: RetryEvent) -> None:
+        pass
+
+
+class CallbackRecorder(Recorder):
+    """
+    Pass each event to a function
+
+    >>> set_recorder(CallbackRecorder(on_request=lambda event: statsd.timing("efetch", event.latency)))
+    """
+
+    def __init__(
+        self,
+        on_request: Callable[[RequestEvent], None] | None = None,
+        on_chunk: Callable[[ChunkEvent], None] | None = None,
+        on_retry: Callable[[RetryEvent], None] | None = None,
+    ) -> None:
+        self.on_request = on_request
+        self.on_chunk = on_chunk
+        self.on_retry = on_retry
+
+    def request(self, event: RequestEvent) -> None:
+        if self.on_request:
+            self.on_request(event)
+
+    def chunk(self, event: ChunkEvent) -> None:
+        if self.on_chunk:
+            self.on_chunk(event)
+
+    def retry(self, event: RetryEvent) -> None:
+        if self.on_retry:
+            self.on_retry(event)
+
+
+@dataclasses.dataclass
+class Stats:
+    """Totals kept by a StatsRecorder"""
+
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    wait: float = 0.0
+    latency: float = 0.0
+    seconds: float = 0.0
+    chunks: int = 0
+    records: int = 0
+    parse_seconds: float = 0.0
+    process_seconds: float = 0.0
+    retries: int = 0
+    retry_wait: float = 0.0
+    by_utility: dict = dataclasses.field(default_factory=dict)
+
+
+class StatsRecorder(Recorder):
+    """Add up every event in `stats`, with the number of requests per E-utility in `stats.by_utility`"""
+
+    def __init__(self) -> None:
+        self.stats = Stats()
+        self._lock = threading.Lock()
+
+    def request(self, event: RequestEvent) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.errors += event.error is not None
+            self.stats.bytes += event.bytes
+            self.stats.wait += event.wait
+            self.stats.latency += event.latency
+            self.stats.seconds += event.seconds
+            self.stats.by_utility[event.utility] = self.stats.by_utility.get(event.utility, 0) + 1
+
+    def chunk(self, event: ChunkEvent) -> None:
+        with self._lock:
+            self.stats.chunks += 1
+            self.stats.records += event.records
+            self.stats.parse_seconds += event.parse_seconds
+            self.stats.process_seconds += event.process_seconds
+
+    def retry(self, event: RetryEvent) -> None:
+        with self._lock:
+            self.stats.retries += 1
+            self.stats.retry_wait += event.wait
+
+    def summary(self) -> str:
+        """One line describing the totals, for logging"""
+        stats = self.stats
+        return (
+            f"{stats.requests} requests ({stats.errors} failed, {stats.retries} retried) for {stats.bytes} bytes, "
+            f"{stats.wait:.02f}s rate limited, {stats.latency:.02f}s latency, {stats.seconds:.02f}s downloading, "
+            f"{stats.records} records in {stats.chunks} chunks, {stats.parse_seconds:.02f}s parsing, "
+            f"{stats.process_seconds:.02f}s processing"
+        )
+
+
+class MeteredResponse:
+    """
+    File-like wrapper that counts the bytes read from a response and the time spent reading them, and reports
+    the request once the response has been read to the end or closed
+    """
+
+    def __init__(self, handle, event: RequestEvent, recorder: Recorder) -> None:
+        self.handle = handle
+        self.event = event
+        self.recorder = recorder
+        self.read_seconds = 0.0
+        self._opened = time.perf_counter()
+        self._reported = False
+
+    def _report(self) -> None:
+        if not self._reported:
+            self._reported = True
+            self.event.seconds = time.perf_counter() - self._opened
+            self.recorder.request(self.event)
+
+    def read(self, size: int = -1):
+        timer = time.perf_counter()
+        data = self.handle.read(size)
+        self.read_seconds += time.perf_counter() - timer
+        self.event.bytes += len(data)
+        # Biopython checks that a handle is binary with read(0), which is not the end of the response
+        if not data and size != 0:
+            self._report()
+        return data
+
+    def close(self) -> None:
+        self.handle.close()
+        self._report()
+
+    def __getattr__(self, name: str):
+        return getattr(self.handle, name)
+
+
+def network_seconds(handle) -> float:
+    """Seconds spent reading from the network by `handle`, or by the handles it wraps"""
+    while handle is not None and not isinstance(handle, MeteredResponse):
+        handle = getattr(handle, "handle", None)
+    return handle.read_seconds if handle is not None else 0.0
+
+
+class ChunkTimer:
+    """
+    Time the parsing of one EFetch response, leaving out the time spent waiting on the network and the time
+    the caller spends between records when they are returned one at a time
+
+    :param handle: response being parsed
+    :param parser: "biopython" or "lxml"
+    """
+
+    def __init__(self, handle, parser: str) -> None:
+        self.handle = handle
+        self.parser = parser
+        self.process_seconds = 0.0
+
+    def process(self, func: Callable, *args):
+        """Call `func`, counting its time as processing rather than parsing"""
+        timer = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.process_seconds += time.perf_counter() - timer
+
+    def measure(self, records, recorder: Recorder):
+        """Return the records unchanged, and report a chunk event after the last one"""
+        timer = time.perf_counter()
+        paused = 0.0
+        count = 0
+        for record in records:
+            count += 1
+            pause = time.perf_counter()
+            yield record
+            paused += time.perf_counter() - pause
+        elapsed = time.perf_counter() - timer - paused - network_seconds(self.handle)
+        recorder.chunk(ChunkEvent(self.parser, count, max(0.0, elapsed - self.process_seconds), self.process_seconds))
+
+
+_recorder = None
+
+
+def get_recorder() -> Recorder | None:
+    """Recorder receiving events from pub.tools.entrez, or None if nothing is measured"""
+    return _recorder
+
+
+def set_recorder(recorder: Recorder | None) -> None:
+    """
+    Replace the recorder receiving events from pub.tools.entrez. Set None to stop measuring
+
+    >>> set_recorder(StatsRecorder())
+    """
+    global _recorder
+    _recorder = recorder
@@ -1,10 +1,12 @@
 import requests
 
+from . import transport
+
 PUBLIC_API = "https://pub.orcid.org/v3.0/"
 
 
 def get_author(orcid: str, full: bool = False) -> dict:
-    response = requests.get(f"{PUBLIC_API}{orcid}", headers={"Accept": "application/json"}, timeout=2.0)
+    response = transport.http_get(f"{PUBLIC_API}{orcid}", headers={"Accept": "application/json"}, timeout=2.0)
     if response.status_code != 200:
         raise requests.exceptions.HTTPError(f"REST API returned: {response.status_code}")
 
@@ -0,0 +1,334 @@
+"""
+Build records directly from EFetch PubMed XML with lxml.
+
+This is an alternative to letting Biopython build its DictElement tree, which `EntrezRecord.process` then has to
+walk again to convert back into plain strings. The values produced here are the same as the ones produced by
+`entrez._parse_entrez_record`, including the html escaping of titles and abstracts, so records from both parsers
+compare equal.
+"""
+
+from html import unescape
+from xml.sax.saxutils import escape as xml_escape
+
+from lxml import etree
+
+from .formatting import format_date_str
+from .schema import Abstract
+from .schema import BookRecord
+from .schema import ChapterRecord
+from .schema import Grant
+from .schema import JournalRecord
+from .schema import Person
+from .schema import Section
+from .schema import wanted
+
+ARTICLE_TAGS = ("PubmedArticle", "PubmedBookArticle")
+
+
+def _markup(element, parts: list[str], escape: bool, outer: bool) -> None:
+    """Serialize inline markup such as <i> the same way Biopython keeps it in a StringElement"""
+    if isinstance(element.tag, str):
+        qname = etree.QName(element)
+        attributes = dict(element.attrib)
+        if qname.namespace and outer:
+            attributes = {"xmlns": qname.namespace}
+        parts.append(f"<{qname.localname}")
+        for key, value in attributes.items():
+            parts.append(f' {key}="{value}"')
+        parts.append(">")
+        if element.text:
+            parts.append(xml_escape(element.text) if escape else element.text)
+        for child in element:
+            _markup(child, parts, escape, outer and not qname.namespace)
+        parts.append(f"</{qname.localname}>")
+    if element.tail:
+        parts.append(xml_escape(element.tail) if escape else element.tail)
+
+
+def _text(element, escape: bool) -> str:
+    """Text content of an element as Biopython's parser would give it"""
+    if element is None:
+        return ""
+    text = element.text or ""
+    if not len(element):
+        return xml_escape(text) if escape else text
+    parts = [xml_escape(text) if escape else text]
+    for child in element:
+        _markup(child, parts, escape, outer=True)
+    return "".join(parts)
+
+
+def _html(element, escape: bool) -> str:
+    """Value of a field that EntrezRecord.process leaves as html, i.e. title and abstract"""
+    return _text(element, escape)
+
+
+def _plain(element, escape: bool) -> str:
+    """Value of a field that EntrezRecord.process unescapes"""
+    if element is None:
+        return ""
+    if not len(element):
+        # escaping and unescaping plain text gives back the same text
+        return element.text or ""
+    return _finish(_text(element, escape), escape)
+
+
+def _finish(value: str, escape: bool) -> str:
+    return unescape(value) if escape else value
+
+
+def _date(element, escape: bool, tags: tuple[str, ...]) -> str:
+    if element is None:
+        return ""
+    parts = [_text(element.find(tag), escape) for tag in tags]
+    return _finish(format_date_str(" ".join([part for part in parts if part])), escape)
+
+
+def _person(element, escape: bool, investigator: bool = False, affiliations: bool = True) -> Person:
+    # a single pass over the children is noticeably faster than a find per field for long author lists
+    names = {}
+    identifiers = {}
+    affiliation_list = []
+    for child in element:
+        tag = child.tag
+        if tag == "Identifier":
+            identifiers[child.get("Source", "")] = _plain(child, escape)
+        elif tag == "AffiliationInfo":
+            if affiliations:
+                affiliation_list.extend(_plain(aff, escape) for aff in child.iterchildren("Affiliation"))
+        elif tag not in names:
+            names[tag] = child
+    fname = _plain(names.get("ForeName"), escape)
+    return Person(
+        last_name=_plain(names.get("LastName"), escape),
+        first_name=" ".join([part for part in fname.split(" ") if part]),
+        initial=_plain(names.get("Initials"), escape),
+        collective_name=_plain(names.get("CollectiveName"), escape),
+        suffix=_plain(names.get("Suffix"), escape),
+        investigator=investigator,
+        identifiers=identifiers,
+        affiliations=affiliation_list,
+    )
+
+
+def _article_ids(element, escape: bool) -> dict[str, str]:
+    if element is None:
+        return {}
+    return {aid.get("IdType", "pubmed"): _plain(aid, escape) for aid in element.iterfind("ArticleId")}
+
+
+def parse_journal_article(element, escape: bool = True, fields: frozenset[str] | None = None) -> JournalRecord:
+    """
+    Build a JournalRecord from a PubmedArticle element
+
+    :param element: PubmedArticle lxml element
+    :param escape: if true, title and abstract are returned as html
+    :param fields: only fill in these fields, see `schema.projection`
+    :return: publication record
+    """
+    medline = element.find("MedlineCitation")
+    medlineinfo = medline.find("MedlineJournalInfo")
+    article = medline.find("Article")
+    journal = article.find("Journal")
+    issue = journal.find("JournalIssue")
+    pubmed_data = element.find("PubmedData")
+
+    # with a projection, only build what is wanted
+    with_authors = wanted(fields, "authors")
+
+    authors = []
+    for author in article.iterfind("AuthorList/Author") if with_authors else ():
+        if author.get("ValidYN", "Y") == "Y":
+            authors.append(_person(author, escape))
+    # only the first list is used, and investigator affiliations are not kept
+    investigators = medline.find("InvestigatorList") if with_authors else None
+    if investigators is not None:
+        for investigator in investigators.iterfind("Investigator"):
+            if investigator.get("ValidYN", "Y") == "Y":
+                authors.append(_person(investigator, escape, investigator=True, affiliations=False))
+
+    grants = [
+        Grant(
+            grantid=_plain(grant.find("GrantID"), escape),
+            acronym=_plain(grant.find("Acronym"), escape),
+            agency=_plain(grant.find("Agency"), escape),
+        )
+        for grant in (article.iterfind("GrantList/Grant") if wanted(fields, "grants") else ())
+    ]
+
+    edate = ""
+    for adate in article.iterfind("ArticleDate"):
+        if adate.get("DateType", "Electronic") == "Electronic":
+            edate = _date(adate, escape, ("MedlineDate", "Year", "Season", "Month", "Day"))
+
+    abstracts = [
+        Abstract(
+            text=_html(abst, escape),
+            nlmcategory=abst.get("NlmCategory", ""),
+            label=abst.get("Label", ""),
+        )
+        for abst in (article.iterfind("Abstract/AbstractText") if wanted(fields, "abstract") else ())
+    ]
+
+    record = JournalRecord(
+        title=_html(article.find("ArticleTitle"), escape),
+        abstract=abstracts,
+        pmid=_plain(medline.find("PMID"), escape),
+        pubstatus=_plain(pubmed_data.find("PublicationStatus"), escape),
+        article_ids=_article_ids(pubmed_data.find("ArticleIdList"), escape),
+        authors=authors,
+        edate=edate,
+        grants=grants,
+        issue=_plain(issue.find("Issue"), escape),
+        volume=_plain(issue.find("Volume"), escape),
+        journal=_plain(journal.find("Title"), escape),
+        medium=issue.get("CitedMedium", ""),
+        medlinecountry=_plain(medlineinfo.find("Country"), escape),
+        medlinestatus=medline.get("Status", ""),
+        journal_abbreviation=_plain(medlineinfo.find("MedlineTA"), escape),
+        mesh=[_plain(mesh, escape) for mesh in medline.iterfind("MeshHeadingList/MeshHeading/DescriptorName")]
+        if wanted(fields, "mesh")
+        else [],
+        nlmuniqueid=_plain(medlineinfo.find("NlmUniqueID"), escape),
+        pagination=_plain(article.find("Pagination/MedlinePgn"), escape),
+        # the Biopython parser never fills these in, keep the records identical
+        pmpubdates={},
+        pubdate=_date(issue.find("PubDate"), escape, ("MedlineDate", "Year", "Season", "Month", "Day")),
+        pubmodel=article.get("PubModel", ""),
+        pubtypelist=[_plain(pubtype, escape) for pubtype in article.iterfind("PublicationTypeList/PublicationType")],
+    )
+    if fields is not None:
+        record.project(fields)
+    return record
+
+
+def parse_book_article(
+    element, escape: bool = True, fields: frozenset[str] | None = None
+) -> BookRecord | ChapterRecord:
+    """
+    Build a BookRecord or ChapterRecord from a PubmedBookArticle element
+
+    :param element: PubmedBookArticle lxml element
+    :param escape: if true, title and abstract are returned as html
+    :param fields: only fill in these fields, see `schema.projection`
+    :return: publication record
+    """
+    document = element.find("BookDocument")
+    book = document.find("Book")
+
+    # the Biopython parser adds editors to the authors and leaves editors empty, keep the records identical
+    with_authors = wanted(fields, "authors")
+    authors = []
+    author_list = document.find("AuthorList")
+    if with_authors and author_list is not None and author_list.get("Type") == "authors":
+        authors.extend(_person(author, escape) for author in author_list.iterfind("Author"))
+    editor_list = book.find("AuthorList")
+    if with_authors and editor_list is not None and editor_list.get("Type") == "editors":
+        authors.extend(_person(author, escape) for author in editor_list.iterfind("Author"))
+
+    language = document.find("Language")
+    abstract = document.find("Abstract/AbstractText")
+    locationlabel = document.find("LocationLabel")
+    isbn = book.find("Isbn")
+
+    publisher = pubplace = ""
+    if (publisher_element := book.find("Publisher")) is not None:
+        publisher = _plain(publisher_element.find("PublisherName"), escape)
+        pubplace = _plain(publisher_element.find("PublisherLocation"), escape)
+
+    sections = []
+    for section in document.iterfind("Sections/Section") if wanted(fields, "sections") else ():
+        label = section.find("LocationLabel")
+        sections.append(
+            Section(
+                title=_plain(section.find("SectionTitle"), escape),
+                section_type=label.get("Type", "") if label is not None else "",
+                label=_plain(label, escape),
+            )
+        )
+
+    kwargs = {
+        "authors": authors,
+        "volume": _plain(book.find("Volume"), escape),
+        "pubdate": _date(book.find("PubDate"), escape, ("Year", "Season", "Month", "Day")),
+        "pmid": _plain(document.find("PMID"), escape),
+        "medium": _plain(book.find("Medium"), escape),
+        "abstract": [Abstract(text=_html(abstract, escape), nlmcategory="", label="")]
+        if wanted(fields, "abstract")
+        else [],
+        "language": _plain(language, escape) if language is not None else [],
+        "editors": [],
+        "publisher": publisher,
+        "pubplace": pubplace,
+        "volumetitle": _plain(book.find("VolumeTitle"), escape),
+        "edition": _plain(book.find("Edition"), escape),
+        "series": _plain(book.find("CollectionTitle"), escape),
+        "isbn": _plain(isbn, escape) if isbn is not None else [],
+        "elocation": [_plain(elocation, escape) for elocation in book.iterfind("ELocationID")],
+        "reportnum": _plain(book.find("ReportNumber"), escape),
+        "sections": sections,
+        "article_ids": _article_ids(document.find("ArticleIdList"), escape),
+    }
+    if locationlabel is not None and locationlabel.get("Type") == "chapter":
+        record = ChapterRecord(
+            title=_html(document.find("ArticleTitle"), escape),
+            booktitle=_plain(book.find("BookTitle"), escape),
+            **kwargs,
+        )
+    else:
+        record = BookRecord(title=_html(book.find("BookTitle"), escape), **kwargs)
+    if fields is not None:
+        record.project(fields)
+    return record
+
+
+def parse_article(
+    element, escape: bool = True, fields: frozenset[str] | None = None
+) -> JournalRecord | BookRecord | ChapterRecord | None:
+    """
+    Build a record from a PubmedArticle or PubmedBookArticle element, the equivalent of
+    `entrez._parse_entrez_record`
+
+    :param element: lxml element
+    :param escape: if true, title and abstract are returned as html
+    :param fields: only fill in these fields, see `schema.projection`
+    :return: publication record, or None if the element has no PubMed data
+    """
+    if element.tag == "PubmedArticle" and element.find("PubmedData") is not None:
+        return parse_journal_article(element, escape, fields)
+    if element.tag == "PubmedBookArticle" and element.find("PubmedBookData") is not None:
+        return parse_book_article(element, escape, fields)
+    return None
+
+
+def iterelements(source, tags: tuple[str, ...] = ARTICLE_TAGS):
+    """
+    Incrementally parse XML, yielding each element with one of `tags` as soon as it has been read. Once the
+    caller asks for the next one, the element and everything before it are discarded, so memory use does not
+    grow with the size of the source.
+
+    :param source: file name or binary stream
+    :param tags: tags of the elements to return, articles by default
+    :return: generator of lxml elements
+    """
+    for _, element in etree.iterparse(source, events=("end",), tag=tags, huge_tree=True):
+        yield element
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def iterparse(source, escape: bool = True, fields: frozenset[str] | None = None):
+    """
+    Incrementally parse EFetch XML, yielding a record as soon as each article has been read. Articles that
+    have been parsed are discarded, so memory use does not grow with the size of the source.
+
+    :param source: file name or binary stream of a PubmedArticleSet
+    :param escape: if true, title and abstract are returned as html
+    :param fields: only fill in these fields, see `schema.projection`
+    :return: generator of publication records
+    """
+    for element in iterelements(source):
+        record = parse_article(element, escape, fields)
+        if record:
+            yield record
@@ -0,0 +1,149 @@
+import dataclasses
+import json
+import logging
+import os
+import threading
+import time
+
+from Bio import Entrez
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger("pub.tools")
+
+
+@dataclasses.dataclass
+class RateLimiterStats:
+    """How long callers have waited on a rate limiter"""
+
+    calls: int = 0
+    delayed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.calls if self.calls else 0.0
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread in this process. Each call to `acquire` reserves one request, sleeping
+    until the bucket allows it.
+
+    :param rate: requests per second. Defaults to config.RATE_LIMIT, or the NCBI limit of 10 with an
+                 API key and 3 without
+    :param burst: number of requests that may be made back to back after a quiet period
+    """
+
+    def __init__(self, rate: float | None = None, burst: int = 1) -> None:
+        self._rate = rate
+        self.burst = burst
+        self.stats = RateLimiterStats()
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = time.time()
+
+    @property
+    def rate(self) -> float:
+        if self._rate:
+            return self._rate
+        if config.RATE_LIMIT:
+            return config.RATE_LIMIT
+        return 10.0 if Entrez.api_key else 3.0
+
+    def _reserve(self, tokens: float, last: float, now: float) -> tuple[float, float]:
+        """Take one token from a bucket with `tokens` left at time `last`. Returns new token count and wait"""
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate) - 1
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, wait
+
+    def reserve(self) -> float:
+        """Reserve a request and return how long the caller has to wait before making it"""
+        with self._lock:
+            now = time.time()
+            self._tokens, wait = self._reserve(self._tokens, self._last, now)
+            self._last = now
+        return wait
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be made
+
+        :return: seconds waited
+        """
+        wait = self.reserve()
+        if wait > 0:
+            logger.debug(f"Rate limited, waiting {wait:.03}s")
+            time.sleep(wait)
+        self._record(wait)
+        return wait
+
+    def _record(self, wait: float) -> None:
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.total_wait += wait
+            if wait > 0:
+                self.stats.delayed += 1
+                self.stats.max_wait = max(self.stats.max_wait, wait)
+
+
+class FileRateLimiter(RateLimiter):
+    """
+    Token bucket stored in a file, so every process on a host that points to the same path shares one budget.
+    The file is locked with `flock` while a request is reserved, so this is only available on POSIX systems and
+    raises RuntimeError elsewhere. Stats only cover the waits of this process.
+
+    :param path: state file, created if it does not exist
+    :param rate: requests per second, see `RateLimiter`
+    :param burst: number of requests that may be made back to back after a quiet period
+    """
+
+    def __init__(self, path: str, rate: float | None = None, burst: int = 1) -> None:
+        if fcntl is None:
+            raise RuntimeError("FileRateLimiter requires fcntl, which is not available on this platform")
+        super().__init__(rate=rate, burst=burst)
+        self.path = path
+
+    def reserve(self) -> float:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                now = time.time()
+                try:
+                    state = json.loads(os.read(fd, 1024) or b"{}")
+                except ValueError:
+                    state = {}
+                tokens, wait = self._reserve(state.get("tokens", float(self.burst)), state.get("last", now), now)
+                data = json.dumps({"tokens": tokens, "last": now}).encode("utf-8")
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                os.close(fd)  # also releases the lock
+        return wait
+
+
+_limiter = RateLimiter()
+
+
+def get_limiter() -> RateLimiter:
+    """Rate limiter used by every request in pub.tools.entrez"""
+    return _limiter
+
+
+def set_limiter(limiter: RateLimiter) -> None:
+    """
+    Replace the rate limiter used by every request in pub.tools.entrez. To share a budget between processes,
+    such as web server workers and a harvester on the same host, use a FileRateLimiter with a common path
+
+    >>> set_limiter(FileRateLimiter("/var/tmp/pub.tools.ratelimit"))
+    """
+    global _limiter
+    _limiter = limiter
@@ -0,0 +1,221 @@
+"""
+Record responses from NCBI and other web services to a fixture store, and serve them back later without a
+network. Benchmarks and tests then give the same results on every run, including on hosts with no internet
+access.
+
+Both transports replace the current transport, see `pub.tools.transport`. Replay can also be turned on by
+setting the PUB_TOOLS_REPLAY environment variable to the store directory before importing pub.tools.
+PUB_TOOLS_REPLAY_MODE can be "replay" (the default) or "record", and PUB_TOOLS_REPLAY_LATENCY sets the
+simulated latency in seconds.
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .transport import Transport
+from .transport import UrllibTransport
+
+logger = logging.getLogger("pub.tools")
+
+# parameters that identify the caller rather than the request, left out when matching requests
+VOLATILE_PARAMS = ("email", "tool", "api_key")
+
+
+class ReplayMissError(LookupError):
+    """Raised when a request has no recorded response"""
+
+
+def _strip_params(query: str) -> str:
+    params = [(key, value) for key, value in urllib.parse.parse_qsl(query) if key not in VOLATILE_PARAMS]
+    return urllib.parse.urlencode(sorted(params))
+
+
+def request_key(method: str, url: str, body: bytes | None = None) -> str:
+    """
+    Identify a request, ignoring the order of its parameters and the ones that only identify the caller
+
+    :param method: HTTP method
+    :param url: full URL, with its query string
+    :param body: POST body, if any
+    :return: hex digest
+    """
+    parts = urllib.parse.urlsplit(url)
+    normalized = [method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}", _strip_params(parts.query)]
+    if body:
+        normalized.append(_strip_params(body.decode("utf-8")))
+    return hashlib.sha256("\n".join(normalized).encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """
+    Directory of recorded responses, one gzip compressed JSON file per request
+
+    :param path: directory, created if it does not exist
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json.gz")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+    def __len__(self) -> int:
+        return len([name for name in os.listdir(self.path) if name.endswith(".json.gz")])
+
+    def get(self, key: str) -> dict | None:
+        """
+        Get a recorded response
+
+        :param key: see `request_key`
+        :return: dict with url, status, headers and content, or None if nothing was recorded
+        """
+        try:
+            with gzip.open(self._file(key), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        data["content"] = base64.b64decode(data["content"])
+        return data
+
+    def set(self, key: str, url: str, status: int, headers: dict, content: bytes) -> None:
+        """Record a response, replacing any earlier one"""
+        data = {
+            "url": url,
+            "status": status,
+            "headers": dict(headers),
+            "content": base64.b64encode(content).decode("ascii"),
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, gzip.open(f, "wt", encoding="utf-8") as gz:
+                json.dump(data, gz)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def _response(url: str, status: int, headers: dict, content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
+
+
+def _handle(headers: dict, content: bytes):
+    """File-like E-utilities response, text for text/plain like Bio.Entrez returns"""
+    handle = io.BytesIO(content)
+    if CaseInsensitiveDict(headers).get("Content-Type", "").startswith("text/plain"):
+        return io.TextIOWrapper(handle, encoding="UTF-8")
+    return handle
+
+
+# only these response headers are kept, the rest vary between requests
+KEPT_HEADERS = ("Content-Type",)
+
+
+class RecordingTransport(Transport):
+    """
+    Send requests with another transport and record every response to a fixture store
+
+    :param store: fixture store, or its directory
+    :param transport: transport that makes the requests, defaults to UrllibTransport
+    """
+
+    def __init__(self, store: FixtureStore | str, transport: Transport | None = None) -> None:
+        self.store = FixtureStore(store) if isinstance(store, str) else store
+        self.transport = transport or UrllibTransport()
+
+    def open(self, request: urllib.request.Request):
+        handle = self.transport.open(request)
+        try:
+            content = handle.read()
+            headers = getattr(handle, "headers", None) or {}
+            headers = {name: headers[name] for name in KEPT_HEADERS if headers.get(name)}
+        finally:
+            handle.close()
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+            headers.setdefault("Content-Type", "text/plain")
+        key = request_key(request.get_method(), request.full_url, request.data)
+        self.store.set(key, request.full_url, 200, headers, content)
+        return _handle(headers, content)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        response = self.transport.get(url, **kwargs)
+        full_url = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        self.store.set(request_key("GET", full_url), full_url, response.status_code, headers, response.content)
+        return response
+
+
+class ReplayTransport(Transport):
+    """
+    Serve recorded responses without a network. A request that was not recorded raises ReplayMissError.
+
+    :param store: fixture store, or its directory
+    :param latency: seconds to wait before each response, to simulate the network
+    :param bytes_per_second: if set, also wait as long as the response would take to download at this rate
+    """
+
+    rate_limited = False
+
+    def __init__(self, store: FixtureStore | str, latency: float = 0.0, bytes_per_second: float | None = None) -> None:
+        self.store = FixtureStore(store) if isinstance(store, str) else store
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+
+    def _replay(self, method: str, url: str, body: bytes | None = None) -> dict:
+        data = self.store.get(request_key(method, url, body))
+        if data is None:
+            raise ReplayMissError(f"No recorded response for {method} {url}")
+        delay = self.latency
+        if self.bytes_per_second:
+            delay += len(data["content"]) / self.bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+    def open(self, request: urllib.request.Request):
+        data = self._replay(request.get_method(), request.full_url, request.data)
+        if data["status"] != 200:
+            raise urllib.error.HTTPError(request.full_url, data["status"], "Recorded error", None, None)
+        return _handle(data["headers"], data["content"])
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        full_url = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+        data = self._replay("GET", full_url)
+        return _response(full_url, data["status"], data["headers"], data["content"])
+
+
+def from_environment() -> Transport:
+    """Transport set up by the PUB_TOOLS_REPLAY, PUB_TOOLS_REPLAY_MODE and PUB_TOOLS_REPLAY_LATENCY variables"""
+    path = os.environ["PUB_TOOLS_REPLAY"]
+    mode = os.environ.get("PUB_TOOLS_REPLAY_MODE", "replay")
+    if mode == "record":
+        logger.info(f"Recording responses to {path}")
+        return RecordingTransport(path)
+    if mode != "replay":
+        raise ValueError(f"PUB_TOOLS_REPLAY_MODE must be record or replay, not {mode}")
+    logger.info(f"Replaying responses from {path}")
+    return ReplayTransport(path, latency=float(os.environ.get("PUB_TOOLS_REPLAY_LATENCY", 0)))
@@ -101,8 +101,18 @@ class EntrezRecord:
     abstract: list[Abstract] = dataclasses.field(default_factory=list)
     article_ids: dict[str, str] = dataclasses.field(default_factory=dict)
 
-    def asdict(self):
+    # only the fields needed for citations were filled in, see `entrez.get_publication_summaries`
+    partial: bool = False
+
+    def _asdict(self) -> dict:
+        """dataclasses.asdict, with `partial` only when it is set, so complete records keep the keys they had"""
         base = dataclasses.asdict(self)
+        if not self.partial:
+            del base["partial"]
+        return base
+
+    def asdict(self):
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
         base.update(**dict(self.article_ids))
@@ -113,6 +123,23 @@ class EntrezRecord:
             return getattr(self, item)
         raise KeyError(item)
 
+    def project(self, fields: frozenset[str]) -> None:
+        """
+        Reset every field not in `fields` to its empty value and flag the record as partial. The PMID is kept
+
+        :param fields: names of the fields to keep, see `projection`
+        """
+        for field in dataclasses.fields(self):
+            if field.name in fields or field.name in ("pmid", "partial"):
+                continue
+            if field.default_factory is not dataclasses.MISSING:
+                setattr(self, field.name, field.default_factory())
+            elif field.default is not dataclasses.MISSING:
+                setattr(self, field.name, field.default)
+            else:
+                setattr(self, field.name, [] if field.name == "authors" else "")
+        self.partial = True
+
     def process(self, escape=False):
         """
         This should be called after instantiation. This removes the Biopython StringElement class and
@@ -171,7 +198,7 @@ class JournalRecord(EntrezRecord):
     pub_type = "journal"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["medlineta"] = self.medlineta
         base["doi"] = self.doi
         base["pmc"] = self.pmc
@@ -235,7 +262,7 @@ class BookRecord(EntrezRecord):
     pub_type = "book"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["editors"] = [a.asdict() for a in self.editors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
@@ -250,7 +277,7 @@ class ChapterRecord(BookRecord):
     pub_type = "chapter"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
         base["pub_type"] = self.pub_type
@@ -268,7 +295,7 @@ class ConferenceRecord(EntrezRecord):
     pub_type = "conference"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["editors"] = [a.asdict() for a in self.editors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
@@ -287,7 +314,7 @@ class MonographRecord(EntrezRecord):
     pub_type = "monograph"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
         base["pub_type"] = self.pub_type
@@ -305,8 +332,32 @@ class ReportRecord(EntrezRecord):
     pub_type = "report"
 
     def asdict(self):
-        base = dataclasses.asdict(self)
+        base = self._asdict()
         base["authors"] = [a.asdict() for a in self.authors if a]
         base["abstract"] = [dataclasses.asdict(a) for a in self.abstract]
         base["pub_type"] = self.pub_type
         return base
+
+
+# every field a record from PubMed can have
+RECORD_FIELDS = frozenset(field.name for klass in (JournalRecord, ChapterRecord) for field in dataclasses.fields(klass))
+
+
+def projection(fields: list[str] | None) -> frozenset[str] | None:
+    """
+    Check the record fields asked for, such as ["title", "mesh"]. The PMID is always included
+
+    :param fields: record field names, or None for every field
+    :return: the names as a frozenset, or None for every field
+    """
+    if fields is None:
+        return None
+    fields = frozenset([fields] if isinstance(fields, str) else fields)
+    if unknown := fields - RECORD_FIELDS:
+        raise ValueError(f"Unknown record fields: {', '.join(sorted(unknown))}")
+    return fields | {"pmid"}
+
+
+def wanted(fields: frozenset[str] | None, name: str) -> bool:
+    """Whether a field is part of a projection"""
+    return fields is None or name in fields
@@ -0,0 +1,176 @@
+"""
+Incremental refresh of a local copy of PubMed records. Instead of fetching every tracked PMID again, ask ESearch
+which records were modified (or added) since the last run and only fetch the tracked ones among them.
+"""
+
+import datetime
+import json
+import logging
+import math
+import os
+import tempfile
+
+from Bio import Entrez
+
+from . import cache
+from . import config
+from . import entrez
+
+logger = logging.getLogger("pub.tools")
+
+DATETYPES = ("mdat", "edat")
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def read_watermark(path: str, datetype: str = "mdat") -> str | None:
+    """
+    Date of the last completed sync
+
+    :param path: JSON watermark file
+    :param datetype: "mdat" or "edat"
+    :return: YYYY/MM/DD date, or None if no sync has completed yet
+    """
+    try:
+        with open(path) as f:
+            return json.load(f).get(datetype)
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(path: str, date: str, datetype: str = "mdat") -> None:
+    """
+    Store the date of a completed sync. The file is replaced atomically, so a crash never leaves it half written
+
+    :param path: JSON watermark file
+    :param date: YYYY/MM/DD date
+    :param datetype: "mdat" or "edat"
+    """
+    try:
+        with open(path) as f:
+            watermarks = json.load(f)
+    except FileNotFoundError:
+        watermarks = {}
+    watermarks[datetype] = date
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(watermarks, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _post_tracked(tracked: list[str]) -> list[tuple[str, str]]:
+    """EPost the tracked PMIDs config.ESEARCH_MAX_RESULTS at a time, returning the WebEnv and QueryKey of each part"""
+    posted = []
+    for start in range(0, len(tracked), config.ESEARCH_MAX_RESULTS):
+        handle = entrez._eutil("epost", db="pubmed", id=",".join(tracked[start : start + config.ESEARCH_MAX_RESULTS]))
+        try:
+            result = Entrez.read(handle)
+        finally:
+            handle.close()
+        posted.append((result["WebEnv"], result["QueryKey"]))
+    return posted
+
+
+def _search_posted(posted: list[tuple[str, str]], since: str, until: str, datetype: str) -> set[str]:
+    """Search the changes among each posted part. A part has no more PMIDs than ESearch returns"""
+    changed = set()
+    for web_env, query_key in posted:
+        _, ids = entrez._esearch_ids(
+            f"#{query_key} AND all[sb]", datetype, since, until, config.ESEARCH_MAX_RESULTS, web_env
+        )
+        changed.update(ids)
+    return changed
+
+
+def find_changed_pmids(pmids: list, since: str, until: str | None = None, datetype: str = "mdat") -> list[str]:
+    """
+    Find which of the tracked PMIDs changed between two dates, inclusive, with as few requests as possible.
+
+    A single ESearch for everything that changed is tried first. If more records changed than ESearch can
+    return, the date range is searched in windows that each fit, see `entrez.iter_pmids`, and the results are
+    compared with the tracked PMIDs here. When that would take more requests than sending the tracked PMIDs
+    to the history server with EPost, config.ESEARCH_MAX_RESULTS at a time, they are sent and the changes are
+    searched among each part. The same is done for a single day with more changes than ESearch returns, as
+    when MeSH headings are updated.
+
+    :param pmids: tracked PMIDs
+    :param since: YYYY/MM/DD start date
+    :param until: YYYY/MM/DD end date, defaults to today
+    :param datetype: "mdat" for modified records or "edat" for records added to PubMed
+    :return: changed PMIDs, in the order they were given
+    """
+    if datetype not in DATETYPES:
+        raise ValueError(f"datetype must be one of {', '.join(DATETYPES)}, not {datetype!r}")
+    until = until or datetime.date.today().strftime(DATE_FORMAT)
+    tracked = list(dict.fromkeys(str(pmid) for pmid in pmids))
+    if not tracked:
+        return []
+    count, ids = entrez._esearch_ids("all[sb]", datetype, since, until, config.ESEARCH_MAX_RESULTS)
+    windows = math.ceil(count / config.ESEARCH_MAX_RESULTS)
+    # an EPost and an ESearch for each part of the tracked PMIDs
+    posts = 2 * math.ceil(len(tracked) / config.ESEARCH_MAX_RESULTS)
+    if count <= len(ids):
+        logger.info(f"{count} publications changed since {since}")
+        changed = set(ids)
+    elif windows > posts:
+        logger.info(f"{count} publications changed since {since}, searching among {len(tracked)} tracked PMIDs")
+        changed = _search_posted(_post_tracked(tracked), since, until, datetype)
+    else:
+        logger.info(f"{count} publications changed since {since}, searching them in {windows} or more windows")
+        wanted = set(tracked)
+        changed = set()
+        posted = None
+        for window, found, ids in entrez._iter_windows("all[sb]", since, until, datetype):
+            changed.update(pmid for pmid in ids if pmid in wanted)
+            if found > len(ids):
+                day = window[0].strftime(DATE_FORMAT)
+                logger.info(f"{found} publications changed on {day}, searching among {len(tracked)} tracked PMIDs")
+                posted = posted or _post_tracked(tracked)
+                changed.update(_search_posted(posted, day, day, datetype))
+    return [pmid for pmid in tracked if pmid in changed]
+
+
+def sync_publications(
+    pmids: list,
+    path: str,
+    datetype: str = "mdat",
+    overlap: int = 1,
+    escape: bool = True,
+    stream: bool = False,
+    parser: str | None = None,
+):
+    """
+    Fetch the tracked publications that changed since the watermark stored in `path`. Without a watermark
+    every tracked publication is fetched. The watermark is moved forward once all changed publications have
+    been returned, so an interrupted sync is repeated in full on the next run.
+
+    Changed records are removed from the record cache, if one is set, before they are fetched again.
+
+    >>> for record in sync_publications(tracked_pmids, "/var/lib/pub.tools/sync.json"):
+    ...     save(record)
+
+    :param pmids: tracked PMIDs
+    :param path: JSON watermark file, created on the first completed sync
+    :param datetype: "mdat" for modified records or "edat" for records added to PubMed
+    :param overlap: days before the watermark to search again, to allow for NCBI dates being in US Eastern time
+    :param escape: used by Entrez.read. If true, will return as html
+    :param stream: parse and return one publication at a time, see `entrez.get_publications`
+    :param parser: "biopython" or "lxml", defaults to config.PARSER
+    :return: generator of changed publication records
+    """
+    today = datetime.date.today()
+    watermark = read_watermark(path, datetype)
+    if watermark is None:
+        logger.info(f"No {datetype} watermark in {path}, fetching all tracked publications")
+        changed = list(dict.fromkeys(str(pmid) for pmid in pmids))
+    else:
+        since = datetime.datetime.strptime(watermark, DATE_FORMAT).date() - datetime.timedelta(days=overlap)
+        changed = find_changed_pmids(pmids, since.strftime(DATE_FORMAT), today.strftime(DATE_FORMAT), datetype)
+    record_cache = cache.get_cache()
+    if record_cache is not None and changed:
+        record_cache.delete(changed)
+    yield from entrez.get_publications(changed, escape=escape, stream=stream, parser=parser)
+    write_watermark(path, today.strftime(DATE_FORMAT), datetype)
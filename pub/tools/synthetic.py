@@ -0,0 +1,376 @@
+"""
+Generate PubmedArticleSet XML of any size for benchmarks and stress tests. Articles are made up, but they have
+the structure of real EFetch XML: authors with affiliations and ORCIDs, structured abstracts, MeSH headings,
+grants, MedlineDate and Season dates, the occasional consortium with thousands of investigators, and book and
+chapter records. The same seed always gives the same corpus.
+"""
+
+import dataclasses
+import datetime
+import gzip
+import random
+from collections.abc import Iterator
+from xml.sax.saxutils import escape
+
+HEADER = (
+    '<?xml version="1.0" ?>\n'
+    '<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" '
+    '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">\n'
+    "<PubmedArticleSet>\n"
+)
+FOOTER = "</PubmedArticleSet>\n"
+
+WORDS = (
+    "analysis association breast cancer cell clinical cohort disease effect evaluation expression factor "
+    "gene health incidence infection model mortality outcome patient population protein randomized "
+    "receptor response risk screening study survival therapy treatment trial tumor women children adults "
+    "chronic acute novel prospective retrospective national registry surveillance genomic pathway "
+    "inflammation metabolic"
+)
+MARKUP = ("<i>in vitro</i>", "<i>BRCA1</i>", "CD4<sup>+</sup>", "CO<sub>2</sub>", "<b>p</b> &lt; 0.05")
+SPECIAL = ("α-synuclein", "Müller", "β-catenin", "&amp;", "Ångström", "naïve", "Schrödinger")  # noqa: RUF001
+LAST_NAMES = (
+    "Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez Gonzalez "
+    "Wilson Anderson Thomas Taylor Moore Jackson Martin Lee Perez Thompson White Harris Sanchez Clark "
+    "Ramirez Lewis Robinson Walker Young Allen King Wright Scott Torres Nguyen Hill Flores Green Adams "
+    "Nelson Baker Hall Rivera Campbell Mitchell Carter Roberts Müller Schmidt Novák Kowalski Rossi Dubois "
+    "Tanaka Suzuki Wang Li Zhang Kim"
+)
+FIRST_NAMES = (
+    "James Mary Robert Patricia John Jennifer Michael Linda David Elizabeth William Barbara Richard Susan "
+    "Joseph Jessica Thomas Sarah Charles Karen Maria José Anne-Marie Jean-Luc Hiroshi Wei Min-Jun Zoë "
+    "Søren Ana"
+)
+SUFFIXES = ("Jr", "Sr", "2nd", "3rd")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+SEASONS = ("Spring", "Summer", "Fall", "Winter")
+SECTIONS = ("BACKGROUND", "OBJECTIVE", "METHODS", "RESULTS", "CONCLUSIONS")
+AGENCIES = ("NCI NIH HHS", "NHLBI NIH HHS", "Wellcome Trust", "Medical Research Council", "NIA NIH HHS")
+COUNTRIES = ("United States", "United Kingdom", "England", "Germany", "Japan", "China")
+JOURNALS = (
+    ("Journal of clinical oncology", "J Clin Oncol", "0732-183X", "8309333"),
+    ("The New England journal of medicine", "N Engl J Med", "0028-4793", "0255562"),
+    ("Cancer epidemiology, biomarkers & prevention", "Cancer Epidemiol Biomarkers Prev", "1055-9965", "9200608"),
+    ("PloS one", "PLoS One", "1932-6203", "101285081"),
+    ("Nature", "Nature", "0028-0836", "0410462"),
+)
+PUBLISHERS = (
+    ("National Center for Biotechnology Information (US)", "Bethesda (MD)"),
+    ("University of Washington, Seattle", "Seattle (WA)"),
+    ("StatPearls Publishing", "Treasure Island (FL)"),
+)
+
+
+@dataclasses.dataclass
+class CorpusProfile:
+    """
+    Shape of a generated corpus. Counts are (low, high) ranges drawn from uniformly, and rates are the share of
+    articles that get a feature. The defaults roughly follow PubMed.
+
+    :param authors: authors per article
+    :param investigators: investigators per article, on top of consortia
+    :param consortium_rate: share of articles with a consortium of `consortium_size` investigators, like 22606070
+    :param consortium_size: investigators in a consortium
+    :param abstract_rate: share of articles with an abstract
+    :param abstract_sections: sections of a structured abstract. 0 or 1 gives a plain abstract
+    :param mesh: MeSH headings per article
+    :param grants: grants per article
+    :param medline_date_rate: share of publication dates given as a MedlineDate such as "2012 Dec-2013 Jan"
+    :param season_rate: share of publication dates with a Season instead of a month
+    :param markup_rate: share of titles and abstract sections with inline markup and non-ASCII characters
+    :param book_rate: share of records that are books or book chapters
+    :param chapter_rate: share of book records that are chapters
+    :param years: publication years
+    :param references: earlier articles of the corpus cited by each article, as in the PubMed ReferenceList
+    :param revised: date of the first DateRevised and how many articles are revised each day from then on, in
+                    PMID order. By default an article is revised within a year of its publication
+    """
+
+    authors: tuple[int, int] = (1, 12)
+    investigators: tuple[int, int] = (0, 0)
+    consortium_rate: float = 0.001
+    consortium_size: int = 2000
+    abstract_rate: float = 0.85
+    abstract_sections: tuple[int, int] = (0, 5)
+    mesh: tuple[int, int] = (0, 15)
+    grants: tuple[int, int] = (0, 4)
+    medline_date_rate: float = 0.03
+    season_rate: float = 0.01
+    markup_rate: float = 0.05
+    book_rate: float = 0.01
+    chapter_rate: float = 0.7
+    years: tuple[int, int] = (1975, 2025)
+    references: tuple[int, int] = (0, 0)
+    revised: tuple[datetime.date, int] | None = None
+
+
+class _Generator:
+    def __init__(self, profile: CorpusProfile, seed: int, first_pmid: int = 1) -> None:
+        self.profile = profile
+        self.first_pmid = first_pmid
+        self.random = random.Random(seed)  # noqa: S311
+        self.words_list = WORDS.split()
+        self.last_names = LAST_NAMES.split()
+        self.first_names = FIRST_NAMES.split()
+
+    def count(self, bounds: tuple[int, int]) -> int:
+        return self.random.randint(*bounds)
+
+    def chance(self, rate: float) -> bool:
+        return self.random.random() < rate
+
+    def words(self, low: int, high: int, markup: bool = False) -> str:
+        words = [escape(word) for word in self.random.choices(self.words_list, k=self.random.randint(low, high))]
+        if markup and self.chance(self.profile.markup_rate):
+            words.insert(self.random.randrange(len(words) + 1), self.random.choice(MARKUP))
+            words.insert(self.random.randrange(len(words) + 1), self.random.choice(SPECIAL))
+        return " ".join(words)
+
+    def sentence(self, low: int, high: int, markup: bool = False) -> str:
+        text = self.words(low, high, markup)
+        return f"{text[:1].upper()}{text[1:]}."
+
+    def name(self, tag: str, index: int, orcid_rate: float = 0.3) -> str:
+        last = self.random.choice(self.last_names)
+        first = self.random.choice(self.first_names)
+        initials = "".join(part[0] for part in first.replace("-", " ").split())
+        parts = [f"<LastName>{last}</LastName><ForeName>{first}</ForeName><Initials>{initials}</Initials>"]
+        if self.chance(0.01):
+            parts.append(f"<Suffix>{self.random.choice(SUFFIXES)}</Suffix>")
+        if self.chance(orcid_rate):
+            digits = f"{self.random.randrange(10**15):015d}"
+            parts.append(
+                f'<Identifier Source="ORCID">{digits[:4]}-{digits[4:8]}-{digits[8:12]}-{digits[12:]}X</Identifier>'
+            )
+        for _ in range(self.random.choice((0, 1, 1, 1, 2))):
+            parts.append(
+                f"<AffiliationInfo><Affiliation>Department of {self.words(1, 2).title()}, University {index % 97}, "
+                f"{self.random.choice(COUNTRIES)}.</Affiliation></AffiliationInfo>"
+            )
+        return f'<{tag} ValidYN="Y">{"".join(parts)}</{tag}>'
+
+    def authors(self, tag: str, count: int) -> str:
+        people = []
+        for index in range(count):
+            if tag == "Author" and self.chance(0.02):
+                people.append(
+                    f'<Author ValidYN="Y"><CollectiveName>{self.words(2, 4).title()} Group</CollectiveName></Author>'
+                )
+            else:
+                people.append(self.name(tag, index, 0.3 if tag == "Author" else 0.05))
+        return "".join(people)
+
+    def pubdate(self, year: int, oddities: bool = True) -> str:
+        month = self.random.randrange(12)
+        if oddities and self.chance(self.profile.medline_date_rate):
+            value = self.random.choice((
+                f"{year} {MONTHS[month]}-{MONTHS[(month + 1) % 12]}",
+                f"{year}-{year + 1}",
+                f"{year} {self.random.choice(SEASONS)}",
+                f"{year} Dec-{year + 1} Jan",
+                f"{year} {MONTHS[month]} {self.random.randint(1, 14)}-{self.random.randint(15, 28)}",
+            ))
+            return f"<PubDate><MedlineDate>{value}</MedlineDate></PubDate>"
+        if oddities and self.chance(self.profile.season_rate):
+            return f"<PubDate><Year>{year}</Year><Season>{self.random.choice(SEASONS)}</Season></PubDate>"
+        parts = [f"<Year>{year}</Year>"]
+        if self.chance(0.9):
+            parts.append(f"<Month>{MONTHS[month]}</Month>")
+            if self.chance(0.5):
+                parts.append(f"<Day>{self.random.randint(1, 28)}</Day>")
+        return f"<PubDate>{''.join(parts)}</PubDate>"
+
+    def date(self, tag: str, year: int, attributes: str = "") -> str:
+        return (
+            f"<{tag}{attributes}><Year>{year}</Year><Month>{self.random.randint(1, 12):02d}</Month>"
+            f"<Day>{self.random.randint(1, 28):02d}</Day></{tag}>"
+        )
+
+    def abstract(self) -> str:
+        if not self.chance(self.profile.abstract_rate):
+            return ""
+        sections = self.count(self.profile.abstract_sections)
+        if sections <= 1:
+            return f"<Abstract><AbstractText>{self.sentence(40, 200, True)}</AbstractText></Abstract>"
+        texts = []
+        for label in SECTIONS[:sections]:
+            texts.append(
+                f'<AbstractText Label="{label}" NlmCategory="{label}">{self.sentence(15, 60, True)}</AbstractText>'
+            )
+        return f"<Abstract>{''.join(texts)}</Abstract>"
+
+    def revised(self, pmid: int, year: int) -> str:
+        if self.profile.revised is None:
+            return self.date("DateRevised", min(year + 1, self.profile.years[1]))
+        start, per_day = self.profile.revised
+        day = start + datetime.timedelta(days=(pmid - self.first_pmid) // per_day)
+        return (
+            f"<DateRevised><Year>{day.year}</Year><Month>{day.month:02d}</Month><Day>{day.day:02d}</Day></DateRevised>"
+        )
+
+    def references(self, pmid: int) -> str:
+        # drawn only when asked for, so corpora without references stay the same for a seed
+        if not self.profile.references[1] or pmid == self.first_pmid:
+            return ""
+        count = min(self.count(self.profile.references), pmid - self.first_pmid)
+        cited = sorted(self.random.sample(range(self.first_pmid, pmid), count))
+        references = "".join(
+            f"<Reference><Citation>{self.sentence(4, 10)}</Citation><ArticleIdList>"
+            f'<ArticleId IdType="pubmed">{reference}</ArticleId></ArticleIdList></Reference>'
+            for reference in cited
+        )
+        return f"<ReferenceList>{references}</ReferenceList>" if references else ""
+
+    def history(self, year: int) -> str:
+        dates = "".join(
+            self.date("PubMedPubDate", year, f' PubStatus="{status}"') for status in ("received", "entrez", "pubmed")
+        )
+        return f"<History>{dates}</History><PublicationStatus>ppublish</PublicationStatus>"
+
+    def journal_article(self, pmid: int) -> str:
+        profile = self.profile
+        year = self.count(profile.years)
+        title, abbreviation, issn, nlmid = self.random.choice(JOURNALS)
+        doi = f"10.{1000 + pmid % 9000}/synthetic.{pmid}"
+        investigators = self.count(profile.investigators)
+        if self.chance(profile.consortium_rate):
+            investigators += profile.consortium_size
+        authors = self.authors("Author", self.count(profile.authors))
+        grants = "".join(
+            f"<Grant><GrantID>R01 CA{self.random.randrange(100000, 999999)}</GrantID><Acronym>CA</Acronym>"
+            f"<Agency>{self.random.choice(AGENCIES)}</Agency><Country>United States</Country></Grant>"
+            for _ in range(self.count(profile.grants))
+        )
+        mesh = "".join(
+            f'<MeshHeading><DescriptorName UI="D{self.random.randrange(10**6):06d}" MajorTopicYN="N">'
+            f"{self.words(1, 3).title()}</DescriptorName></MeshHeading>"
+            for _ in range(self.count(profile.mesh))
+        )
+        start = self.random.randint(1, 2000)
+        parts = [
+            f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{pmid}</PMID>',
+            self.date("DateCompleted", year),
+            self.revised(pmid, year),
+            '<Article PubModel="Print-Electronic"><Journal>',
+            f'<ISSN IssnType="Print">{issn}</ISSN><JournalIssue CitedMedium="Print">',
+            f"<Volume>{self.random.randint(1, 400)}</Volume><Issue>{self.random.randint(1, 24)}</Issue>",
+            self.pubdate(year),
+            f"</JournalIssue><Title>{escape(title)}</Title><ISOAbbreviation>{abbreviation}</ISOAbbreviation></Journal>",
+            f"<ArticleTitle>{self.sentence(6, 20, True)}</ArticleTitle>",
+            f"<Pagination><MedlinePgn>{start}-{start + self.random.randint(1, 30)}</MedlinePgn></Pagination>",
+            f'<ELocationID EIdType="doi" ValidYN="Y">{doi}</ELocationID>',
+            self.abstract(),
+            f'<AuthorList CompleteYN="Y">{authors}</AuthorList>' if authors else "",
+            "<Language>eng</Language>",
+            f'<GrantList CompleteYN="Y">{grants}</GrantList>' if grants else "",
+            '<PublicationTypeList><PublicationType UI="D016428">Journal Article</PublicationType>',
+            "</PublicationTypeList>",
+            self.date("ArticleDate", year, ' DateType="Electronic"'),
+            "</Article>",
+            f"<MedlineJournalInfo><Country>{self.random.choice(COUNTRIES)}</Country><MedlineTA>{abbreviation}</MedlineTA>",
+            f"<NlmUniqueID>{nlmid}</NlmUniqueID><ISSNLinking>{issn}</ISSNLinking></MedlineJournalInfo>",
+            "<CitationSubset>IM</CitationSubset>",
+            f"<MeshHeadingList>{mesh}</MeshHeadingList>" if mesh else "",
+            f"<InvestigatorList>{self.authors('Investigator', investigators)}</InvestigatorList>"
+            if investigators
+            else "",
+            "</MedlineCitation><PubmedData>",
+            self.history(year),
+            f'<ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId><ArticleId IdType="doi">{doi}</ArticleId>',
+            f'<ArticleId IdType="pmc">PMC{pmid + 1000000}</ArticleId>' if self.chance(0.3) else "",
+            "</ArticleIdList>",
+            self.references(pmid),
+            "</PubmedData></PubmedArticle>\n",
+        ]
+        return "".join(parts)
+
+    def book_article(self, pmid: int) -> str:
+        profile = self.profile
+        year = self.count(profile.years)
+        accession = f"NBK{pmid % 1000000}"
+        publisher, location = self.random.choice(PUBLISHERS)
+        chapter = self.chance(profile.chapter_rate)
+        book_title = self.sentence(3, 8)
+        authors = self.authors("Author", self.count(profile.authors))
+        editors = self.authors("Author", self.random.randint(1, 3))
+        sections = "".join(
+            f'<Section><SectionTitle book="{accession.lower()}" part="ch{pmid}" sec="s{index}">'
+            f"{self.words(1, 4).title()}</SectionTitle></Section>"
+            for index in range(self.random.randint(0, 8))
+        )
+        parts = [
+            f'<PubmedBookArticle><BookDocument><PMID Version="1">{pmid}</PMID>',
+            f'<ArticleIdList><ArticleId IdType="bookaccession">{accession}</ArticleId></ArticleIdList>',
+            f"<Book><Publisher><PublisherName>{escape(publisher)}</PublisherName>",
+            f"<PublisherLocation>{escape(location)}</PublisherLocation></Publisher>",
+            f'<BookTitle book="{accession.lower()}">{book_title}</BookTitle>',
+            self.pubdate(year, oddities=False),
+            f'<AuthorList Type="editors">{editors}</AuthorList>',
+            f"<Edition>{self.random.choice(('2nd', '3rd', '4th'))}</Edition>" if self.chance(0.2) else "",
+            f"<CollectionTitle book='{accession.lower()}'>{self.sentence(2, 5)}</CollectionTitle>"
+            if self.chance(0.3)
+            else "",
+            f"<Isbn>978{self.random.randrange(10**10):010d}</Isbn>" if self.chance(0.5) else "",
+            "<Medium>Internet</Medium></Book>",
+            f'<LocationLabel Type="chapter">{self.random.randint(1, 30)}</LocationLabel>' if chapter else "",
+            f'<ArticleTitle book="{accession.lower()}" part="ch{pmid}">{self.sentence(4, 12)}</ArticleTitle>'
+            if chapter
+            else "",
+            "<Language>eng</Language>",
+            f'<AuthorList Type="authors">{authors}</AuthorList>' if authors else "",
+            '<PublicationType UI="D016454">Review</PublicationType>',
+            f"<Abstract><AbstractText>{self.sentence(40, 150)}</AbstractText></Abstract>"
+            if self.chance(profile.abstract_rate)
+            else "",
+            f"<Sections>{sections}</Sections>" if sections else "",
+            "</BookDocument><PubmedBookData>",
+            self.history(year),
+            f'<ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId></ArticleIdList>',
+            "</PubmedBookData></PubmedBookArticle>\n",
+        ]
+        return "".join(parts)
+
+    def article(self, pmid: int) -> str:
+        if self.chance(self.profile.book_rate):
+            return self.book_article(pmid)
+        return self.journal_article(pmid)
+
+
+def generate_articles(
+    count: int, profile: CorpusProfile | None = None, seed: int = 0, first_pmid: int = 1
+) -> Iterator[str]:
+    """
+    Generate PubmedArticle and PubmedBookArticle elements
+
+    :param count: number of articles
+    :param profile: shape of the corpus, defaults to CorpusProfile()
+    :param seed: random seed, the same seed gives the same articles
+    :param first_pmid: PMID of the first article, the next ones are numbered in order
+    :return: generator of XML strings, one article each
+    """
+    generator = _Generator(profile or CorpusProfile(), seed, first_pmid)
+    for pmid in range(first_pmid, first_pmid + count):
+        yield generator.article(pmid)
+
+
+def write_corpus(
+    path: str, count: int, profile: CorpusProfile | None = None, seed: int = 0, first_pmid: int = 1
+) -> None:
+    """
+    Write a PubmedArticleSet file like an EFetch response or a PubMed baseline file. Files ending in .gz are
+    compressed.
+
+    >>> write_corpus("/var/tmp/pubmed.xml.gz", 1000000, CorpusProfile(book_rate=0.05), seed=1)
+
+    :param path: file to write
+    :param count: number of articles
+    :param profile: shape of the corpus, defaults to CorpusProfile()
+    :param seed: random seed, the same seed gives the same file
+    :param first_pmid: PMID of the first article
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write(HEADER)
+        for article in generate_articles(count, profile, seed, first_pmid):
+            f.write(article)
+        f.write(FOOTER)
@@ -0,0 +1,155 @@
+"""
+How requests to the NCBI E-utilities are sent. Requests are still built by Biopython and responses are still
+parsed by Biopython, only the HTTP exchange in between is done by the transport.
+"""
+
+import abc
+import http.client
+import io
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+
+import requests
+from Bio import Entrez
+from Bio.Entrez.Parser import CorruptedXMLError
+from requests.adapters import HTTPAdapter
+
+from . import config
+from . import metrics
+
+logger = logging.getLogger("pub.tools")
+
+
+class Transport(abc.ABC):
+    """
+    Send an E-utilities request and return the response as a binary file-like object. Other web services, such
+    as ORCID and the journal list, are called with `get`
+    """
+
+    # whether requests reach NCBI and so have to wait for the shared rate limiter, see `pub.tools.ratelimit`
+    rate_limited = True
+
+    @abc.abstractmethod
+    def open(self, request: urllib.request.Request):
+        """Send an E-utilities request built by Biopython and return the response"""
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Same as requests.get"""
+        return requests.get(url, **kwargs)  # noqa: S113 - callers pass their timeout
+
+
+class UrllibTransport(Transport):
+    """
+    Biopython's own urllib code, which opens a new connection for each request and retries failed requests
+    according to Entrez.max_tries and Entrez.sleep_between_tries
+    """
+
+    def open(self, request: urllib.request.Request):
+        return Entrez._open(request)
+
+
+class SessionTransport(Transport):
+    """
+    Send requests through a pooled requests Session, so connections to NCBI are kept alive between requests
+    instead of paying for a new TCP and TLS handshake each time, and ask for gzip compressed responses.
+    Failed requests are retried like Biopython does, according to Entrez.max_tries and
+    Entrez.sleep_between_tries, and reported to the current metrics recorder.
+
+    :param session: requests Session to use, a new one is created if not given
+    :param pool_size: connections kept open, defaults to config.MAX_CONCURRENT_REQUESTS
+    :param timeout: seconds to wait for NCBI to connect or to send data
+    """
+
+    def __init__(self, session: requests.Session | None = None, pool_size: int | None = None, timeout: float = 60.0):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        pool_size = pool_size or config.MAX_CONCURRENT_REQUESTS
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers["Accept-Encoding"] = "gzip"
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.session.get(url, **kwargs)
+
+    def open(self, request: urllib.request.Request):
+        headers = dict(request.header_items())
+        if request.data is not None:
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+        for attempt in range(1, Entrez.max_tries + 1):
+            try:
+                response = self.session.request(
+                    request.get_method(),
+                    request.full_url,
+                    data=request.data,
+                    headers=headers,
+                    stream=True,
+                    timeout=self.timeout,
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == Entrez.max_tries:
+                    raise
+                error = repr(e)
+            else:
+                # as in Biopython, 4XX errors other than 429 Too Many Requests are not worth retrying
+                client_error = response.status_code // 100 == 4 and response.status_code != 429
+                if response.ok or client_error or attempt == Entrez.max_tries:
+                    response.raise_for_status()
+                    break
+                response.close()
+                error = f"HTTP {response.status_code}"
+            if recorder := metrics.get_recorder():
+                recorder.retry(metrics.RetryEvent(request.full_url, attempt, error, Entrez.sleep_between_tries))
+            logger.info(f"Request to {request.host} failed, retrying in {Entrez.sleep_between_tries}s")
+            time.sleep(Entrez.sleep_between_tries)
+        # let urllib3 decompress the body while it is read
+        response.raw.decode_content = True
+        if response.headers.get("Content-Type", "").startswith("text/plain"):
+            return io.TextIOWrapper(response.raw, encoding="UTF-8")
+        return response.raw
+
+
+def retryable(error: Exception) -> bool:
+    """Whether a failed request is worth making again. Bad requests are not, other than 429 Too Many Requests"""
+    status = None
+    if isinstance(error, urllib.error.HTTPError):
+        status = error.code
+    elif isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    if status is not None:
+        return status // 100 != 4 or status == 429
+    return isinstance(error, OSError | http.client.HTTPException | CorruptedXMLError)
+
+
+def _default_transport() -> Transport:
+    """UrllibTransport, unless PUB_TOOLS_REPLAY points to a fixture store, see `pub.tools.replay`"""
+    if os.environ.get("PUB_TOOLS_REPLAY"):
+        from . import replay
+
+        return replay.from_environment()
+    return UrllibTransport()
+
+
+_transport = _default_transport()
+
+
+def get_transport() -> Transport:
+    """Transport used by every E-utilities request in pub.tools.entrez, and by other web service calls"""
+    return _transport
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """requests.get through the current transport"""
+    return _transport.get(url, **kwargs)
+
+
+def set_transport(transport: Transport) -> None:
+    """
+    Replace the transport used by every E-utilities request in pub.tools.entrez, and by other web service calls
+
+    >>> set_transport(SessionTransport())
+    """
+    global _transport
+    _transport = transport
@@ -0,0 +1,90 @@
+import contextlib
+import gzip
+import os
+
+import pytest
+from Bio import Entrez
+
+from pub.tools import config
+from pub.tools import emulator
+from pub.tools import idconv
+from pub.tools import replay
+from pub.tools import synthetic
+from pub.tools import transport
+
+# recorded responses of NCBI, ORCID and the journal list, see `pytest_configure`
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# shape of the synthetic baseline files of `mirror`
+BASELINE_PROFILE = synthetic.CorpusProfile(book_rate=0.2)
+
+
+def pytest_configure():
+    """
+    Replay NCBI, ORCID and journal list responses from tests/fixtures for the whole session, so a request that
+    was not recorded fails its test instead of reaching the network. Record missing responses by running the
+    tests online with PUB_TOOLS_REPLAY_MODE=record, and commit them along with the tests that need them.
+    """
+    os.environ.setdefault("PUB_TOOLS_REPLAY", FIXTURES)
+    transport.set_transport(replay.from_environment())
+
+
+@pytest.fixture(autouse=True)
+def id_cache(monkeypatch):
+    """Keep identifier conversions in memory rather than in ~/.pubmed"""
+    monkeypatch.setattr(idconv, "_cache", idconv.IdCache(":memory:"))
+
+
+@pytest.fixture
+def emulate(tmp_path, monkeypatch):
+    """
+    Start emulated E-utilities and ID Converter over a synthetic corpus, with
+    ``emulate(count, profile=None, seed=1, first_pmid=1, **options)``. The options, such as max_results and
+    rate_limit, are passed on to the Emulator, and max_results also sets config.ESEARCH_MAX_RESULTS.
+    """
+    with contextlib.ExitStack() as stack:
+
+        def start(count, profile=None, seed=1, first_pmid=1, **options):
+            path = tmp_path / "eutils"
+            path.mkdir()
+            synthetic.write_corpus(str(path / "corpus.xml"), count, profile, seed, first_pmid)
+            monkeypatch.setattr(transport, "_transport", transport.SessionTransport())
+            monkeypatch.setattr(Entrez, "sleep_between_tries", 0)
+            if "max_results" in options:
+                monkeypatch.setattr(config, "ESEARCH_MAX_RESULTS", options["max_results"])
+            local = stack.enter_context(emulator.Emulator(str(path), **options))
+            monkeypatch.setattr(config, "EUTILS_URL", local.url)
+            monkeypatch.setattr(idconv, "API", local.idconv_url)
+            return local
+
+        yield start
+
+
+@pytest.fixture
+def eutils(emulate):
+    """Emulated E-utilities and ID Converter serving 100 synthetic articles, PMIDs 1 to 100"""
+    return emulate(100, synthetic.CorpusProfile(book_rate=0.1))
+
+
+def write_baseline_file(path, count, first_pmid, deleted=()):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(synthetic.HEADER)
+        for article in synthetic.generate_articles(count, BASELINE_PROFILE, seed=first_pmid, first_pmid=first_pmid):
+            f.write(article)
+        if deleted:
+            f.write("<DeleteCitation>")
+            f.write("".join(f'<PMID Version="1">{pmid}</PMID>' for pmid in deleted))
+            f.write("</DeleteCitation>\n")
+        f.write(synthetic.FOOTER)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """
+    Local mirror of synthetic baseline files with PMIDs 1 to 30, 31 to 60 and 61 to 70, and an update file
+    revising 5 and 6 and deleting 7 and 40
+    """
+    write_baseline_file(tmp_path / "pubmed25n0001.xml.gz", 30, 1)
+    write_baseline_file(tmp_path / "pubmed25n0002.xml.gz", 30, 31)
+    write_baseline_file(tmp_path / "pubmed25n0003.xml.gz", 10, 61)
+    write_baseline_file(tmp_path / "pubmed25n0004.xml.gz", 2, 5, deleted=["7", "40"])
+    return tmp_path
@@ -0,0 +1,96 @@
+import glob
+import gzip
+import multiprocessing
+import time
+
+import pytest
+
+from pub.tools import baseline
+from pub.tools import config
+from pub.tools import metrics
+from pub.tools import pubmedxml
+
+
+class TestBaseline:
+    def test_find_files(self, mirror):
+        assert [path.rsplit("/", 1)[1] for path in baseline.find_files(str(mirror))] == [
+            "pubmed25n0001.xml.gz",
+            "pubmed25n0002.xml.gz",
+            "pubmed25n0003.xml.gz",
+            "pubmed25n0004.xml.gz",
+        ]
+
+    def test_iter_file(self, mirror):
+        path = str(mirror / "pubmed25n0004.xml.gz")
+        items = list(baseline.iter_file(path))
+        assert [item.pmid for item in items] == ["5", "6", "7", "40"]
+        assert items[2:] == [baseline.DeletedCitation("7", path), baseline.DeletedCitation("40", path)]
+        with gzip.open(path) as f:
+            assert items[:2] == list(pubmedxml.iterparse(f))
+
+    def test_load(self, mirror):
+        paths = baseline.find_files(str(mirror))
+        items = list(baseline.load(paths))
+        assert len(items) == 74
+        assert [item.pmid for item in items[:70]] == [str(pmid) for pmid in range(1, 71)]
+        assert {item.pub_type for item in items[:70]} == {"journal", "book", "chapter"}
+
+        corpus = {}
+        for item in items:
+            if isinstance(item, baseline.DeletedCitation):
+                corpus.pop(item.pmid)
+            else:
+                corpus[item.pmid] = item
+        assert len(corpus) == 68
+        assert corpus["5"] == items[70]
+
+    def test_load_processes(self, mirror, monkeypatch):
+        workers = []
+
+        class Process(multiprocessing.Process):
+            def start(self):
+                workers.append(self)
+                super().start()
+
+        monkeypatch.setattr(baseline.multiprocessing, "Process", Process)
+        paths = baseline.find_files(str(mirror))
+        assert list(baseline.load(paths, processes=3, batch_size=7)) == list(baseline.load(paths))
+        # once every file is returned the workers are told to stop rather than terminated
+        assert [worker.exitcode for worker in workers] == [0, 0, 0]
+
+    def test_load_ahead(self, mirror, tmp_path, monkeypatch):
+        # the workers keep parsing the next files while the first one is used, one per process without read ahead
+        monkeypatch.setattr(config, "BASELINE_READ_AHEAD", 0)
+        events = []
+        monkeypatch.setattr(metrics, "_recorder", metrics.CallbackRecorder(on_chunk=events.append))
+        paths = baseline.find_files(str(mirror))
+        spool = tmp_path / "spool"
+        spool.mkdir()
+        items = baseline.load(paths, processes=2, batch_size=5, spool=str(spool))
+        assert next(items).pmid == "1"
+        deadline = time.time() + 60
+        while len(glob.glob(str(spool / "*" / "*.pickle"))) < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+        assert len(glob.glob(str(spool / "*" / "*.pickle"))) == 3
+        assert len(list(items)) == 73
+        assert [event.records for event in events] == [30, 30, 10, 4]
+        assert all(event.parse_seconds > 0 for event in events)
+        assert not glob.glob(str(spool / "*"))
+
+    def test_load_fields(self, mirror):
+        paths = baseline.find_files(str(mirror))
+        records = [item for item in baseline.load(paths, processes=2, fields=["title"]) if item.pmid == "12"]
+        assert records[0].partial
+        assert records[0].title
+        assert records[0].authors == []
+
+    def test_load_error(self, mirror):
+        with open(mirror / "pubmed25n0003.xml.gz", "wb") as f:
+            f.write(gzip.compress(b"<PubmedArticleSet><PubmedArticle>"))
+        paths = baseline.find_files(str(mirror))
+        loaded = []
+        with pytest.raises(baseline.BaselineError, match=r"pubmed25n0003\.xml\.gz failed"):
+            for item in baseline.load(paths, processes=2):
+                loaded.append(item)
+        assert len(loaded) == 60
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import time
+
+from pub.tools import cache
+from pub.tools import entrez
+from pub.tools.schema import Abstract
+from pub.tools.schema import ChapterRecord
+from pub.tools.schema import Grant
+from pub.tools.schema import JournalRecord
+from pub.tools.schema import Person
+from pub.tools.schema import Section
+
+
+def journal(pmid="12345"):
+    return JournalRecord(
+        title="A <i>title</i>",
+        authors=[Person(last_name="Smith", first_name="John", initial="J", identifiers={"ORCID": "0000"})],
+        pubdate="2003 May 1",
+        pmid=pmid,
+        abstract=[Abstract(text="text", nlmcategory="METHODS", label="METHODS")],
+        article_ids={"pubmed": pmid, "doi": "10.1/x"},
+        grants=[Grant(grantid="F32", acronym="CA", agency="NCI")],
+        mesh=["Humans"],
+    )
+
+
+def chapter(pmid="22593940"):
+    return ChapterRecord(
+        title="Herbs",
+        authors=[Person(last_name="Kaefer", first_name="C", initial="C")],
+        pubdate="2011",
+        pmid=pmid,
+        booktitle="Herbal Medicine",
+        language=[],
+        sections=[Section(title="INTRODUCTION", section_type="section", label="17.1")],
+    )
+
+
+class TestRecordCache:
+    def test_roundtrip(self):
+        for record in (journal(), chapter()):
+            assert cache.loads(cache.dumps(record)) == record
+
+    def test_get_set(self):
+        record_cache = cache.RecordCache(":memory:")
+        assert record_cache.get("12345") is None
+        record_cache.set(journal())
+        assert record_cache.get("12345") == journal()
+        assert record_cache.get(12345, escape=False) is None
+        assert record_cache.stats.hits == 1
+        assert record_cache.stats.misses == 2
+
+    def test_get_many(self):
+        record_cache = cache.RecordCache(":memory:")
+        record_cache.set_many([journal(), chapter()])
+        found = record_cache.get_many(["12345", "22593940", "1"])
+        assert found == {"12345": journal(), "22593940": chapter()}
+
+    def test_ttl(self):
+        record_cache = cache.RecordCache(":memory:", ttl=0.05)
+        record_cache.set(journal())
+        time.sleep(0.1)
+        assert record_cache.get("12345") is None
+        assert record_cache.stats.expired == 1
+        assert len(record_cache) == 0
+
+    def test_eviction(self):
+        record_cache = cache.RecordCache(":memory:", max_entries=2)
+        record_cache.set(journal("1"))
+        record_cache.set(journal("2"))
+        record_cache.get("1")
+        record_cache.set(journal("3"))
+        assert len(record_cache) == 2
+        assert record_cache.get("2") is None
+        assert record_cache.stats.evictions == 1
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "records.sqlite")
+            cache.RecordCache(path).set(journal())
+            assert cache.RecordCache(path).get("12345") == journal()
+
+    def test_entrez(self, eutils):
+        record_cache = cache.RecordCache(":memory:")
+        cache.set_cache(record_cache)
+        try:
+            record = entrez.get_publication("12")
+            assert entrez.get_publication("12") == record
+            records = list(entrez.get_publications(["12", "26"]))
+            assert sorted(r.pmid for r in records) == ["12", "26"]
+            assert record_cache.stats.hits == 2
+        finally:
+            cache.set_cache(None)
@@ -0,0 +1,142 @@
+import concurrent.futures
+import io
+
+import pytest
+
+from pub.tools import chunking
+from pub.tools import entrez
+from pub.tools.schema import JournalRecord
+
+
+class TestAdaptiveChunker:
+    def test_grow(self):
+        chunker = chunking.AdaptiveChunker(initial=500, min_size=100, max_size=9000, target_seconds=10)
+        # 1ms per record wants chunks of 10000, but the size only doubles per request
+        chunker.record(500, 0.5, 1000)
+        assert chunker.size == 1000
+        chunker.record(1000, 1.0, 1000)
+        chunker.record(2000, 2.0, 1000)
+        chunker.record(4000, 4.0, 1000)
+        chunker.record(8000, 8.0, 1000)
+        assert chunker.size == 9000
+        assert list(chunker.stats.sizes) == [1000, 2000, 4000, 8000, 9000]
+
+    def test_shrink(self):
+        chunker = chunking.AdaptiveChunker(initial=8000, min_size=100, max_size=9000, target_seconds=10)
+        chunker.record(8000, 80.0, 1000)
+        assert chunker.size == 4000
+        chunker.record(4000, 40.0, 1000)
+        chunker.record(2000, 20.0, 1000)
+        assert chunker.size == 1000
+
+    def test_max_bytes(self):
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100, max_bytes=1_000_000, target_seconds=100)
+        chunker.record(1000, 1.0, 1000 * 2000)
+        assert chunker.size == 500
+
+    def test_error(self):
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=300)
+        chunker.record_error(1000)
+        assert chunker.size == 500
+        chunker.record_error(500)
+        assert chunker.size == 300
+        assert chunker.stats.errors == 2
+
+    def test_get_publications(self, monkeypatch):
+        sizes = []
+
+        def eutil(utility, **query):
+            sizes.append(len(query["id"]))
+            return io.BytesIO(b"x" * 1000 * len(query["id"]))
+
+        def parse_chunk(handle, escape, stream, lxml, fields, convert):
+            handle.read()
+            for pmid in range(len(handle.handle.getvalue()) // 1000):
+                yield JournalRecord(title="", authors=[], pubdate="", pmid=str(pmid))
+
+        monkeypatch.setattr(entrez, "_eutil", eutil)
+        monkeypatch.setattr(entrez, "_parse_chunk", parse_chunk)
+        # responses are 1000 bytes per record, so chunks are kept to 200 records
+        chunker = chunking.AdaptiveChunker(initial=100, min_size=50, max_size=1000, max_bytes=200_000)
+        records = list(entrez.get_publications([str(pmid) for pmid in range(1000)], chunker=chunker))
+        assert len(records) == 1000
+        assert sizes[:3] == [100, 200, 200]
+        assert chunker.stats.records == 1000
+        assert chunker.stats.bytes == 1_000_000
+
+    def test_get_publications_error(self, monkeypatch):
+        def eutil(utility, **query):
+            raise OSError("timed out")
+
+        monkeypatch.setattr(entrez, "_eutil", eutil)
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100)
+        with pytest.raises(OSError):
+            list(entrez.get_publications(["1", "2"], chunker=chunker))
+        assert chunker.size == 100
+
+    def fake_efetch(self, monkeypatch, largest, fail_after=None):
+        """
+        EFetch that times out for more than `largest` PMIDs, before responding or after returning `fail_after`
+        records
+        """
+        sizes = []
+
+        def eutil(utility, **query):
+            if "id" in query:
+                ids = list(query["id"])
+            else:
+                ids = [str(pmid) for pmid in range(query["retstart"], query["retstart"] + query["retmax"])]
+            sizes.append(len(ids))
+            if len(ids) > largest and fail_after is None:
+                raise TimeoutError("timed out")
+            return io.BytesIO(",".join(ids).encode())
+
+        def parse_chunk(handle, escape, stream, lxml, fields, convert):
+            ids = handle.read().decode().split(",")
+            for index, pmid in enumerate(ids):
+                if len(ids) > largest and index == fail_after:
+                    raise TimeoutError("timed out")
+                yield JournalRecord(title="", authors=[], pubdate="", pmid=pmid)
+
+        monkeypatch.setattr(entrez, "_eutil", eutil)
+        monkeypatch.setattr(entrez, "_parse_chunk", parse_chunk)
+        return sizes
+
+    @pytest.mark.parametrize("fail_after", [None, 150])
+    def test_get_publications_retry(self, monkeypatch, fail_after):
+        sizes = self.fake_efetch(monkeypatch, 300, fail_after)
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100, max_size=1000)
+        pmids = [str(pmid) for pmid in range(1000)]
+        records = list(entrez.get_publications(pmids, chunker=chunker, stream=True))
+        # chunks that time out are fetched again at half the size, without repeating the records returned
+        assert [record.pmid for record in records] == pmids
+        assert sizes[:3] == [1000, 500, 250]
+        assert chunker.stats.errors >= 2
+
+    def test_get_publications_executor_retry(self, monkeypatch):
+        self.fake_efetch(monkeypatch, 300)
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100, max_size=1000)
+        pmids = [str(pmid) for pmid in range(1000)]
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            records = list(entrez.get_publications(pmids, chunker=chunker, executor=executor))
+        assert [record.pmid for record in records] == pmids
+
+    def test_get_publications_retries_exhausted(self, monkeypatch):
+        sizes = self.fake_efetch(monkeypatch, 10)
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100, max_size=1000, max_retries=5)
+        with pytest.raises(TimeoutError):
+            list(entrez.get_publications([str(pmid) for pmid in range(1000)], chunker=chunker))
+        # stops once a chunk of the smallest size fails
+        assert sizes == [1000, 500, 250, 125, 100]
+
+    def test_iter_searched_publications_retry(self, monkeypatch):
+        sizes = self.fake_efetch(monkeypatch, 300)
+        monkeypatch.setattr(
+            entrez,
+            "_read_publications",
+            lambda handle, escape, parser: list(entrez._fetch_chunk(handle, escape, False, False)),
+        )
+        chunker = chunking.AdaptiveChunker(initial=1000, min_size=100, max_size=1000)
+        records = list(entrez.iter_searched_publications("web_env", "1", count=1200, concurrency=1, chunker=chunker))
+        assert [record.pmid for record in records] == [str(pmid) for pmid in range(1200)]
+        assert sizes[:6] == [1000, 500, 250, 250, 250, 250]
@@ -0,0 +1,50 @@
+import threading
+
+from pub.tools.coalesce import Coalescer
+
+
+class TestCoalescer:
+    def lookup(self, coalescer, pmids):
+        results = {}
+
+        def run(pmid):
+            results.setdefault(pmid, []).append(coalescer.get_publication(pmid, timeout=5))
+
+        threads = [threading.Thread(target=run, args=(pmid,)) for pmid in pmids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_batch(self, eutils):
+        coalescer = Coalescer(window=0.2)
+        results = self.lookup(coalescer, [str(i) for i in range(1, 21)])
+        assert coalescer.batches == 1
+        assert eutils.stats["efetch"] == 1
+        assert all(records[0].pmid == pmid for pmid, records in results.items())
+
+    def test_same_pmid(self, eutils):
+        coalescer = Coalescer(window=0.2)
+        results = self.lookup(coalescer, ["1"] * 10 + ["2"])
+        assert eutils.stats["efetch"] == 1
+        assert len(results["1"]) == 10
+        assert results["1"][0] is results["1"][-1]
+        assert results["2"][0].pmid == "2"
+
+    def test_max_batch(self, eutils):
+        coalescer = Coalescer(window=10, max_batch=5)
+        results = self.lookup(coalescer, [str(i) for i in range(1, 6)])
+        assert eutils.stats["efetch"] == 1
+        assert len(results) == 5
+
+    def test_missing(self, eutils):
+        assert Coalescer(window=0).get_publication("101", timeout=5) is None
+
+    def test_books(self, eutils):
+        coalescer = Coalescer(window=0.05)
+        results = self.lookup(coalescer, ["12", "26", "40"])
+        assert coalescer.batches == 1
+        assert results["26"][0].pmid == "26"
+        assert results["26"][0].pub_type in ("book", "chapter")
+        assert eutils.stats["efetch"] == 1
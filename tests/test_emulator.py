@@ -0,0 +1,159 @@
+import datetime
+import time
+
+import pytest
+import requests
+from Bio import Entrez
+
+from pub.tools import citations
+from pub.tools import emulator
+from pub.tools import entrez
+from pub.tools import ratelimit
+from pub.tools import synthetic
+
+# plain dates and titles, so expected results can be worked out from the loaded articles
+PROFILE = synthetic.CorpusProfile(
+    authors=(1, 3),
+    medline_date_rate=0.0,
+    season_rate=0.0,
+    markup_rate=0.0,
+    book_rate=0.0,
+    years=(2001, 2010),
+    references=(1, 3),
+)
+
+
+@pytest.fixture
+def server(emulate):
+    """Emulator over 10 synthetic articles citing earlier ones"""
+    return emulate(10, PROFILE)
+
+
+def newest_first(server, matches):
+    """PMIDs of the loaded articles `matches` is true for, in the order ESearch returns them"""
+    return [pmid for pmid in sorted(server.articles, key=int, reverse=True) if matches(server.articles[pmid])]
+
+
+class TestEmulator:
+    def test_search(self, server):
+        author = server.articles["3"].fields["au"][0]
+        expected = newest_first(server, lambda article: any(name.startswith(author) for name in article.fields["au"]))
+        assert "3" in expected
+        assert server.search(f"{author}[au]") == expected
+        assert server.search(f"{author}[au] NOT 3[pmid]") == [pmid for pmid in expected if pmid != "3"]
+        first, second = (server.articles[pmid].fields["doi"][0] for pmid in ("1", "2"))
+        assert server.search(f"({second}[doi]) OR ({first.upper()}[doi])") == ["2", "1"]
+        assert server.search("all[sb]", "pdat", "2003", "2006/12/31") == newest_first(
+            server, lambda article: 2003 <= article.dates["pdat"].year <= 2006
+        )
+        words = server.articles["2"].fields["ti"][0].rstrip(".").split()[:2]
+        assert server.search("+".join(words)) == newest_first(
+            server, lambda article: all(word in article.text for word in words)
+        )
+
+    def test_entrez(self, server):
+        author = server.articles["3"].fields["au"][0]
+        assert entrez.find_pmids(f"{author}[au]") == server.search(f"{author}[au]")
+        since, until = datetime.date(2004, 1, 1), datetime.date(2008, 12, 31)
+        assert entrez.find_pmids("all[sb]", datetype="mdat", mindate="2004/01/01", maxdate="2008/12/31") == (
+            newest_first(server, lambda article: since <= article.dates["mdat"] <= until)
+        )
+        records = list(entrez.get_publications(["1", "3"]))
+        assert [record.pmid for record in records] == ["1", "3"]
+        assert records[1].title.lower() == server.articles["3"].fields["ti"][0]
+
+    def test_history(self, server):
+        word = max(server.articles["3"].fields["ti"][0].rstrip(".").split(), key=len)
+        expected = newest_first(server, lambda article: word in article.text)
+        search = entrez.find_publications(all=word, usehistory=True)
+        assert search["Count"] == str(len(expected))
+        records = list(entrez.iter_searched_publications(search["WebEnv"], search["QueryKey"], window=1))
+        assert [record.pmid for record in records] == expected
+
+        search = entrez.process_search(term="1[pmid] OR 2[pmid]")
+        records = entrez.get_searched_publications(search["WebEnv"], search["QueryKey"])
+        assert sorted(record.pmid for record in records) == ["1", "2"]
+        assert server.stats["epost"] == 1
+
+    def test_esummary_and_elink(self, server):
+        summaries = Entrez.read(entrez._eutil("esummary", db="pubmed", id="3,1"))
+        assert [summary["Id"] for summary in summaries] == ["3", "1"]
+        full = entrez.get_publication("3")
+        assert summaries[0]["DOI"] == full.doi
+        assert summaries[0]["AuthorList"] == [f"{author.last_name} {author.initial}" for author in full.authors]
+
+        citing = newest_first(server, lambda article: "1" in article.references)
+        links = Entrez.read(entrez._eutil("elink", dbfrom="pubmed", db="pubmed", id="1"))
+        assert {link_db["LinkName"]: [link["Id"] for link in link_db["Link"]] for link_db in links[0]["LinkSetDb"]} == {
+            "pubmed_pubmed_citedin": citing
+        }
+        links = Entrez.read(entrez._eutil("elink", dbfrom="pubmed", db="pubmed", id="3", linkname="pubmed_pubmed_refs"))
+        assert [link["Id"] for link in links[0]["LinkSetDb"][0]["Link"]] == sorted(
+            server.articles["3"].references, key=int, reverse=True
+        )
+
+    def test_fields(self, server):
+        for parser in ("biopython", "lxml"):
+            full = {record.pmid: record for record in entrez.get_publications(["1", "2", "3"], parser=parser)}
+            records = list(entrez.get_publications(["1", "2"], parser=parser, fields=["title"]))
+            assert [(record.pmid, record.title, record.authors) for record in records] == [
+                ("1", full["1"].title, []),
+                ("2", full["2"].title, []),
+            ]
+            record = entrez.get_publication("3", parser=parser, fields=["authors", "volume"])
+            assert record.partial
+            assert record.authors == full["3"].authors
+            assert record.volume == full["3"].volume
+            assert record.title == ""
+            posted = Entrez.read(entrez._eutil("epost", db="pubmed", id="1,3"))
+            records = entrez.get_searched_publications(
+                posted["WebEnv"], posted["QueryKey"], parser=parser, fields="article_ids"
+            )
+            assert sorted(record.doi for record in records) == sorted([full["1"].doi, full["3"].doi])
+
+    def test_esummary_json(self, server):
+        records = list(entrez.get_publication_summaries(["3", "999", "1"]))
+        assert [record.pmid for record in records] == ["3", "1"]
+        full = entrez.get_publication("3")
+        assert records[0].partial
+        assert records[0].journal == full.journal
+        assert records[0].doi == full.doi
+        assert citations.publication_citation(publication=records[0]) == citations.publication_citation(
+            publication=full
+        )
+
+    def test_rate_limit(self, server, monkeypatch):
+        server.rate_limit = 1
+        server.latency = 0.5
+        response = None
+        for _ in range(3):
+            response = requests.get(f"{server.url}esearch.fcgi", params={"db": "pubmed", "term": "smith"}, timeout=5)
+        assert response.status_code == 429
+        assert response.json() == {"error": "API rate limit exceeded", "count": "2", "limit": "1"}
+        # too many requests are turned away before the latency
+        assert response.elapsed.total_seconds() < 0.5
+        server.latency = 0
+
+        # the library retries 429 responses like Biopython does
+        monkeypatch.setattr(Entrez, "sleep_between_tries", 1)
+        author = server.articles["2"].fields["au"][0]
+        assert "2" in entrez.find_pmids(f"{author}[au]")
+        assert server.stats["429"] >= 3
+
+    def test_client_limiter(self, tmp_path):
+        limiter = ratelimit.get_limiter()
+        with emulator.Emulator(str(tmp_path), rate_limit=5) as local:
+            assert ratelimit.get_limiter().rate == 4.5
+            start = time.time()
+            for _ in range(8):
+                ratelimit.get_limiter().acquire()
+                requests.get(f"{local.url}esearch.fcgi", params={"term": "smith"}, timeout=5)
+            assert time.time() - start >= 1.5
+            assert local.stats["429"] == 0
+        assert ratelimit.get_limiter() is limiter
+
+    def test_bad_request(self, server):
+        response = requests.get(f"{server.url}efetch.fcgi", params={"db": "pubmed"}, timeout=5)
+        assert response.status_code == 400
+        response = requests.get(f"{server.url}einfo.fcgi", timeout=5)
+        assert response.status_code == 404
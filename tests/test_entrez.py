@@ -1,8 +1,15 @@
+import asyncio
+import concurrent.futures
 import dataclasses
+import datetime
+import io
+import json
+import time
 
 from Bio import Entrez
 
 from pub.tools import citations
+from pub.tools import config
 from pub.tools import entrez
 from pub.tools import orcid
 from pub.tools.schema import Abstract
@@ -448,6 +455,19 @@ class TestEntrez:
         record = entrez.get_searched_publications(record["WebEnv"], record["QueryKey"])
         self.check_pub_data(record[0])
 
+    def test_find_and_fetch_history(self, eutils):
+        record = entrez.find_publications(pmid="12", usehistory=True)
+        assert record["IdList"] == ["12"]
+        records = entrez.get_searched_publications(record["WebEnv"], record["QueryKey"])
+        assert records == [entrez.get_publication("12")]
+
+    def test_find_count_only(self, eutils):
+        author_id = eutils.articles["12"].fields["auid"][0].upper()
+        record = entrez.find_publications(author_ids=[author_id], usehistory=True, id_list=False)
+        assert record["Count"] == "1"
+        assert record["IdList"] == []
+        assert record["WebEnv"]
+
     def test_orcid_search(self):
         record = entrez.find_publications(author_ids=["0000-0002-8953-3940"])
         assert int(record["Count"]) > 0
@@ -465,3 +485,239 @@ class TestEntrez:
         record = orcid.get_author(orcid="0000-0002-1771-9287")
         assert record["given_name"] == "Rachel"
         assert record["family_name"] == "Altshuler"
+
+    def test_aget_publications(self, eutils):
+        async def fetch():
+            client = entrez.AsyncEntrezClient(concurrency=2, chunk_size=1)
+            return [record async for record in client.get_publications(["12", "26"])]
+
+        records = asyncio.run(fetch())
+        assert sorted(r.pmid for r in records) == ["12", "26"]
+
+    def test_async_client_reused(self, eutils):
+        client = entrez.AsyncEntrezClient(concurrency=1)
+
+        async def fetch():
+            chunks = await asyncio.gather(*(client.fetch_chunk([pmid]) for pmid in ("12", "26", "40")))
+            return sorted(record.pmid for chunk in chunks for record in chunk)
+
+        # each event loop waits on its own semaphore
+        assert asyncio.run(fetch()) == asyncio.run(fetch()) == ["12", "26", "40"]
+
+    def test_aget_publications_bounded(self, monkeypatch):
+        started = []
+
+        def fetch(client, pmids):
+            started.extend(pmids)
+            return [JournalRecord(title="", authors=[], pubdate="", pmid=pmid) for pmid in pmids]
+
+        monkeypatch.setattr(entrez.AsyncEntrezClient, "_fetch", fetch)
+
+        async def consume():
+            client = entrez.AsyncEntrezClient(concurrency=2, chunk_size=1)
+            seen = []
+            async for record in client.get_publications([str(pmid) for pmid in range(10)]):
+                seen.append(record.pmid)
+                # a slow consumer holds back the chunks after those in flight
+                await asyncio.sleep(0.01)
+                assert len(started) <= len(seen) + 2
+            return seen
+
+        assert sorted(asyncio.run(consume()), key=int) == [str(pmid) for pmid in range(10)]
+
+    def test_get_publications_stream(self, eutils):
+        pmids = [str(pmid) for pmid in range(1, 31)]
+        streamed = sorted(entrez.get_publications(pmids, stream=True), key=lambda r: r.pmid)
+        read = sorted(entrez.get_publications(pmids), key=lambda r: r.pmid)
+        assert streamed == read
+
+    def test_iter_pmids_split(self, monkeypatch):
+        # 2000 records over 2020, one per PMID, except 150 records on one day and one record on two days
+        dates = {str(pmid): datetime.date(2020, 1, 1) + datetime.timedelta(days=pmid % 366) for pmid in range(2000)}
+        dates.update({f"9{pmid}": datetime.date(2020, 6, 1) for pmid in range(150)})
+        searches = []
+
+        def esearch_ids(query, datetype, mindate, maxdate, retmax=100000):
+            searches.append((mindate, maxdate))
+            mindate = datetime.datetime.strptime(mindate, "%Y/%m/%d").date()
+            maxdate = datetime.datetime.strptime(maxdate, "%Y/%m/%d").date()
+            ids = [pmid for pmid, date in dates.items() if mindate <= date <= maxdate]
+            if mindate <= datetime.date(2020, 3, 1) <= maxdate:
+                ids.append("1")
+            return len(ids), ids[:retmax]
+
+        monkeypatch.setattr(entrez, "_esearch_ids", esearch_ids)
+        monkeypatch.setattr(config, "ESEARCH_MAX_RESULTS", 100)
+        pmids = list(entrez.iter_pmids("test", "2020", "2020"))
+        # the day with too many records is cut off at the cap
+        crowded = [pmid for pmid, date in dates.items() if date == datetime.date(2020, 6, 1)]
+        assert len(pmids) == len(set(pmids))
+        assert set(pmids) == set(dates) - set(crowded[100:])
+        assert searches[0] == ("2020/01/01", "2020/12/31")
+
+    def test_iter_pmids(self, eutils, monkeypatch):
+        monkeypatch.setattr(config, "ESEARCH_MAX_RESULTS", 10)
+        eutils.max_results = 10
+        query = "all[sb]"
+        count = int(entrez.find_publications(all=query, start="2000/01/01", end="2025/12/31", id_list=False)["Count"])
+        assert count > config.ESEARCH_MAX_RESULTS
+        assert len(set(entrez.iter_pmids(query, "2000/01/01", "2025/12/31"))) == count
+
+    def test_iter_searched_publications_windows(self, monkeypatch):
+        requests = []
+
+        def eutil(utility, **query):
+            requests.append(query)
+            time.sleep(0.05 if query["retstart"] == 0 else 0)
+            return query["retstart"], query["retmax"]
+
+        def read_publications(handle, escape, parser):
+            retstart, retmax = handle
+            return [
+                JournalRecord(title="", authors=[], pubdate="", pmid=str(pmid))
+                for pmid in range(retstart, min(25, retstart + retmax))
+            ]
+
+        monkeypatch.setattr(entrez, "_eutil", eutil)
+        monkeypatch.setattr(entrez, "_read_publications", read_publications)
+        records = entrez.iter_searched_publications("webenv", "1", count=25, window=10, concurrency=2)
+        assert [r.pmid for r in records] == [str(pmid) for pmid in range(25)]
+        assert sorted(query["retstart"] for query in requests) == [0, 10, 20]
+
+    def test_iter_searched_publications(self, eutils):
+        record = entrez.find_publications(pmid=["12", "26", "40"], usehistory=True, id_list=False)
+        records = list(entrez.iter_searched_publications(record["WebEnv"], record["QueryKey"], window=2))
+        assert sorted(r.pmid for r in records) == ["12", "26", "40"]
+
+    def test_get_publications_by_doi_matching(self, monkeypatch):
+        records = {
+            "1": JournalRecord(title="", authors=[], pubdate="", pmid="1", article_ids={"doi": "10.1/A"}),
+            "2": JournalRecord(title="", authors=[], pubdate="", pmid="2", article_ids={"doi": "10.1/b"}),
+            "3": JournalRecord(title="", authors=[], pubdate="", pmid="3", article_ids={"doi": "10.1/b"}),
+            "4": JournalRecord(title="", authors=[], pubdate="", pmid="4", article_ids={}),
+        }
+        searches = []
+
+        def esearch_ids(query, datetype, mindate, maxdate, retmax=100000):
+            searches.append(query)
+            if query == "10.1/d[doi]":
+                return 1, ["4"]
+            return 4, list(records)
+
+        monkeypatch.setattr(entrez, "_esearch_ids", esearch_ids)
+        monkeypatch.setattr(entrez, "get_publications", lambda pmids, **kwargs: [records[pmid] for pmid in pmids])
+        monkeypatch.setattr(config, "MAX_DOIS", 2)
+        results = entrez.get_publications_by_doi(["https://doi.org/10.1/a", "10.1/B", "10.1/c", "10.1/d"])
+        assert results.records == {"https://doi.org/10.1/a": records["1"], "10.1/d": records["4"]}
+        assert results.ambiguous == {"10.1/B": ["2", "3"]}
+        assert results.unresolved == ["10.1/c"]
+        assert searches == [
+            "(10.1/a[doi]) OR (10.1/b[doi])",
+            "(10.1/c[doi]) OR (10.1/d[doi])",
+            # the DOIs left are searched again in batches, split until one finds record 4
+            "(10.1/c[doi]) OR (10.1/d[doi])",
+            "10.1/c[doi]",
+            "10.1/d[doi]",
+        ]
+
+    def test_get_publications_by_doi_remaining(self, monkeypatch):
+        record = JournalRecord(title="", authors=[], pubdate="", pmid="4", article_ids={})
+        searches = []
+
+        def esearch_ids(query, datetype, mindate, maxdate, retmax=100000):
+            searches.append(query)
+            return (1, ["4"]) if "10.1/d[doi]" in query else (0, [])
+
+        monkeypatch.setattr(entrez, "_esearch_ids", esearch_ids)
+        monkeypatch.setattr(entrez, "get_publications", lambda pmids, **kwargs: [record])
+        monkeypatch.setattr(config, "MAX_DOIS", 20)
+        dois = [f"10.1/{index}" for index in range(99)] + ["10.1/d"]
+        results = entrez.get_publications_by_doi(dois)
+        assert results.records == {"10.1/d": record}
+        assert len(results.unresolved) == 99
+        # 5 batches, then 5 more and the halving of the last one, instead of a search for each of the 100 DOIs
+        assert len(searches) == 5 + 5 + 2 * 5
+
+    def test_get_publications_by_doi(self, eutils):
+        doi = eutils.articles["12"].fields["doi"][0].upper()
+        results = entrez.get_publications_by_doi([doi, "10.0000/not-a-doi"])
+        assert results.records[doi].pmid == "12"
+        assert results.unresolved == ["10.0000/not-a-doi"]
+
+    def test_get_publications_executor_order(self, monkeypatch):
+        def parse_payload(payload, escape, lxml, fields=None, measure=False):
+            # the first chunk takes longest to parse
+            time.sleep(0.1 if payload == b"0" else 0)
+            return [JournalRecord(title="", authors=[], pubdate="", pmid=payload.decode())], None
+
+        monkeypatch.setattr(entrez, "_eutil", lambda utility, **query: io.BytesIO(query["id"][0].encode()))
+        monkeypatch.setattr(entrez, "_parse_payload", parse_payload)
+        monkeypatch.setattr(config, "MAX_PUBS", 1)
+        pmids = [str(pmid) for pmid in range(10)]
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            assert [r.pmid for r in entrez.get_publications(pmids, executor=executor)] == pmids
+
+    def test_get_publications_executor(self, eutils):
+        pmids = [str(pmid) for pmid in range(1, 31)]
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            assert list(entrez.get_publications(pmids, executor=executor)) == list(entrez.get_publications(pmids))
+
+    def test_get_publication_summaries_parse(self, monkeypatch):
+        summary = {
+            "header": {"type": "esummary", "version": "0.3"},
+            "result": {
+                "uids": ["10854512", "1"],
+                "10854512": {
+                    "uid": "10854512",
+                    "pubdate": "2000 Jan",
+                    "epubdate": "1999 Nov 25",
+                    "source": "Surg Endosc",
+                    "authors": [
+                        {"name": "Soon MS", "authtype": "Author", "clusterid": ""},
+                        {"name": "Lin OS Jr", "authtype": "Author", "clusterid": ""},
+                        {"name": "Endoscopy Study Group", "authtype": "CollectiveName", "clusterid": ""},
+                    ],
+                    "title": "Inflammatory fibroid polyp of the duodenum & more",
+                    "volume": "14",
+                    "issue": "1",
+                    "pages": "86",
+                    "articleids": [
+                        {"idtype": "pubmed", "idtypen": 1, "value": "10854512"},
+                        {"idtype": "doi", "idtypen": 3, "value": "10.1007/s004649900018"},
+                        {"idtype": "rid", "idtypen": 8, "value": "10854512"},
+                    ],
+                    "fulljournalname": "Surgical endoscopy",
+                    "doctype": "citation",
+                },
+                "1": {"uid": "1", "error": "cannot get document summary"},
+            },
+        }
+        monkeypatch.setattr(entrez, "_eutil", lambda utility, **query: io.BytesIO(json.dumps(summary).encode()))
+        records = list(entrez.get_publication_summaries(["10854512", "1"]))
+        assert len(records) == 1
+        record = records[0]
+        assert record.partial
+        assert record.asdict()["partial"] is True
+        assert "partial" not in JournalRecord(title="", authors=[], pubdate="").asdict()
+        assert record.title == "Inflammatory fibroid polyp of the duodenum &amp; more"
+        assert [(a.last_name, a.initial, a.suffix, a.collective_name) for a in record.authors] == [
+            ("Soon", "MS", "", ""),
+            ("Lin", "OS", "Jr", ""),
+            ("", "", "", "Endoscopy Study Group"),
+        ]
+        assert record.article_ids == {"pubmed": "10854512", "doi": "10.1007/s004649900018"}
+        assert record.pubmodel == "Print-Electronic"
+        assert record.edate == "1999 Nov 25"
+        assert (
+            citations.journal_citation(publication=record)
+            == "Soon MS, Lin OS Jr, Endoscopy Study Group. Inflammatory fibroid polyp of the duodenum &amp; more. "
+            "Surg Endosc. 2000 Jan;14(1):86. Epub 1999 Nov 25."
+        )
+
+    def test_get_publication_summary(self, eutils):
+        record = entrez.get_publication_summary("12")
+        assert record.partial
+        assert not entrez.get_publication("12").partial
+        assert citations.journal_citation(html=True, publication=record) == citations.journal_citation(
+            html=True, publication=entrez.get_publication("12")
+        )
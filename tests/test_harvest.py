@@ -0,0 +1,76 @@
+import http.client
+import json
+import os
+import tempfile
+import urllib.error
+
+import pytest
+
+from pub.tools import entrez
+from pub.tools import harvest
+from pub.tools import transport
+
+
+class TestHarvest:
+    @pytest.fixture(autouse=True)
+    def no_backoff(self, monkeypatch):
+        monkeypatch.setattr(harvest.time, "sleep", lambda seconds: None)
+
+    def fail_first(self, monkeypatch, failures):
+        """Raise the errors in `failures` before sending requests on, returning the list of attempts"""
+        attempts = []
+        failures = list(failures)
+        eutil = entrez._eutil
+
+        def failing(utility, **query):
+            attempts.append(list(query["id"]))
+            if failures:
+                raise failures.pop(0)
+            return eutil(utility, **query)
+
+        monkeypatch.setattr(entrez, "_eutil", failing)
+        return attempts
+
+    def test_retry(self, eutils, monkeypatch):
+        attempts = self.fail_first(monkeypatch, [http.client.IncompleteRead(b""), urllib.error.URLError("down")])
+        records = harvest.fetch_chunk(["1", "2"])
+        assert [r.pmid for r in records] == ["1", "2"]
+        assert len(attempts) == 3
+        assert eutils.stats["efetch"] == 1
+
+    def test_retry_gives_up(self, eutils, monkeypatch):
+        self.fail_first(monkeypatch, [ConnectionResetError()] * 3)
+        with pytest.raises(ConnectionResetError):
+            harvest.fetch_chunk(["1"], max_retries=2)
+
+    def test_bad_request(self, eutils, monkeypatch):
+        error = urllib.error.HTTPError("url", 400, "Bad Request", {}, None)
+        attempts = self.fail_first(monkeypatch, [error])
+        with pytest.raises(urllib.error.HTTPError):
+            harvest.fetch_chunk(["1"])
+        assert len(attempts) == 1
+        assert transport.retryable(urllib.error.HTTPError("url", 429, "Too Many Requests", {}, None))
+
+    def test_resume(self, eutils):
+        pmids = [str(pmid) for pmid in range(1, 11)]
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "harvest.json")
+            records = harvest.harvest_publications(pmids, checkpoint, chunk_size=3)
+            assert [next(records).pmid for _ in range(4)] == pmids[:4]
+            records.close()
+            with open(checkpoint) as f:
+                assert json.load(f)["done"] == [0]
+            # the interrupted chunk is fetched again
+            assert [r.pmid for r in harvest.harvest_publications(pmids, checkpoint, chunk_size=3)] == pmids[3:]
+            assert eutils.stats["efetch"] == 5
+            assert not os.path.exists(checkpoint)
+
+    def test_other_pmids(self, eutils):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "harvest.json")
+            records = harvest.harvest_publications(["1", "2"], checkpoint, chunk_size=1)
+            next(records)
+            next(records)
+            records.close()
+            with pytest.raises(ValueError):
+                list(harvest.harvest_publications(["1", "3"], checkpoint, chunk_size=1))
@@ -0,0 +1,62 @@
+from pub.tools import idconv
+
+
+ARTICLE = {"pmcid": "PMC4909985", "pmid": "27291797", "doi": "10.1186/s12885-016-2406-4"}
+
+
+class TestIdConverter:
+    def test_id_type(self):
+        assert idconv.id_type("12345") == "pmid"
+        assert idconv.id_type("pmc12345") == "pmcid"
+        assert idconv.id_type("10.1093/nar/gks1195") == "doi"
+        assert idconv.normalize("12345", "pmcid") == "PMC12345"
+
+    def test_convert(self, eutils):
+        doi = eutils.articles["12"].fields["doi"][0].upper()
+        results = idconv.convert_ids(["1000012", "PMC1000012", doi, "PMC1"], idtype=None)
+        # without an idtype "1000012" is taken as a PMID
+        assert results["1000012"] is None
+        assert results["PMC1000012"].pmid == "12"
+        assert results[doi] == idconv.ArticleIds(pmid="12", pmcid="PMC1000012", doi=doi.lower())
+        assert results["PMC1"] is None
+        # the DOI was stored when its PMCID was converted
+        assert eutils.stats["idconv"] == 2
+
+    def test_cache(self, eutils):
+        idconv.convert_ids(["PMC1000007", "PMC1"])
+        assert eutils.stats["idconv"] == 1
+        # found and missing identifiers, and the other identifiers of found articles, all come from the cache
+        doi = eutils.articles["7"].fields["doi"][0].upper()
+        results = idconv.convert_ids(["PMC1000007", "PMC1", "7", doi])
+        assert eutils.stats["idconv"] == 1
+        assert results["7"].pmcid == "PMC1000007"
+        assert results[doi].pmid == "7"
+        assert results["PMC1"] is None
+
+    def test_chunks(self, eutils):
+        results = idconv.convert_ids([str(pmid) for pmid in range(450)])
+        # 200 identifiers per request
+        assert eutils.stats["idconv"] == 3
+        assert results["12"].pmcid == "PMC1000012"
+        assert results["101"] is None
+
+    def test_default_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(idconv, "CACHE_FILE", str(tmp_path / "pubmed" / "ids.sqlite"))
+        monkeypatch.setattr(idconv, "_cache", None)
+        monkeypatch.setattr(idconv, "_default_cache", True)
+        id_cache = idconv.get_cache()
+        assert id_cache.path == idconv.CACHE_FILE
+        assert id_cache.ttl == idconv.CACHE_TTL
+        assert idconv.get_cache() is id_cache
+        idconv.set_cache(None)
+        assert idconv.get_cache() is None
+
+    def test_persistent_cache(self, tmp_path):
+        path = str(tmp_path / "ids.sqlite")
+        id_cache = idconv.IdCache(path)
+        id_cache.set_many("pmcid", {"PMC4909985": idconv.ArticleIds(**ARTICLE)})
+        id_cache.close()
+        id_cache = idconv.IdCache(path, ttl=60)
+        assert id_cache.get_many("pmid", ["27291797"]) == {"27291797": idconv.ArticleIds(**ARTICLE)}
+        assert len(id_cache) == 3
+        id_cache.close()
@@ -0,0 +1,118 @@
+import concurrent.futures
+import io
+import urllib.error
+
+import pytest
+import requests
+from Bio import Entrez
+
+from pub.tools import config
+from pub.tools import entrez
+from pub.tools import harvest
+from pub.tools import metrics
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = metrics.StatsRecorder()
+    monkeypatch.setattr(metrics, "_recorder", recorder)
+    return recorder
+
+
+class TestMetrics:
+    def test_disabled(self, eutils):
+        assert metrics.get_recorder() is None
+        handle = entrez._eutil("esearch", db="pubmed", term="all[sb]")
+        assert not isinstance(handle, metrics.MeteredResponse)
+        handle.close()
+
+    def test_requests_and_chunks(self, eutils, recorder, monkeypatch):
+        monkeypatch.setattr(config, "MAX_PUBS", 50)
+        pmids = entrez.find_pmids("all[sb]")
+        records = list(entrez.get_publications(pmids))
+        assert len(records) == 100
+        stats = recorder.stats
+        assert stats.by_utility == {"esearch": 1, "efetch": 2}
+        assert stats.requests == 3
+        assert stats.errors == 0
+        assert stats.bytes > 100 * 500
+        assert stats.latency > 0
+        assert stats.chunks == 2
+        assert stats.records == 100
+        assert stats.parse_seconds > 0
+        assert stats.process_seconds > 0
+        assert "3 requests" in recorder.summary()
+
+    @pytest.mark.parametrize("parser", ["biopython", "lxml"])
+    def test_events(self, eutils, monkeypatch, parser):
+        sent, chunks = [], []
+        metrics.set_recorder(metrics.CallbackRecorder(on_request=sent.append, on_chunk=chunks.append))
+        try:
+            records = list(entrez.get_publications(["1", "2", "3"], stream=True, parser=parser))
+        finally:
+            metrics.set_recorder(None)
+        assert len(records) == 3
+        assert len(sent) == 1
+        assert sent[0].utility == "efetch"
+        assert "id=1%2C2%2C3" in sent[0].url
+        assert sent[0].bytes == len(eutils.efetch({"id": ["1,2,3"]}))
+        assert len(chunks) == 1
+        assert chunks[0].parser == parser
+        assert chunks[0].records == 3
+        assert (chunks[0].process_seconds > 0) == (parser == "biopython")
+
+    def test_process_pool_chunks(self, eutils, recorder, monkeypatch):
+        monkeypatch.setattr(config, "MAX_PUBS", 10)
+        pmids = [str(pmid) for pmid in range(1, 31)]
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            records = list(entrez.get_publications(pmids, executor=executor))
+        assert len(records) == 30
+        stats = recorder.stats
+        assert stats.by_utility == {"efetch": 3}
+        assert stats.chunks == 3
+        assert stats.records == 30
+        assert stats.parse_seconds > 0
+        assert stats.process_seconds > 0
+
+    def test_error(self, eutils, recorder):
+        events = []
+        recorder.request = events.append
+        with pytest.raises(requests.exceptions.HTTPError):
+            entrez._eutil("einfo", db="pubmed")
+        assert len(events) == 1
+        assert events[0].utility == "einfo"
+        assert "404" in events[0].error
+
+    def test_retries(self, eutils, recorder, monkeypatch):
+        monkeypatch.setattr(Entrez, "sleep_between_tries", 1)
+        eutils.rate_limit = 1
+        assert entrez.find_pmids("all[sb]")
+        assert entrez.find_pmids("all[sb]")
+        assert recorder.stats.retries >= 1
+        assert recorder.stats.requests == 2
+
+    def test_harvest_retries(self, recorder, monkeypatch):
+        calls = []
+
+        def eutil(utility, **params):
+            calls.append(params)
+            if len(calls) == 1:
+                raise urllib.error.URLError("down")
+            return io.BytesIO(b"<PubmedArticleSet></PubmedArticleSet>")
+
+        monkeypatch.setattr(entrez, "_eutil", eutil)
+        assert harvest.fetch_chunk(["1"], parser="lxml", backoff=0) == []
+        assert recorder.stats.retries == 1
+        assert recorder.stats.chunks == 1
+
+    def test_read_zero(self):
+        events = []
+        event = metrics.RequestEvent("efetch", "http://localhost/", 0.0)
+        handle = metrics.MeteredResponse(io.BytesIO(b"abc"), event, metrics.CallbackRecorder(events.append))
+        assert handle.read(0) == b""
+        assert not events
+        assert handle.read() == b"abc"
+        assert handle.read() == b""
+        handle.close()
+        assert len(events) == 1
+        assert events[0].bytes == 3
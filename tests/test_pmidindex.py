@@ -0,0 +1,88 @@
+import concurrent.futures
+
+import pytest
+from Bio import Entrez
+
+from pub.tools import baseline
+from pub.tools import entrez
+from pub.tools import pmidindex
+
+
+def corpus(paths):
+    records = {}
+    for item in baseline.load(paths):
+        if isinstance(item, baseline.DeletedCitation):
+            records.pop(item.pmid)
+        else:
+            records[item.pmid] = item
+    return records
+
+
+class TestPmidIndex:
+    def test_build(self, mirror, tmp_path):
+        paths = baseline.find_files(str(mirror))[:3]
+        with pmidindex.build(paths, str(tmp_path / "index")) as index:
+            assert len(index) == 70
+            expected = corpus(paths)
+            for pmid in ("1", "15", "30", "31", "70"):
+                assert index.get(pmid) == expected[pmid]
+            assert index.get(70, escape=False) == list(baseline.load(paths[2:], escape=False))[-1]
+            assert "71" not in index
+            assert index.get("71") is None
+            assert index.get("99999999") is None
+            assert index.get("not a pmid") is None
+        # the copies are gzip compatible
+        copies = baseline.find_files(str(tmp_path / "index"))
+        assert list(baseline.load(copies)) == list(baseline.load(paths))
+
+    def test_update(self, mirror, tmp_path):
+        paths = baseline.find_files(str(mirror))
+        directory = str(tmp_path / "index")
+        pmidindex.build(paths[:3], directory).close()
+        # the last file revises 5 and 6 and deletes 7 and 40
+        with pmidindex.build(paths, directory) as index:
+            assert index.files == [path.rsplit("/", 1)[1] for path in paths]
+            expected = corpus(paths)
+            assert len(index) == len(expected) == 68
+            assert "7" not in index
+            assert "40" not in index
+            assert index.locate("5")[0].endswith("pubmed25n0004.xml.gz")
+            for pmid in ("5", "6", "41"):
+                assert index.get(pmid) == expected[pmid]
+        with pmidindex.PmidIndex(directory) as index:
+            assert len(index) == 68
+
+    def test_fields(self, mirror, tmp_path):
+        with pmidindex.build(baseline.find_files(str(mirror)), str(tmp_path / "index")) as index:
+            record = index.get("12", fields=frozenset(["title", "pmid"]))
+            assert record.partial
+            assert record.title
+            assert record.authors == []
+
+    def test_threads(self, mirror, tmp_path):
+        with pmidindex.build(baseline.find_files(str(mirror)), str(tmp_path / "index")) as index:
+            pmids = [str(pmid) for pmid in range(1, 71, 3) if pmid not in (7, 40)]
+            expected = [index.get(pmid) for pmid in pmids]
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                assert list(executor.map(index.get, pmids * 4)) == expected * 4
+
+    def test_invalid(self, tmp_path):
+        (tmp_path / pmidindex.INDEX_NAME).write_bytes(b"not an index")
+        with pytest.raises(pmidindex.PmidIndexError):
+            pmidindex.PmidIndex(str(tmp_path))
+
+    def test_get_publication(self, mirror, tmp_path, monkeypatch):
+        def efetch(*args, **kwargs):
+            raise AssertionError("should not be called")
+
+        monkeypatch.setattr(Entrez, "efetch", efetch)
+        monkeypatch.setattr(entrez, "_eutil", efetch)
+        index = pmidindex.build(baseline.find_files(str(mirror)), str(tmp_path / "index"))
+        monkeypatch.setattr(pmidindex, "_index", index)
+        try:
+            assert entrez.get_publication("31") == index.get("31")
+            assert entrez.get_publication("31", fields=["title"]).partial
+            with pytest.raises(AssertionError):
+                entrez.get_publication("71")
+        finally:
+            index.close()
@@ -0,0 +1,254 @@
+import io
+
+import pytest
+from Bio import Entrez
+
+from pub.tools import entrez
+from pub.tools import pubmedxml
+from pub.tools.schema import projection
+
+Entrez.email = "wohnlice@imsweb.com"
+
+EFETCH_XML = b"""<?xml version='1.0' encoding='UTF-8'?>
+<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN"
+  "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">
+<PubmedArticleSet>
+  <PubmedArticle>
+    <MedlineCitation Status="MEDLINE" Owner="NLM" IndexingMethod="Manual">
+      <PMID Version="1">12727674</PMID>
+      <DateCompleted>
+        <Year>2003</Year>
+        <Month>06</Month>
+        <Day>03</Day>
+      </DateCompleted>
+      <Article PubModel="Print">
+        <Journal>
+          <ISSN IssnType="Print">0300-5577</ISSN>
+          <JournalIssue CitedMedium="Print">
+            <Volume>31</Volume>
+            <Issue>2</Issue>
+            <PubDate>
+              <MedlineDate>1998 Dec-1999 Jan</MedlineDate>
+            </PubDate>
+          </JournalIssue>
+          <Title>Journal of perinatal medicine</Title>
+          <ISOAbbreviation>J Perinat Med</ISOAbbreviation>
+        </Journal>
+        <ArticleTitle>The <i>effect</i> of a &amp; b &lt;tests&gt;.</ArticleTitle>
+        <Pagination>
+          <StartPage>95</StartPage>
+          <MedlinePgn>95-101</MedlinePgn>
+        </Pagination>
+        <ELocationID EIdType="doi" ValidYN="Y">10.1515/JPM.2003.013</ELocationID>
+        <Abstract>
+          <AbstractText
+            Label="OBJECTIVE" NlmCategory="OBJECTIVE">To test &amp; <sup>2</sup> things.</AbstractText>
+          <AbstractText Label="METHODS" NlmCategory="METHODS">We did it.</AbstractText>
+        </Abstract>
+        <AuthorList CompleteYN="Y">
+          <Author ValidYN="Y">
+            <LastName>Smith</LastName>
+            <ForeName> John   A &amp; B </ForeName>
+            <Initials>JA</Initials>
+            <Identifier Source="ORCID">0000-0002-1771-9287</Identifier>
+            <AffiliationInfo>
+              <Affiliation>Dept &amp; of <i a="x&amp;y">X</i> &lt; Y.</Affiliation>
+            </AffiliationInfo>
+          </Author>
+          <Author ValidYN="N">
+            <LastName>Bad</LastName>
+            <ForeName>B</ForeName>
+            <Initials>B</Initials>
+          </Author>
+          <Author>
+            <CollectiveName>Some Group</CollectiveName>
+          </Author>
+        </AuthorList>
+        <Language>eng</Language>
+        <GrantList CompleteYN="Y">
+          <Grant>
+            <GrantID>F32 CA130434-01</GrantID>
+            <Acronym>CA</Acronym>
+            <Agency>NCI NIH HHS</Agency>
+            <Country>United States</Country>
+          </Grant>
+        </GrantList>
+        <PublicationTypeList>
+          <PublicationType UI="D016428">Journal Article</PublicationType>
+        </PublicationTypeList>
+        <ArticleDate>
+          <Year>2003</Year>
+          <Month>01</Month>
+          <Day>15</Day>
+        </ArticleDate>
+      </Article>
+      <MedlineJournalInfo>
+        <Country>Germany</Country>
+        <MedlineTA>J Perinat Med</MedlineTA>
+        <NlmUniqueID>0361031</NlmUniqueID>
+        <ISSNLinking>0300-5577</ISSNLinking>
+      </MedlineJournalInfo>
+      <MeshHeadingList>
+        <MeshHeading>
+          <DescriptorName UI="D000818" MajorTopicYN="N">Animals</DescriptorName>
+        </MeshHeading>
+        <MeshHeading>
+          <DescriptorName UI="D006801" MajorTopicYN="Y">Humans</DescriptorName>
+          <QualifierName UI="Q1" MajorTopicYN="N">x</QualifierName>
+        </MeshHeading>
+      </MeshHeadingList>
+      <InvestigatorList>
+        <Investigator ValidYN="Y">
+          <LastName>Beral</LastName>
+          <ForeName>V</ForeName>
+          <Initials>V</Initials>
+        </Investigator>
+      </InvestigatorList>
+    </MedlineCitation>
+    <PubmedData>
+      <History>
+        <PubMedPubDate PubStatus="received">
+          <Year>2002</Year>
+          <Month>10</Month>
+          <Day>1</Day>
+        </PubMedPubDate>
+        <PubMedPubDate PubStatus="pubmed">
+          <Year>2003</Year>
+          <Month>5</Month>
+          <Day>2</Day>
+          <Hour>5</Hour>
+          <Minute>0</Minute>
+        </PubMedPubDate>
+      </History>
+      <PublicationStatus>ppublish</PublicationStatus>
+      <ArticleIdList>
+        <ArticleId IdType="pubmed">12727674</ArticleId>
+        <ArticleId IdType="doi">10.1515/JPM.2003.013</ArticleId>
+      </ArticleIdList>
+    </PubmedData>
+  </PubmedArticle>
+  <PubmedBookArticle>
+    <BookDocument>
+      <PMID Version="1">22593940</PMID>
+      <ArticleIdList>
+        <ArticleId IdType="bookaccession">NBK92774</ArticleId>
+      </ArticleIdList>
+      <Book>
+        <Publisher>
+          <PublisherName>CRC Press/Taylor &amp; Francis</PublisherName>
+          <PublisherLocation>Boca Raton (FL)</PublisherLocation>
+        </Publisher>
+        <BookTitle book="herbmed">Herbal Medicine: Biomolecular and Clinical Aspects</BookTitle>
+        <PubDate>
+          <Year>2011</Year>
+        </PubDate>
+        <AuthorList Type="editors">
+          <Author>
+            <LastName>Benzie</LastName>
+            <ForeName>Iris F. F.</ForeName>
+            <Initials>IFF</Initials>
+          </Author>
+        </AuthorList>
+        <Edition>2nd</Edition>
+        <Medium>Internet</Medium>
+        <ELocationID EIdType="doi">10.1/x</ELocationID>
+      </Book>
+      <ArticleTitle
+        book="herbmed" part="ch17">Herbs and Spices in Cancer Prevention and Treatment</ArticleTitle>
+      <AuthorList Type="authors">
+        <Author>
+          <LastName>Kaefer</LastName>
+          <ForeName>Christine M.</ForeName>
+          <Initials>CM</Initials>
+        </Author>
+      </AuthorList>
+      <Abstract>
+        <AbstractText>x &lt; <b>More</b> than 180 spice-derived compounds.</AbstractText>
+      </Abstract>
+      <Sections>
+        <Section>
+          <LocationLabel Type="section">17.1</LocationLabel>
+          <SectionTitle book="herbmed" part="ch17" sec="ch17.sec1">INTRODUCTION</SectionTitle>
+        </Section>
+        <Section>
+          <SectionTitle book="herbmed" part="ch17" sec="ch17.ref1">REFERENCES</SectionTitle>
+        </Section>
+      </Sections>
+    </BookDocument>
+    <PubmedBookData>
+      <History>
+        <PubMedPubDate PubStatus="pubmed">
+          <Year>2012</Year>
+          <Month>5</Month>
+          <Day>18</Day>
+        </PubMedPubDate>
+      </History>
+      <PublicationStatus>ppublish</PublicationStatus>
+      <ArticleIdList>
+        <ArticleId IdType="pubmed">22593940</ArticleId>
+      </ArticleIdList>
+    </PubmedBookData>
+  </PubmedBookArticle>
+</PubmedArticleSet>"""
+
+
+class TestPubmedXml:
+    def biopython(self, escape, fields=None):
+        data = Entrez.read(io.BytesIO(EFETCH_XML), escape=escape)
+        return [
+            entrez._parse_entrez_record(r, escape, fields) for r in data["PubmedArticle"] + data["PubmedBookArticle"]
+        ]
+
+    def test_same_as_biopython(self):
+        for escape in (True, False):
+            assert list(pubmedxml.iterparse(io.BytesIO(EFETCH_XML), escape)) == self.biopython(escape)
+
+    def test_escape(self):
+        journal, book = pubmedxml.iterparse(io.BytesIO(EFETCH_XML))
+        assert journal.title == "The <i>effect</i> of a &amp; b &lt;tests&gt;."
+        assert journal.authors[0].affiliations == ['Dept & of <i a="x&y">X</i> < Y.']
+        assert journal.authors[0].first_name == "John A & B"
+        assert book.abstract[0].text == "x &lt; <b>More</b> than 180 spice-derived compounds."
+        journal, book = pubmedxml.iterparse(io.BytesIO(EFETCH_XML), escape=False)
+        assert journal.title == "The <i>effect</i> of a & b <tests>."
+
+    def test_defaults(self):
+        """Attribute defaults from the DTD are applied"""
+        journal, book = pubmedxml.iterparse(io.BytesIO(EFETCH_XML))
+        assert journal.edate == "2003 Jan 15"
+        assert [a.collective_name for a in journal.authors if a.collective_name] == ["Some Group"]
+        assert book.pub_type == "book"
+        assert book.language == []
+        assert book.isbn == []
+        assert book.elocation == ["10.1/x"]
+
+    def test_fields(self):
+        fields = projection(["title", "mesh", "sections"])
+        assert fields == {"pmid", "title", "mesh", "sections"}
+        journal, book = pubmedxml.iterparse(io.BytesIO(EFETCH_XML), fields=fields)
+        assert [journal, book] == self.biopython(True, fields)
+        assert journal.partial and book.partial
+        assert journal.pmid == "12727674"
+        assert journal.title == "The <i>effect</i> of a &amp; b &lt;tests&gt;."
+        assert journal.mesh
+        assert journal.authors == journal.abstract == journal.grants == []
+        assert journal.journal == journal.pubdate == ""
+        assert book.sections
+        assert book.abstract == book.authors == []
+
+        full_journal, full_book = pubmedxml.iterparse(io.BytesIO(EFETCH_XML))
+        assert not full_journal.partial
+        full_journal.project(fields)
+        full_book.project(fields)
+        assert [full_journal, full_book] == [journal, book]
+
+        with pytest.raises(ValueError, match="Unknown record fields: titel"):
+            projection(["titel"])
+        assert projection("title") == {"pmid", "title"}
+
+    def test_fetch(self, eutils):
+        pmids = [str(pmid) for pmid in range(1, 101)]
+        read = sorted(entrez.get_publications(pmids), key=lambda r: r.pmid)
+        fast = sorted(entrez.get_publications(pmids, parser="lxml"), key=lambda r: r.pmid)
+        assert fast == read
+        assert entrez.get_publication("26", parser="lxml") == entrez.get_publication("26")
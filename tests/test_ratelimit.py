@@ -0,0 +1,57 @@
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from pub.tools import ratelimit
+from pub.tools.ratelimit import FileRateLimiter
+from pub.tools.ratelimit import RateLimiter
+
+
+class TestRateLimit:
+    def test_spacing(self):
+        limiter = RateLimiter(rate=20)
+        start = time.time()
+        for _ in range(5):
+            limiter.acquire()
+        # the first request is free, the next four wait 1/20s each
+        assert time.time() - start >= 0.19
+        assert limiter.stats.calls == 5
+        assert limiter.stats.delayed == 4
+        assert limiter.stats.total_wait > 0.15
+
+    def test_threads(self):
+        limiter = RateLimiter(rate=20)
+        start = time.time()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.time() - start >= 0.24
+        assert limiter.stats.calls == 6
+
+    def test_burst(self):
+        limiter = RateLimiter(rate=1, burst=3)
+        for _ in range(3):
+            assert limiter.acquire() == 0
+
+    @pytest.mark.skipif(ratelimit.fcntl is None, reason="fcntl is not available on this platform")
+    def test_shared_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratelimit")
+            first = FileRateLimiter(path, rate=20)
+            second = FileRateLimiter(path, rate=20)
+            start = time.time()
+            for _ in range(3):
+                first.acquire()
+                second.acquire()
+            assert time.time() - start >= 0.24
+            assert first.stats.total_wait + second.stats.total_wait > 0.2
+
+    def test_shared_file_unavailable(self, monkeypatch):
+        monkeypatch.setattr(ratelimit, "fcntl", None)
+        with pytest.raises(RuntimeError):
+            FileRateLimiter("ratelimit")
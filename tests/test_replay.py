@@ -0,0 +1,109 @@
+import io
+import time
+import urllib.request
+
+import pytest
+import requests
+from Bio import Entrez
+
+from pub.tools import entrez
+from pub.tools import orcid
+from pub.tools import ratelimit
+from pub.tools import replay
+from pub.tools import transport
+
+ESEARCH_XML = b"""<?xml version="1.0" encoding="UTF-8" ?>
+<!DOCTYPE eSearchResult PUBLIC "-//NLM//DTD esearch 20060628//EN"
+  "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20060628/esearch.dtd">
+<eSearchResult><Count>2</Count><RetMax>2</RetMax><RetStart>0</RetStart>
+<IdList><Id>12727674</Id><Id>22593940</Id></IdList>
+<TranslationSet/><QueryTranslation>test</QueryTranslation></eSearchResult>
+"""
+
+ORCID_JSON = b'{"person": {"name": {"given-names": {"value": "Josiah"}, "family-name": {"value": "Carberry"}}}}'
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, content):
+        super().__init__(content)
+        self.headers = {"Content-Type": "text/xml; charset=UTF-8"}
+
+
+class FakeTransport(transport.Transport):
+    def __init__(self):
+        self.requests = []
+
+    def open(self, request: urllib.request.Request):
+        self.requests.append(request.full_url)
+        return FakeResponse(ESEARCH_XML)
+
+    def get(self, url, **kwargs):
+        self.requests.append(url)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = ORCID_JSON
+        return response
+
+
+class TestReplay:
+    @pytest.fixture(autouse=True)
+    def restore(self, monkeypatch):
+        monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(rate=1000, burst=100))
+        monkeypatch.setattr(transport, "_transport", transport.get_transport())
+
+    def test_request_key(self):
+        url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+        key = replay.request_key("GET", f"{url}?db=pubmed&term=test&email=a%40b.org&tool=x")
+        assert key == replay.request_key("get", f"{url}?term=test&tool=y&db=pubmed")
+        assert key != replay.request_key("GET", f"{url}?db=pubmed&term=other")
+        assert key != replay.request_key("POST", url, b"db=pubmed&term=test")
+
+    def test_record_and_replay(self, tmp_path, monkeypatch):
+        fake = FakeTransport()
+        transport.set_transport(replay.RecordingTransport(str(tmp_path), fake))
+        assert entrez.find_pmids("test") == ["12727674", "22593940"]
+        assert orcid.get_author("0000-0002-1825-0097") == {"given_name": "Josiah", "family_name": "Carberry"}
+        assert len(fake.requests) == 2
+        assert len(replay.FixtureStore(str(tmp_path))) == 2
+
+        # the email sent to NCBI identifies the caller, not the request
+        monkeypatch.setattr(Entrez, "email", "someone.else@example.org")
+        transport.set_transport(replay.ReplayTransport(str(tmp_path)))
+        assert entrez.find_pmids("test") == ["12727674", "22593940"]
+        assert orcid.get_author("0000-0002-1825-0097") == {"given_name": "Josiah", "family_name": "Carberry"}
+        assert len(fake.requests) == 2
+
+    def test_miss(self, tmp_path):
+        transport.set_transport(replay.ReplayTransport(str(tmp_path)))
+        with pytest.raises(replay.ReplayMissError):
+            entrez.find_pmids("never recorded")
+        with pytest.raises(replay.ReplayMissError):
+            orcid.get_author("0000-0002-1825-0097")
+
+    def test_latency(self, tmp_path):
+        transport.set_transport(replay.RecordingTransport(str(tmp_path), FakeTransport()))
+        entrez.find_pmids("test")
+        transport.set_transport(replay.ReplayTransport(str(tmp_path), latency=0.2))
+        start = time.time()
+        entrez.find_pmids("test")
+        assert time.time() - start >= 0.2
+
+    def test_not_rate_limited(self, tmp_path, monkeypatch):
+        transport.set_transport(replay.RecordingTransport(str(tmp_path), FakeTransport()))
+        entrez.find_pmids("test")
+        monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(rate=1, burst=1))
+        transport.set_transport(replay.ReplayTransport(str(tmp_path)))
+        start = time.time()
+        for _ in range(5):
+            entrez.find_pmids("test")
+        assert time.time() - start < 1.0
+
+    def test_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PUB_TOOLS_REPLAY", str(tmp_path))
+        assert isinstance(replay.from_environment(), replay.ReplayTransport)
+        monkeypatch.setenv("PUB_TOOLS_REPLAY_MODE", "record")
+        assert isinstance(replay.from_environment(), replay.RecordingTransport)
+        monkeypatch.setenv("PUB_TOOLS_REPLAY_MODE", "bogus")
+        with pytest.raises(ValueError):
+            replay.from_environment()
@@ -0,0 +1,110 @@
+import datetime
+import os
+import tempfile
+
+import pytest
+
+from pub.tools import cache
+from pub.tools import config
+from pub.tools import sync
+from pub.tools import synthetic
+from pub.tools.schema import JournalRecord
+
+
+def journal(pmid):
+    return JournalRecord(title=f"Title {pmid}", authors=[], pubdate="2020", pmid=pmid)
+
+
+# two articles revised a day from 2026/01/01, so PMIDs 25 and 26 on 2026/01/13
+PROFILE = synthetic.CorpusProfile(book_rate=0.0, revised=(datetime.date(2026, 1, 1), 2))
+
+
+@pytest.fixture
+def server(emulate):
+    """Emulator over 26 articles, returning at most 4 ESearch results"""
+    return emulate(26, PROFILE, max_results=4)
+
+
+class TestSync:
+    def test_watermark(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sync.json")
+            assert sync.read_watermark(path) is None
+            sync.write_watermark(path, "2026/01/02")
+            sync.write_watermark(path, "2026/01/01", datetype="edat")
+            assert sync.read_watermark(path) == "2026/01/02"
+            assert sync.read_watermark(path, datetype="edat") == "2026/01/01"
+            assert os.listdir(tmp) == ["sync.json"]
+
+    def test_find_changed(self, server):
+        assert sync.find_changed_pmids([9, 3, 1, 2], "2026/01/01", "2026/01/02") == ["3", "1", "2"]
+        assert server.stats == {"esearch": 1}
+
+    def test_find_changed_windows(self, server):
+        # 16 changed records are more than ESearch returns, and searching them in windows takes fewer requests
+        # than posting 12 tracked PMIDs
+        tracked = [str(pmid) for pmid in range(3, 27, 2)]
+        assert sync.find_changed_pmids(tracked, "2026/01/03", "2026/01/10") == [
+            "5",
+            "7",
+            "9",
+            "11",
+            "13",
+            "15",
+            "17",
+            "19",
+        ]
+        assert "epost" not in server.stats
+
+    def test_find_changed_posted(self, server):
+        # posting 3 tracked PMIDs takes fewer requests than searching the 26 changed records in windows
+        assert sync.find_changed_pmids(["26", "2", "300"], "2026/01/01", "2026/01/31") == ["26", "2"]
+        assert server.stats == {"esearch": 2, "epost": 1}
+
+    def test_find_changed_day(self, emulate):
+        server = emulate(26, PROFILE, max_results=1)
+        # 2 records changed each day, more than ESearch returns for a single day
+        assert sync.find_changed_pmids(["19", "22", "25"], "2026/01/09", "2026/01/11") == ["19", "22"]
+        assert server.stats["epost"] == 3
+
+    def test_sync(self, server):
+        today = datetime.date.today().strftime(sync.DATE_FORMAT)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sync.json")
+            # without a watermark everything is fetched
+            assert [r.pmid for r in sync.sync_publications(["1", "21"], path)] == ["1", "21"]
+            assert sync.read_watermark(path) == today
+            assert "esearch" not in server.stats
+            # nothing changed since
+            assert list(sync.sync_publications(["1", "21"], path)) == []
+            assert server.stats == {"efetch": 1, "esearch": 1}
+            # the day before the watermark is searched again
+            sync.write_watermark(path, "2026/01/12")
+            assert [r.pmid for r in sync.sync_publications(["1", "21"], path)] == ["21"]
+
+    def test_sync_interrupted(self, server):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sync.json")
+            sync.write_watermark(path, "2026/01/01")
+            records = sync.sync_publications(["1", "2"], path)
+            next(records)
+            records.close()
+            assert sync.read_watermark(path) == "2026/01/01"
+
+    def test_sync_cache(self, server, monkeypatch):
+        record_cache = cache.RecordCache(":memory:")
+        record_cache.set_many([journal("1"), journal("21")])
+        monkeypatch.setattr(cache, "_cache", record_cache)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sync.json")
+            sync.write_watermark(path, "2026/01/12")
+            assert [r.pmid for r in sync.sync_publications(["1", "21"], path)] == ["21"]
+        # the changed record is fetched again instead of being served from the cache
+        assert record_cache.get("1") == journal("1")
+        assert record_cache.get("21").title != journal("21").title
+
+    def test_find_changed_entrez_dates(self, eutils, monkeypatch):
+        # far more than ESearch can return were added in those years, so the tracked PMIDs are searched
+        monkeypatch.setattr(config, "ESEARCH_MAX_RESULTS", 2)
+        eutils.max_results = 2
+        assert sync.find_changed_pmids(["3", "12", "40"], "2005/01/01", "2009/12/31", "edat") == ["12", "40"]
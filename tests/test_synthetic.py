@@ -0,0 +1,76 @@
+import datetime
+import gzip
+import io
+
+from Bio import Entrez
+
+from pub.tools import citations
+from pub.tools import emulator
+from pub.tools import entrez
+from pub.tools import pubmedxml
+from pub.tools import synthetic
+from pub.tools.schema import BookRecord
+from pub.tools.schema import ChapterRecord
+from pub.tools.schema import JournalRecord
+
+PROFILE = synthetic.CorpusProfile(
+    book_rate=0.2, medline_date_rate=0.2, season_rate=0.1, markup_rate=0.5, consortium_rate=0.02, consortium_size=300
+)
+
+
+def corpus(count: int, profile: synthetic.CorpusProfile = PROFILE, seed: int = 1) -> bytes:
+    articles = "".join(synthetic.generate_articles(count, profile, seed))
+    return f"{synthetic.HEADER}{articles}{synthetic.FOOTER}".encode()
+
+
+class TestSynthetic:
+    def test_seed(self):
+        assert corpus(20) == corpus(20)
+        assert corpus(20) != corpus(20, seed=2)
+
+    def test_parsers_agree(self):
+        data = corpus(200)
+        for escape in (True, False):
+            parsed = Entrez.read(io.BytesIO(data), escape=escape)
+            records = list(parsed["PubmedArticle"]) + list(parsed["PubmedBookArticle"])
+            biopython = sorted((entrez._parse_entrez_record(r, escape) for r in records), key=lambda r: int(r.pmid))
+            lxml = sorted(pubmedxml.iterparse(io.BytesIO(data), escape), key=lambda r: int(r.pmid))
+            assert len(biopython) == 200
+            assert biopython == lxml
+        kinds = {type(record) for record in lxml}
+        assert kinds == {JournalRecord, BookRecord, ChapterRecord}
+        assert max(len(record.authors) for record in lxml) > 300
+        for record in lxml:
+            assert citations.publication_citation(publication=record)
+
+    def test_profile(self):
+        profile = synthetic.CorpusProfile(authors=(3, 3), abstract_rate=0.0, book_rate=0.0, consortium_rate=0.0)
+        records = list(pubmedxml.iterparse(io.BytesIO(corpus(10, profile))))
+        assert {len(record.authors) for record in records} == {3}
+        assert not any(record.abstract for record in records)
+
+    def test_references_and_revised(self, tmp_path):
+        profile = synthetic.CorpusProfile(book_rate=0.0, references=(1, 3), revised=(datetime.date(2026, 1, 30), 2))
+        synthetic.write_corpus(str(tmp_path / "corpus.xml"), 6, profile, seed=1, first_pmid=10)
+        articles = emulator.Emulator(str(tmp_path)).articles
+        assert articles["10"].references == []
+        for pmid in range(11, 16):
+            references = articles[str(pmid)].references
+            assert 1 <= len(references) <= 3
+            assert all(10 <= int(reference) < pmid for reference in references)
+        revised = [articles[str(pmid)].dates["mdat"] for pmid in range(10, 16)]
+        assert (
+            revised
+            == [datetime.date(2026, 1, 30)] * 2 + [datetime.date(2026, 1, 31)] * 2 + [datetime.date(2026, 2, 1)] * 2
+        )
+        with open(tmp_path / "corpus.xml", "rb") as f:
+            data = f.read()
+        parsed = Entrez.read(io.BytesIO(data))
+        biopython = [entrez._parse_entrez_record(record) for record in parsed["PubmedArticle"]]
+        assert biopython == list(pubmedxml.iterparse(io.BytesIO(data)))
+
+    def test_write_corpus(self, tmp_path):
+        path = str(tmp_path / "pubmed.xml.gz")
+        synthetic.write_corpus(path, 5, first_pmid=1000)
+        with gzip.open(path) as f:
+            assert [record.pmid for record in pubmedxml.iterparse(f)] == ["1000", "1001", "1002", "1003", "1004"]
@@ -0,0 +1,108 @@
+import gzip
+import http.server
+import threading
+
+import pytest
+import requests
+from Bio import Entrez
+
+from pub.tools import config
+from pub.tools import entrez
+from pub.tools import ratelimit
+from pub.tools import transport
+
+ESEARCH_XML = b"""<?xml version="1.0" encoding="UTF-8" ?>
+<!DOCTYPE eSearchResult PUBLIC "-//NLM//DTD esearch 20060628//EN"
+  "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20060628/esearch.dtd">
+<eSearchResult><Count>2</Count><RetMax>2</RetMax><RetStart>0</RetStart>
+<IdList><Id>12727674</Id><Id>22593940</Id></IdList>
+<TranslationSet/><QueryTranslation>test</QueryTranslation></eSearchResult>
+"""
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.requests.append((self.command, self.path, self.headers.get("Accept-Encoding", "")))
+        if server.failures:
+            server.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = ESEARCH_XML
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=UTF-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.posted.append(self.rfile.read(int(self.headers["Content-Length"])))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.connections = set()
+    httpd.requests = []
+    httpd.posted = []
+    httpd.failures = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(config, "EUTILS_URL", f"http://127.0.0.1:{httpd.server_port}/")
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(rate=1000, burst=100))
+    monkeypatch.setattr(Entrez, "email", "wohnlice@imsweb.com")
+    monkeypatch.setattr(Entrez, "sleep_between_tries", 0)
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestTransport:
+    def test_abstract(self):
+        with pytest.raises(TypeError):
+            transport.Transport()
+
+    def test_urllib_default(self, server, monkeypatch):
+        # the tests replay recorded responses, see conftest
+        monkeypatch.delenv("PUB_TOOLS_REPLAY", raising=False)
+        monkeypatch.setattr(transport, "_transport", transport._default_transport())
+        assert isinstance(transport.get_transport(), transport.UrllibTransport)
+        assert entrez.find_pmids("test") == ["12727674", "22593940"]
+        assert server.requests[0][1].startswith("/esearch.fcgi?")
+
+    def test_session(self, server, monkeypatch):
+        monkeypatch.setattr(transport, "_transport", transport.SessionTransport())
+        for _ in range(5):
+            assert entrez.find_pmids("test") == ["12727674", "22593940"]
+        assert len(server.requests) == 5
+        # one kept alive connection, with gzip compressed responses
+        assert len(server.connections) == 1
+        assert all(accept == "gzip" for _, _, accept in server.requests)
+
+    def test_session_post(self, server, monkeypatch):
+        monkeypatch.setattr(transport, "_transport", transport.SessionTransport())
+        handle = entrez._eutil("epost", db="pubmed", id="1,2")
+        handle.read()
+        assert server.requests[0][0] == "POST"
+        assert b"id=1%2C2" in server.posted[0]
+
+    def test_session_retry(self, server, monkeypatch):
+        monkeypatch.setattr(transport, "_transport", transport.SessionTransport())
+        server.failures = 2
+        assert entrez.find_pmids("test") == ["12727674", "22593940"]
+        assert len(server.requests) == 3
+        server.failures = Entrez.max_tries
+        with pytest.raises(requests.exceptions.HTTPError):
+            entrez.find_pmids("test")